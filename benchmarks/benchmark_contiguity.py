@@ -0,0 +1,112 @@
+"""
+Compare the localized contiguity check in :func:`single_flip_contiguous`
+with the Dijkstra-based check it replaced, on the PA and MO test graphs.
+
+The classes follow the airspeed velocity conventions (``setup`` plus
+``time_*`` methods); with rundmcmc installed, running this file directly
+prints a comparison::
+
+    python benchmarks/benchmark_contiguity.py
+
+"""
+import json
+import os
+import random
+import timeit
+
+import networkx
+import networkx.algorithms.shortest_paths.weighted as nx_path
+
+from rundmcmc.partition import Partition
+from rundmcmc.proposals import propose_random_flip
+from rundmcmc.updaters import cut_edges
+from rundmcmc.validity import single_flip_contiguous
+
+TEST_DATA = os.path.join(os.path.dirname(__file__), '..', 'rundmcmc', 'testData')
+
+GRAPHS = {'PA': 'PA_graph_with_data.json', 'MO': 'MO_graph.json'}
+
+
+def dijkstra_single_flip_contiguous(partition):
+    """The previous implementation of :func:`single_flip_contiguous`."""
+    parent = partition.parent
+    flips = partition.flips
+    graph = partition.graph
+    assignment_dict = parent.assignment
+
+    def proposed_assignment(node):
+        if node in flips:
+            return flips[node]
+        return assignment_dict[node]
+
+    def partition_edge_weight(start_node, end_node, edge_attrs):
+        if proposed_assignment(start_node) != proposed_assignment(end_node):
+            return float("inf")
+        return 1
+
+    for changed_node in flips:
+        old_assignment = assignment_dict[changed_node]
+        old_neighbors = [node for node in graph.neighbors(changed_node)
+                         if proposed_assignment(node) == old_assignment]
+        if not old_neighbors:
+            return True
+
+        start_neighbor = random.choice(old_neighbors)
+        for neighbor in old_neighbors:
+            try:
+                distance, _ = nx_path.single_source_dijkstra(graph, start_neighbor, neighbor,
+                                                             weight=partition_edge_weight)
+                if not (distance < float("inf")):
+                    return False
+            except networkx.NetworkXNoPath:
+                return False
+    return True
+
+
+def load_proposals(name, count=200, seed=2018):
+    """A partition of the named test graph by its congressional districts, and
+    `count` of its children by random single flips."""
+    with open(os.path.join(TEST_DATA, GRAPHS[name])) as f:
+        graph = networkx.readwrite.json_graph.adjacency_graph(json.load(f))
+
+    assignment = {node: graph.nodes[node]['CD'] for node in graph.nodes}
+    partition = Partition(graph, assignment, {'cut_edges': cut_edges})
+
+    random.seed(seed)
+    return [partition.merge(propose_random_flip(partition)) for _ in range(count)]
+
+
+class SingleFlipContiguity:
+    params = list(GRAPHS)
+    param_names = ['graph']
+
+    def setup(self, name):
+        self.proposals = load_proposals(name)
+
+    def time_localized_search(self, name):
+        for proposal in self.proposals:
+            single_flip_contiguous(proposal)
+
+    def time_dijkstra(self, name):
+        for proposal in self.proposals:
+            dijkstra_single_flip_contiguous(proposal)
+
+
+if __name__ == '__main__':
+    for name in GRAPHS:
+        proposals = load_proposals(name)
+
+        disagreements = sum(single_flip_contiguous(proposal) !=
+                            dijkstra_single_flip_contiguous(proposal) for proposal in proposals)
+        rejected = sum(not single_flip_contiguous(proposal) for proposal in proposals)
+
+        times = {}
+        for check in (single_flip_contiguous, dijkstra_single_flip_contiguous):
+            total = min(timeit.repeat(lambda: [check(proposal) for proposal in proposals],
+                                      number=1, repeat=3))
+            times[check.__name__] = 1e6 * total / len(proposals)
+
+        print(f"{name}: {len(proposals)} proposals, {rejected} discontiguous, "
+              f"{disagreements} disagreements")
+        for check_name, microseconds in times.items():
+            print(f"    {check_name:<35} {microseconds:10.1f} us per proposal")
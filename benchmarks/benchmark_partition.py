@@ -0,0 +1,68 @@
+"""
+Compare the cost of a step of a chain with :class:`Partition` and
+:class:`ArrayPartition` on the PA test graph: merging a random single flip,
+computing the cut edges and population tally, and checking contiguity.
+
+The classes follow the airspeed velocity conventions (``setup`` plus
+``time_*`` methods); with rundmcmc installed, running this file directly
+prints a comparison::
+
+    python benchmarks/benchmark_partition.py
+
+"""
+import json
+import os
+import random
+import timeit
+
+import networkx
+
+from rundmcmc.partition import ArrayPartition, Partition
+from rundmcmc.proposals import propose_random_flip
+from rundmcmc.updaters import Tally, cut_edges
+from rundmcmc.validity import single_flip_contiguous
+
+TEST_DATA = os.path.join(os.path.dirname(__file__), '..', 'rundmcmc', 'testData')
+
+PARTITION_CLASSES = {'Partition': Partition, 'ArrayPartition': ArrayPartition}
+
+
+def load_partition(partition_class):
+    """A partition of the PA test graph by its congressional districts."""
+    with open(os.path.join(TEST_DATA, 'PA_graph_with_data.json')) as f:
+        graph = networkx.readwrite.json_graph.adjacency_graph(json.load(f))
+
+    assignment = {node: int(graph.nodes[node]['CD']) for node in graph.nodes}
+    updaters = {'cut_edges': cut_edges, 'population': Tally('POP100', alias='population')}
+    return partition_class(graph, assignment, updaters)
+
+
+def run_steps(partition, steps=500, seed=2018):
+    """Run a chain that accepts every contiguous single flip."""
+    random.seed(seed)
+    for _ in range(steps):
+        proposal = partition.merge(propose_random_flip(partition))
+        proposal['population']
+        if single_flip_contiguous(proposal):
+            partition.parent = None
+            partition = proposal
+    return partition
+
+
+class ChainStep:
+    params = list(PARTITION_CLASSES)
+    param_names = ['partition_class']
+
+    def setup(self, name):
+        self.partition = load_partition(PARTITION_CLASSES[name])
+
+    def time_steps(self, name):
+        run_steps(self.partition)
+
+
+if __name__ == '__main__':
+    steps = 500
+    for name, partition_class in PARTITION_CLASSES.items():
+        partition = load_partition(partition_class)
+        total = min(timeit.repeat(lambda: run_steps(partition, steps), number=1, repeat=5))
+        print(f"{name:<15} {1e6 * total / steps:10.1f} us per step")
@@ -1,7 +1,7 @@
 from rundmcmc.scores import efficiency_gap, mean_median, mean_thirdian
 from rundmcmc.validity import L1_reciprocal_polsby_popper
 from rundmcmc.defaults import BasicChain, PA_partition
-from multiprocessing import Pool
+from rundmcmc.parallel import EnsembleRunner
 from collections import Counter
 import functools
 
@@ -22,7 +22,7 @@ scores = {
 
 
 def run_chain(partition, length):
-    chain = BasicChain(initial_partition, total_steps=length)
+    chain = BasicChain(partition, total_steps=length)
     score_dict = {name: [] for name in scores.keys()}
 
     for partition in chain:
@@ -54,19 +54,13 @@ def p_report_star(score_name, n_branches, ensemble_scores, initial_plan_score):
 first_end, first_ensemble = run_chain(initial_partition, first_walk_length)
 second_end, second_ensemble = run_chain(first_end, double_walk_length - first_walk_length)
 
-with Pool() as p:
-    func = functools.partial(run_chain, length=star_chain_length)
-    star_partitions = p.map(func, [second_end] * n_star_chains)
+runner = EnsembleRunner(functools.partial(BasicChain, second_end, total_steps=star_chain_length),
+                        scores, number_of_chains=n_star_chains, seed=2018)
 
-ensembles = dict()
-
-for name in scores.keys():
-    data = first_ensemble[name]
-    data += second_ensemble[name]
-
-    for _, ensemble in star_partitions:
-        data += ensemble[name]
-
-    ensembles[name] = data
+ensembles = {name: first_ensemble[name] + second_ensemble[name] for name in scores}
+for _, _, row in runner.run():
+    for name, score in row.items():
+        ensembles[name].append(score)
 
+for name, data in ensembles.items():
     print(p_report_star(name, n_star_chains, data, first_ensemble[name][0]))
@@ -1,3 +1,4 @@
+import math
 import random
 
 
@@ -5,11 +6,13 @@ def always_accept(partition):
     return True
 
 
-def cut_edge_accept(partition):
+def cut_edge_accept(partition, rng=random):
     """Always accepts the flip if the number of cut_edges increases.
     Otherwise, uses the Metropolis criterion to decide.
 
     :partition: The current partition to accept a flip from.
+    :rng: The random number generator to draw from; defaults to the
+          :mod:`random` module.
     :returns: True if accepted, False to remain in place
 
     """
@@ -18,21 +21,61 @@ def cut_edge_accept(partition):
     if partition.parent is not None:
         bound = min(1, len(partition.parent["cut_edges"]) / len(partition["cut_edges"]))
 
-    return random.random() < bound
+    return rng.random() < bound
 
 
-def metagraph_accept(partition):
+def metagraph_accept(partition, rng=random):
     """Always accepts the flip if the metagraph degree increases.
     Otherwise, uses the Metropolis criterion to decide.
 
+    A proposed partition without any valid flips is rejected, since the
+    chain could never leave it (this can happen with
+    :func:`~rundmcmc.validity.refuse_new_splits`, for instance).
+
     :partition: The current partition to accept a flip from.
+    :rng: The random number generator to draw from; defaults to the
+          :mod:`random` module.
     :returns: True if accepted, False to remain in place
 
     """
     bound = 1
 
     if partition.parent is not None:
-        bound = min(1,
-                    len(partition.parent["metagraph_degree"]) / len(partition["metagraph_degree"]))
+        degree = partition["metagraph_degree"]['valid']
+        if degree == 0:
+            return False
+        previous_degree = partition.parent["metagraph_degree"]['valid']
+        bound = min(1, previous_degree / degree)
+
+    return rng.random() < bound
+
+
+class Metropolis:
+    """
+    Accepts a flip with the Metropolis probability for the Boltzmann
+    distribution of an energy at inverse temperature `beta`: always if the
+    energy does not increase, and otherwise with probability
+    ``exp(-beta * (new energy - old energy))``.
+
+    :energy: Function of a partition, like the number of cut edges.
+    :beta: The inverse temperature. At ``beta=0`` every flip is accepted.
+    :rng: (optional) The random number generator to draw from, like a
+          :class:`~rundmcmc.rng.RandomStream`. By default, the :mod:`random`
+          module (which is not stored, so that the instance can be pickled).
+
+    """
+
+    def __init__(self, energy, beta=1, rng=None):
+        self.energy = energy
+        self.beta = beta
+        self.rng = rng
+
+    def __call__(self, partition):
+        if partition.parent is None:
+            return True
 
-    return random.random() < bound
+        increase = self.energy(partition) - self.energy(partition.parent)
+        if increase <= 0:
+            return True
+        rng = random if self.rng is None else self.rng
+        return rng.random() < math.exp(-self.beta * increase)
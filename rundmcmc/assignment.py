@@ -0,0 +1,194 @@
+import collections.abc
+import operator
+
+import numpy
+
+# Chunks of a PersistentAssignment hold 2 ** CHUNK_BITS parts each.
+CHUNK_BITS = 6
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+
+
+class ArrayAssignment(collections.abc.Mapping):
+    """
+    Read-only mapping from the nodes ``0..n-1`` of a relabeled graph to their
+    (integer) parts.
+
+    This is the assignment used by :class:`~rundmcmc.partition.ArrayPartition`.
+    It supports the usual dictionary read interface, and exposes the
+    assignment as an ``int32`` NumPy vector, :attr:`array`, for vectorized
+    computations.
+
+    Like :class:`PersistentAssignment`, the parts are stored in fixed-size
+    chunks, and :meth:`merge` shares every chunk that the flips do not touch,
+    so a step of the chain does not copy the whole assignment. The nodes are
+    their own positions, so looking up a node does not hash it. The vector is
+    only built when :attr:`array` is first read.
+
+    """
+
+    chunk_size = 1 << CHUNK_BITS
+
+    def __init__(self, chunks, length):
+        """
+        :chunks: List of lists of parts; the part of node ``i`` is
+                 ``chunks[i // chunk_size][i % chunk_size]``.
+        :length: Number of nodes.
+
+        """
+        self.chunks = chunks
+        self.length = length
+        self._array = None
+
+    @classmethod
+    def from_dict(cls, assignment, node_indices):
+        """
+        :assignment: Dictionary assigning (original) node IDs to integer parts.
+        :node_indices: Dictionary from original node IDs to their indices.
+        :returns: An :class:`ArrayAssignment` of the relabeled nodes.
+
+        """
+        parts = [0] * len(node_indices)
+        for node, part in assignment.items():
+            # operator.index raises a TypeError for non-integer labels, which
+            # would otherwise be silently truncated in the int32 vector.
+            parts[node_indices[node]] = operator.index(part)
+
+        chunks = [parts[start:start + cls.chunk_size]
+                  for start in range(0, len(parts), cls.chunk_size)]
+        return cls(chunks, len(parts))
+
+    @property
+    def array(self):
+        """The assignment as a one-dimensional ``int32`` NumPy vector; the
+        part of node ``i`` is ``array[i]``."""
+        if self._array is None:
+            self._array = numpy.array(self.values(), dtype=numpy.int32)
+        return self._array
+
+    def merge(self, flips):
+        """
+        :flips: Dictionary assigning nodes to their new parts.
+        :returns: A new :class:`ArrayAssignment` with the flips applied.
+
+        """
+        chunks = list(self.chunks)
+        copied = set()
+
+        for node, part in flips.items():
+            chunk = node >> CHUNK_BITS
+            if chunk not in copied:
+                chunks[chunk] = list(chunks[chunk])
+                copied.add(chunk)
+            chunks[chunk][node & CHUNK_MASK] = part
+
+        return self.__class__(chunks, self.length)
+
+    def __getitem__(self, node):
+        try:
+            if 0 <= node < self.length:
+                return self.chunks[node >> CHUNK_BITS][node & CHUNK_MASK]
+        except TypeError:
+            pass
+        raise KeyError(node)
+
+    def __contains__(self, node):
+        try:
+            return 0 <= operator.index(node) < self.length
+        except TypeError:
+            return False
+
+    def __iter__(self):
+        return iter(range(self.length))
+
+    def __len__(self):
+        return self.length
+
+    def items(self):
+        return list(enumerate(self.values()))
+
+    def values(self):
+        return [part for chunk in self.chunks for part in chunk]
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.array!r})"
+
+
+class PersistentAssignment(collections.abc.Mapping):
+    """
+    Read-only mapping from nodes to parts that can be updated without copying.
+
+    The nodes are numbered once, and the parts are stored in fixed-size chunks
+    of that numbering. :meth:`merge` shares every chunk that the flips do not
+    touch with the assignment it was merged from, so a step of the chain costs
+    ``O(n / chunk_size + |flips| * chunk_size)`` pointer copies instead of a
+    copy of the whole assignment. All of the assignments derived from one
+    another share the same node numbering.
+
+    """
+
+    chunk_size = 1 << CHUNK_BITS
+
+    def __init__(self, node_indices, chunks):
+        """
+        :node_indices: Dictionary from nodes to their positions.
+        :chunks: List of lists of parts; the part of the node at position ``i``
+                 is ``chunks[i // chunk_size][i % chunk_size]``.
+
+        """
+        self.node_indices = node_indices
+        self.chunks = chunks
+
+    @classmethod
+    def from_dict(cls, assignment):
+        """
+        :assignment: Dictionary assigning nodes to parts.
+        :returns: A :class:`PersistentAssignment` with the same items.
+
+        """
+        node_indices = {node: index for index, node in enumerate(assignment)}
+        parts = list(assignment.values())
+        chunks = [parts[start:start + cls.chunk_size]
+                  for start in range(0, len(parts), cls.chunk_size)]
+        return cls(node_indices, chunks)
+
+    def merge(self, flips):
+        """
+        :flips: Dictionary assigning nodes to their new parts.
+        :returns: A new :class:`PersistentAssignment` with the flips applied.
+                  Nodes that are not already in the assignment are not allowed.
+
+        """
+        chunks = list(self.chunks)
+        copied = set()
+
+        for node, part in flips.items():
+            index = self.node_indices[node]
+            chunk = index >> CHUNK_BITS
+            if chunk not in copied:
+                chunks[chunk] = list(chunks[chunk])
+                copied.add(chunk)
+            chunks[chunk][index & CHUNK_MASK] = part
+
+        return self.__class__(self.node_indices, chunks)
+
+    def __getitem__(self, node):
+        index = self.node_indices[node]
+        return self.chunks[index >> CHUNK_BITS][index & CHUNK_MASK]
+
+    def __contains__(self, node):
+        return node in self.node_indices
+
+    def __iter__(self):
+        return iter(self.node_indices)
+
+    def __len__(self):
+        return len(self.node_indices)
+
+    def items(self):
+        return list(zip(self.node_indices, self.values()))
+
+    def values(self):
+        return [part for chunk in self.chunks for part in chunk]
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({dict(self.items())!r})"
@@ -1,3 +1,26 @@
+import collections
+import math
+import os
+import pickle
+import random
+
+from rundmcmc.partition import MutablePartition, Partition
+from rundmcmc.updaters.metagraph_degree import _changed_parts, metagraph_degree
+
+
+Delta = collections.namedtuple('Delta', 'step flips accepted values')
+Delta.__doc__ = """
+A step of a :class:`MarkovChain`, as yielded by :meth:`MarkovChain.deltas`.
+
+:step: The index of the step.
+:flips: The proposed flips (empty if the proposal stayed in place), or
+        None for the initial state.
+:accepted: Whether the chain moved to the proposed partition.
+:values: Dictionary of the requested updater values of the proposed
+         partition, or None if none were requested.
+"""
+
+
 class MarkovChain:
     """
     MarkovChain is an iterator that allows the user to iterate over the states
@@ -11,15 +34,43 @@ class MarkovChain:
         for state in chain:
             # Do whatever you want - print output, compute scores, ...
 
+    A long run can be saved with :meth:`checkpoint`, or every so many steps
+    by passing `checkpoint_path` and `checkpoint_every`, and continued after
+    a crash with :meth:`resume`:
+
+    .. code-block:: python
+
+        chain = MarkovChain.resume("chain.checkpoint", graph)
+        for state in chain:
+            # The same states that the first run would have yielded next
+
     """
 
-    def __init__(self, proposal, is_valid, accept, initial_state, total_steps=1000):
+    def __init__(self, proposal, is_valid, accept, initial_state, total_steps=1000,
+                 checkpoint_path=None, checkpoint_every=None, instrumentation=None, thin=1):
         """
         :proposal: Function proposing the next state from the current state.
         :is_valid: :class:`~rundmcmc.validity.Validator` class instance.
         :accept: Function accepting or rejecting the proposed state.
         :initial_state: Initial :class:`rundmcmc.partition.Partition` class.
+                        If it is a :class:`~rundmcmc.partition.MutablePartition`,
+                        proposals are applied to it in place, and every step
+                        yields the same instance. Like a proposed
+                        :class:`~rundmcmc.partition.Partition`, a valid proposal
+                        that is not accepted is still yielded; it is reverted
+                        at the next step.
         :total_steps: Number of steps to run.
+        :checkpoint_path: (optional) Path to save a :meth:`checkpoint` to
+                          every `checkpoint_every` steps.
+        :checkpoint_every: (optional) Number of steps between checkpoints.
+        :instrumentation: (optional) :class:`~rundmcmc.profiling.Instrumentation`
+                          whose hooks are called around each phase of a step,
+                          like a :class:`~rundmcmc.profiling.Profiler`. It is
+                          also set on the initial state, for the updaters.
+        :thin: Only yield the states of every `thin`-th step, starting with
+               the initial state. The steps in between are run without being
+               yielded, so nothing is computed for them but what the chain
+               needs. The chain runs `total_steps` steps in all.
 
         """
         if not is_valid(initial_state):
@@ -34,35 +85,408 @@ class MarkovChain:
         self.accept = accept
         self.total_steps = total_steps
         self.state = initial_state
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
+        self.thin = thin
 
-    def __iter__(self):
+        self.instrumentation = instrumentation
+        if instrumentation is not None:
+            initial_state.instrumentation = instrumentation
+
+        # The step that iterating starts from, which is later for a resumed
+        # chain.
+        self._first_step = 0
         self.counter = 0
+        self._rejected = False
+        # The flips proposed at the most recent step.
+        self._flips = None
+
+    def __iter__(self):
+        self.counter = self._first_step
+        self._rejected = False
         return self
 
     def __next__(self):
+        state = self._step()
+        while (self.counter - 1) % self.thin:
+            state = self._step()
+        return state
+
+    def _step(self):
+        """Run one step of the chain, and return the partition it yields."""
         if self.counter == 0:
             self.counter += 1
+            self._flips = None
             return self.state
 
+        # A rejected proposal to a mutable state is yielded like any other
+        # proposal, and only reverted now that the caller is done with it.
+        if self._rejected:
+            self._call('revert', self.state.revert)
+            self._rejected = False
+
+        if self.checkpoint_every and self.counter != self._first_step and \
+                self.counter % self.checkpoint_every == 0:
+            self.checkpoint(self.checkpoint_path)
+
         while self.counter < self.total_steps:
-            proposal = self.proposal(self.state)
+            proposal = self._call('proposal', self.proposal, self.state)
+            self._flips = proposal or {}
 
             if not proposal:
-                if self.accept(self.state):
+                if self._call('accept', self.accept, self.state):
                     self.counter += 1
                     return self.state
                 else:
                     continue
 
+            # Reject what the cheap checks of the flips can, before the
+            # proposed partition is built.
+            if not self._call('check', self._check, proposal):
+                continue
+
+            if isinstance(self.state, MutablePartition):
+                if self._apply(proposal):
+                    self.counter += 1
+                    return self.state
+                continue
+
+            proposed_next_state = self._call('merge', self.state.merge, proposal)
+            # Drop the reference to the previous state, so that the chain
+            # of parents does not grow.
             self.state.parent = None
-            proposed_next_state = self.state.merge(proposal)
 
-            if self.is_valid(proposed_next_state):
-                if self.accept(proposed_next_state):
+            if self._call('validate', self.is_valid, proposed_next_state):
+                if self._call('accept', self.accept, proposed_next_state):
                     self.state = proposed_next_state
                 self.counter += 1
                 return proposed_next_state
+
+        if self.instrumentation is not None:
+            self.instrumentation.finish()
         raise StopIteration
 
+    def deltas(self, updaters=None):
+        """
+        Run the chain, and yield a compact :class:`Delta` record of each step
+        instead of the partition: its index, the proposed flips, whether they
+        were accepted and, optionally, some updater values.
+
+        The records do not refer to the partitions, so memory use stays flat
+        however long the chain runs, and the records are cheap to pickle or
+        send elsewhere. The initial assignment is ``chain.state.assignment``
+        before iterating. The flips are the proposal's own dictionary, and
+        must not be modified.
+
+        Every step is recorded, even if the chain is thinned, since the flips
+        of each step are needed to follow the chain.
+
+        :updaters: (optional) Names of updaters whose values to include.
+        :returns: A generator of :class:`Delta` records.
+
+        """
+        iter(self)
+        while True:
+            try:
+                state = self._step()
+            except StopIteration:
+                return
+
+            accepted = state is self.state and not self._rejected
+            values = None
+            if updaters is not None:
+                values = {key: state[key] for key in updaters}
+            yield Delta(self.counter - 1, self._flips, accepted, values)
+
+    def _call(self, phase, function, *args):
+        """Call the function, between the instrumentation's hooks for the phase."""
+        if self.instrumentation is None:
+            return function(*args)
+
+        self.instrumentation.before(phase)
+        try:
+            return function(*args)
+        finally:
+            self.instrumentation.after(phase)
+
+    def _check(self, proposal):
+        """Check the proposed flips with :meth:`Validator.check
+        <rundmcmc.validity.Validator.check>`, if `is_valid` has it.
+
+        :returns: False if the proposal is certainly invalid, and True otherwise.
+
+        """
+        check = getattr(self.is_valid, 'check', None)
+        return check is None or check(self.state, proposal)
+
+    def _apply(self, proposal):
+        """Apply the proposal to the mutable state in place. An invalid
+        proposal is reverted at once, and one that is not accepted is reverted
+        at the next step, after it has been yielded.
+
+        :returns: True if the proposal was valid, and False otherwise.
+
+        """
+        self._call('merge', self.state.apply, proposal)
+
+        if not self._call('validate', self.is_valid, self.state):
+            self._call('revert', self.state.revert)
+            return False
+
+        self._rejected = not self._call('accept', self.accept, self.state)
+        return True
+
+    def checkpoint(self, path):
+        """
+        Save everything needed to continue this chain to a file: the number
+        of steps so far, the state of the :mod:`random` module, a
+        :meth:`~rundmcmc.partition.Partition.snapshot` of the current state
+        and a :meth:`~rundmcmc.validity.Validator.snapshot` of `is_valid`.
+        The graph is not saved.
+
+        The proposal, validator, acceptance function and updaters are saved
+        too, if they can be pickled. Those that cannot, like closures, must be
+        passed to :meth:`resume` again.
+
+        A proposal to a :class:`~rundmcmc.partition.MutablePartition` that was
+        yielded but not accepted is reverted first. The file is replaced
+        atomically, so a crash while saving leaves the previous checkpoint.
+
+        :path: Path of the file to write.
+
+        """
+        if self._rejected:
+            self.state.revert()
+            self._rejected = False
+
+        validator_snapshot = getattr(self.is_valid, 'snapshot', None)
+        snapshot = {
+            'counter': self.counter,
+            'total_steps': self.total_steps,
+            'checkpoint_every': self.checkpoint_every,
+            'thin': self.thin,
+            'random_state': random.getstate(),
+            'state': self.state.snapshot(),
+            'validator': validator_snapshot() if validator_snapshot else None,
+            'configuration': {'proposal': _picklable(self.proposal),
+                              'is_valid': _picklable(self.is_valid),
+                              'accept': _picklable(self.accept),
+                              'updaters': _picklable(self.state.updaters)}
+        }
+
+        temporary_path = path + '.tmp'
+        with open(temporary_path, 'wb') as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def resume(cls, path, graph, proposal=None, is_valid=None, accept=None, updaters=None,
+               checkpoint_path=None):
+        """
+        Continue a chain from a :meth:`checkpoint`. Iterating over the resumed
+        chain yields the states that the original chain would have yielded
+        after the checkpoint, and it sets the state of the :mod:`random`
+        module to what it was then.
+
+        :path: Path of the checkpoint.
+        :graph: The graph that the chain's partitions were created with.
+        :proposal: (optional) The proposal, if it could not be saved.
+        :is_valid: (optional) The validator, if it could not be saved. Its
+                   state is restored from the checkpoint.
+        :accept: (optional) The acceptance function, if it could not be saved.
+        :updaters: (optional) The updaters, if they could not be saved.
+        :checkpoint_path: (optional) Path to save checkpoints to from now on,
+                          every as many steps as before. Defaults to `path`.
+
+        """
+        with open(path, 'rb') as f:
+            snapshot = pickle.load(f)
+
+        configuration = dict(snapshot['configuration'])
+        given = {'proposal': proposal, 'is_valid': is_valid, 'accept': accept,
+                 'updaters': updaters}
+        configuration.update((name, value) for name, value in given.items() if value is not None)
+
+        missing = [name for name, value in configuration.items() if value is None]
+        if missing:
+            raise ValueError("The checkpoint could not save the chain's {}, so they must "
+                             "be passed to resume().".format(', '.join(missing)))
+
+        state = Partition.from_snapshot(graph, configuration['updaters'], snapshot['state'])
+        chain = cls(configuration['proposal'], configuration['is_valid'],
+                    configuration['accept'], state, snapshot['total_steps'],
+                    checkpoint_path or path, snapshot['checkpoint_every'],
+                    thin=snapshot['thin'])
+
+        if snapshot['validator'] is not None:
+            chain.is_valid.restore(snapshot['validator'])
+        chain._first_step = chain.counter = snapshot['counter']
+        random.setstate(snapshot['random_state'])
+        return chain
+
+    def __len__(self):
+        """The number of states that iterating over the chain yields."""
+        return math.ceil(self.total_steps / self.thin)
+
+
+def _picklable(value):
+    """Return the value if it can be pickled, and None otherwise."""
+    try:
+        pickle.dumps(value)
+    except (pickle.PicklingError, AttributeError, TypeError):
+        return None
+    return value
+
+
+class RejectionFreeChain:
+    """
+    RejectionFreeChain is an iterator over the states of a single-flip Markov
+    chain that never rejects a proposal.
+
+    It runs the same chain as a :class:`MarkovChain` that proposes a random
+    flip across a random cut edge (like
+    :func:`~rundmcmc.proposals.propose_random_flip`). But instead of drawing
+    proposals until one is valid and accepted, it keeps the validity of
+    every flip across the cut edges (see
+    :func:`~rundmcmc.updaters.metagraph_degree.metagraph_degree`), and draws
+    the next state directly from the valid flips, weighted by their
+    acceptance probabilities. After each state is yielded,
+    :attr:`holding_time` is the expected number of steps that the
+    :class:`MarkovChain` would have yielded that state for, so weighting each
+    state by its holding time gives the same ensemble.
+
+    Example usage:
+
+    .. code-block:: python
+
+        chain = RejectionFreeChain(is_valid, initial_state, acceptance)
+        for state in chain:
+            scores.append((score(state), chain.holding_time))
+
+    """
+
+    def __init__(self, is_valid, initial_state, acceptance=None, self_loops=False,
+                 total_steps=1000, rng=random):
+        """
+        :is_valid: :class:`~rundmcmc.validity.Validator` class instance. The
+                   flips between two parts are only tried again when those
+                   parts change if all of its constraints are local.
+        :initial_state: Initial :class:`rundmcmc.partition.Partition` class,
+                        with a `cut_edges` updater.
+        :acceptance: (optional) Function of a proposed partition, whose parent
+                     is the current state, returning the probability of
+                     accepting it. By default, every valid flip is accepted.
+                     Its probabilities are cached by the pair of parts that
+                     each flip moves a node between, like the validity of the
+                     flips, and only computed again for the pairs whose parts
+                     changed if it has a true ``local`` attribute (its
+                     probability for a flip only depends on those two parts).
+                     Otherwise, every step merges and scores a partition for
+                     each distinct valid flip, which costs
+                     ``O(|cut edges|)`` merges per step.
+        :self_loops: If True, the holding times are those of a chain that
+                     stays in place with probability ``1 - valid /
+                     partition.max_edge_cuts`` before proposing a valid flip,
+                     like :func:`~rundmcmc.proposals.propose_random_flip_metagraph`.
+        :total_steps: Number of states to yield.
+        :rng: The random number generator to draw the flips from, like a
+              :class:`~rundmcmc.rng.RandomStream`; defaults to the
+              :mod:`random` module.
+
+        """
+        if not is_valid(initial_state):
+            raise ValueError('The given initial_state is not valid according is_valid.')
+
+        self.is_valid = is_valid
+        self.acceptance = acceptance
+        self.self_loops = self_loops
+        self.total_steps = total_steps
+        self.state = initial_state
+        self.rng = rng
+
+    def __iter__(self):
+        self.counter = 0
+        self.holding_time = None
+        self._degree = None
+        self._acceptance = None
+        return self
+
+    def __next__(self):
+        if self.counter >= self.total_steps or self.holding_time == math.inf:
+            raise StopIteration
+
+        previous = None
+        if self._degree is None:
+            self._degree = metagraph_degree(self.state, self.is_valid)
+        else:
+            previous, previous_degree = self.state, self._degree
+            self.state = previous.merge(self._choose_flip())
+            self._degree = metagraph_degree(self.state, self.is_valid, previous,
+                                            previous_degree)
+            # Drop the reference to the previous state, so that the chain
+            # of parents does not grow.
+            self.state.parent = None
+
+        self._moves, self._weights = self._valid_moves(previous)
+        total_weight = len(self._moves) if self._weights is None else sum(self._weights)
+
+        if not total_weight:
+            # There is nowhere to go, so the chain would stay here forever.
+            self.holding_time = math.inf
+        elif self.self_loops:
+            self.holding_time = self.state.max_edge_cuts / total_weight
+        else:
+            self.holding_time = len(self._moves) / total_weight
+
+        self.counter += 1
+        return self.state
+
+    def _valid_moves(self, previous=None):
+        """
+        :previous: (optional) The state that the current state was obtained
+                   from, whose acceptance probabilities are reused for the
+                   parts that did not change.
+        :returns: The valid flips `(node, part)` of the current state, once
+                  for each cut edge that they flip across, and their
+                  acceptance probabilities (or None if they are all accepted).
+        """
+        assignment = self.state.assignment
+        cached = self._degree['flips']
+        moves = []
+
+        for edge in self.state['cut_edges']:
+            for node, other in (edge, reversed(edge)):
+                part, new_part = assignment[node], assignment[other]
+                if cached[frozenset((part, new_part))][(node, new_part)]:
+                    moves.append((node, new_part))
+
+        if self.acceptance is None:
+            return moves, None
+
+        if previous is None or not getattr(self.acceptance, 'local', False):
+            self._acceptance = {}
+        else:
+            changed_parts = _changed_parts(previous, self.state)
+            self._acceptance = {parts: probabilities
+                                for parts, probabilities in self._acceptance.items()
+                                if not parts & changed_parts}
+
+        weights = []
+        for move in moves:
+            node, new_part = move
+            probabilities = self._acceptance.setdefault(
+                frozenset((assignment[node], new_part)), {})
+            if move not in probabilities:
+                probabilities[move] = self.acceptance(self.state.merge(dict([move])))
+            weights.append(probabilities[move])
+        return moves, weights
+
+    def _choose_flip(self):
+        if self._weights is None:
+            node, part = self.rng.choice(self._moves)
+        else:
+            node, part = self.rng.choices(self._moves, weights=self._weights)[0]
+        return {node: part}
+
     def __len__(self):
         return self.total_steps
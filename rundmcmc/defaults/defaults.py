@@ -21,8 +21,7 @@ from rundmcmc.validity import (L1_reciprocal_polsby_popper, UpperBound,
 import os
 
 default_constraints = [single_flip_contiguous,
-                       no_vanishing_districts,
-                       refuse_new_splits]
+                       no_vanishing_districts]
 
 FILE_PATH = os.path.dirname(os.path.abspath(__file__))
 TEST_DATA_PATH = os.path.join(FILE_PATH, "testData/")
@@ -43,7 +42,7 @@ def example_partition():
 
     updaters = {
         **votes_updaters(['PR_DV08', 'PR_RV08'], election_name='08'),
-        'population': Tally('POP100', alias='population'),
+        'population': Tally('POP100', alias='population', extremes=True),
         'counties': county_splits('counties', 'COUNTYFP10'),
         'cut_edges': cut_edges,
         'cut_edges_by_part': cut_edges_by_part
@@ -66,7 +65,7 @@ def PA_partition(path=None):
 
     updaters = {
             **votes_updaters(['VoteA', 'VoteB']),
-            'population': Tally('POP100', alias='population'),
+            'population': Tally('POP100', alias='population', extremes=True),
             'perimeters': perimeters,
             'exterior_boundaries': exterior_boundaries,
             'interior_boundaries': interior_boundaries,
@@ -85,7 +84,10 @@ class BasicChain(MarkovChain):
     The standard MarkovChain for replicating the Pennsylvania analysis. The proposal
     is a single random flip at the boundary of a district. A step is valid if the
     districts are connected, no districts disappear, and the populations of the districts
-    are all within 1% of one another. Accepts every valid proposal.
+    are all within 1% of one another. If the partition has a 'counties' updater (from
+    :func:`~rundmcmc.updaters.county_splits`), a step must also not split any new
+    counties; since a county that becomes whole can never be split again, such a chain
+    can get stuck where no flip is valid. Accepts every valid proposal.
 
     Requires a lot of different updaters.
     """
@@ -107,7 +109,10 @@ class BasicChain(MarkovChain):
         compactness_limit = L1_reciprocal_polsby_popper(initial_state)
         compactness_constraint = UpperBound(L1_reciprocal_polsby_popper, compactness_limit)
 
-        validator = Validator(default_constraints + [population_constraint, compactness_constraint])
+        constraints = default_constraints + [population_constraint, compactness_constraint]
+        if 'counties' in initial_state.updaters:
+            constraints.append(refuse_new_splits('counties'))
+        validator = Validator(constraints)
 
         super().__init__(propose_random_flip, validator, always_accept, initial_state,
                          total_steps=total_steps)
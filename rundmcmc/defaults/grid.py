@@ -37,7 +37,7 @@ class Grid(Partition):
 
             if not updaters:
                 updaters = {'cut_edges': cut_edges,
-                            'population': Tally('population'),
+                            'population': Tally('population', extremes=True),
                             'cut_edges_by_part': cut_edges_by_part}
 
             super().__init__(graph, assignment, updaters)
@@ -0,0 +1,319 @@
+import collections.abc
+from multiprocessing import shared_memory
+
+import networkx
+import numpy
+
+
+class FrozenGraph:
+    """
+    Read-only graph stored in flat NumPy arrays, which can be placed in shared
+    memory so that worker processes use the same copy.
+
+    The nodes are the integers ``0..n-1``; :attr:`node_labels` holds their
+    original IDs. The adjacency is in compressed sparse row (CSR) form: the
+    neighbors of node ``i`` are ``indices[indptr[i]:indptr[i + 1]]``, in
+    increasing order. Each numeric node attribute is a column with one entry
+    per node, and each numeric edge attribute is a column with one entry per
+    CSR entry (so every edge appears twice, once from each end). Attributes
+    that NumPy cannot store as numbers, like county names, are kept in plain
+    lists, which are copied rather than shared.
+
+    The graph supports the part of the NetworkX interface that partitions,
+    updaters and validators use: iterating over it and :attr:`nodes`,
+    ``graph.nodes[node][attribute]``, :meth:`neighbors`, ``graph[node]``
+    (neighbors mapped to edge attributes), :attr:`edges`,
+    ``graph.edges[u, v][attribute]`` and :meth:`subgraph`.
+
+    A graph created with ``shared=True`` keeps its arrays in
+    :mod:`multiprocessing.shared_memory` blocks. Pickling it, for instance to
+    send it to the workers of a :class:`multiprocessing.Pool`, only sends the
+    names of the blocks, and unpickling attaches to them without copying. The
+    process that created the graph should call :meth:`unlink` (or use the
+    graph as a context manager) when every process is done with it.
+
+    """
+
+    def __init__(self, node_labels, indptr, indices, node_columns, edge_columns,
+                 blocks=None):
+        """
+        :node_labels: The original IDs of the nodes, as a list.
+        :indptr: CSR row pointers, an array of length ``n + 1``.
+        :indices: CSR column indices, sorted within each row.
+        :node_columns: Dictionary from node attribute names to arrays or lists
+                       of length ``n``.
+        :edge_columns: Dictionary from edge attribute names to arrays or lists
+                       with one entry per CSR entry.
+        :blocks: (optional) Dictionary from the keys of the arrays to the
+                 shared memory blocks holding them.
+
+        """
+        self.node_labels = node_labels
+        self.indptr = indptr
+        self.indices = indices
+        self.node_columns = node_columns
+        self.edge_columns = edge_columns
+        self._blocks = blocks or {}
+
+        self.nodes = _NodeView(self)
+        self.edges = _EdgeView(self)
+
+    @classmethod
+    def from_networkx(cls, graph, shared=False):
+        """
+        :graph: NetworkX graph to freeze.
+        :shared: Whether to place the arrays in shared memory.
+        :returns: A :class:`FrozenGraph` with the nodes relabeled to ``0..n-1``
+                  in the order of ``graph.nodes``, and all of their attributes.
+
+        """
+        node_labels = list(graph.nodes)
+        node_indices = {label: index for index, label in enumerate(node_labels)}
+
+        rows = [sorted((node_indices[neighbor], neighbor) for neighbor in graph.neighbors(label))
+                for label in node_labels]
+        indptr = numpy.zeros(len(node_labels) + 1, dtype=numpy.int64)
+        indptr[1:] = numpy.cumsum([len(row) for row in rows])
+        indices = numpy.array([index for row in rows for index, _ in row], dtype=numpy.int32)
+
+        node_names = {name for label in node_labels for name in graph.nodes[label]}
+        node_columns = {name: _column([graph.nodes[label].get(name) for label in node_labels])
+                        for name in node_names}
+
+        edge_names = {name for _, _, data in graph.edges(data=True) for name in data}
+        edge_columns = {name: _column([graph.edges[label, neighbor].get(name)
+                                       for label, row in zip(node_labels, rows)
+                                       for _, neighbor in row])
+                        for name in edge_names}
+
+        frozen = cls(node_labels, indptr, indices, node_columns, edge_columns)
+        if shared:
+            return frozen.share()
+        return frozen
+
+    def share(self):
+        """
+        :returns: A copy of this graph with its arrays in shared memory.
+        """
+        blocks = {}
+
+        def to_shared(key, array):
+            if not isinstance(array, numpy.ndarray):
+                return array
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            blocks[key] = block
+            shared = numpy.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+            shared[...] = array
+            return shared
+
+        return self.__class__(self.node_labels, *self._map_arrays(to_shared), blocks)
+
+    def _map_arrays(self, function):
+        """Apply `function(key, array)` to the CSR arrays and the columns, where
+        `key` names the array within the graph."""
+        return (function('indptr', self.indptr), function('indices', self.indices),
+                {name: function(('node', name), column)
+                 for name, column in self.node_columns.items()},
+                {name: function(('edge', name), column)
+                 for name, column in self.edge_columns.items()})
+
+    @property
+    def shared(self):
+        return bool(self._blocks)
+
+    def __reduce__(self):
+        if not self.shared:
+            return (self.__class__, (self.node_labels, *self._map_arrays(lambda key, array: array)))
+
+        def describe(key, array):
+            if key not in self._blocks:
+                return array
+            return _SharedArray(self._blocks[key].name, array.shape, array.dtype.str)
+
+        return (_attach, (self.node_labels, *self._map_arrays(describe)))
+
+    def close(self):
+        """Detach this process from the shared memory of the graph. The graph
+        must not be used afterwards."""
+        for block in self._blocks.values():
+            block.close()
+
+    def unlink(self):
+        """Free the shared memory of the graph. Only the process that created
+        the graph should call this, after every process is done with it."""
+        for block in self._blocks.values():
+            block.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.unlink()
+
+    def __iter__(self):
+        return iter(range(len(self.node_labels)))
+
+    def __len__(self):
+        return len(self.node_labels)
+
+    def __contains__(self, node):
+        return node in self.nodes
+
+    def __getitem__(self, node):
+        return _Adjacency(self, node)
+
+    def number_of_nodes(self):
+        return len(self)
+
+    def neighbors(self, node):
+        """:returns: List of the neighbors of the node, in increasing order."""
+        return self.indices[self.indptr[node]:self.indptr[node + 1]].tolist()
+
+    def degree(self, node):
+        return int(self.indptr[node + 1] - self.indptr[node])
+
+    def subgraph(self, nodes):
+        """
+        :returns: The subgraph induced by the given nodes, as a new NetworkX
+                  graph without attributes.
+        """
+        nodes = set(nodes)
+        subgraph = networkx.Graph()
+        subgraph.add_nodes_from(nodes)
+        subgraph.add_edges_from((node, neighbor) for node in nodes
+                                for neighbor in self.neighbors(node) if neighbor in nodes)
+        return subgraph
+
+    def _entry(self, node, neighbor):
+        """The CSR entry of the edge from `node` to `neighbor`."""
+        start, end = self.indptr[node], self.indptr[node + 1]
+        entry = start + numpy.searchsorted(self.indices[start:end], neighbor)
+        if entry == end or self.indices[entry] != neighbor:
+            raise KeyError((node, neighbor))
+        return int(entry)
+
+    def __repr__(self):
+        shared = "shared " if self.shared else ""
+        return f"<{shared}{self.__class__.__name__} with {len(self)} nodes and " \
+               f"{len(self.edges)} edges>"
+
+
+_SharedArray = collections.namedtuple("_SharedArray", "name shape dtype")
+
+
+def _attach(node_labels, indptr, indices, node_columns, edge_columns):
+    """Rebuild a pickled shared :class:`FrozenGraph` by attaching to its blocks."""
+    graph = FrozenGraph(node_labels, indptr, indices, node_columns, edge_columns)
+    blocks = {}
+
+    def attach(key, description):
+        if not isinstance(description, _SharedArray):
+            return description
+        blocks[key] = shared_memory.SharedMemory(name=description.name)
+        return numpy.ndarray(description.shape, dtype=description.dtype,
+                             buffer=blocks[key].buf)
+
+    return FrozenGraph(node_labels, *graph._map_arrays(attach), blocks)
+
+
+def _column(values):
+    """An array of the values if NumPy can store them as numbers, and
+    otherwise the list itself."""
+    if any(value is None for value in values):
+        return values
+    array = numpy.asarray(values)
+    if array.dtype.kind not in 'biuf':
+        return values
+    return array
+
+
+def _value(column, index):
+    value = column[index]
+    if isinstance(value, numpy.generic):
+        return value.item()
+    return value
+
+
+class _NodeView(collections.abc.Set):
+    def __init__(self, graph):
+        self._graph = graph
+
+    def __call__(self):
+        return self
+
+    def __iter__(self):
+        return iter(self._graph)
+
+    def __len__(self):
+        return len(self._graph)
+
+    def __contains__(self, node):
+        return isinstance(node, (int, numpy.integer)) and 0 <= node < len(self._graph)
+
+    def __getitem__(self, node):
+        if node not in self:
+            raise KeyError(node)
+        return _Attributes(self._graph.node_columns, node)
+
+
+class _EdgeView(collections.abc.Set):
+    def __init__(self, graph):
+        self._graph = graph
+
+    def __call__(self):
+        return self
+
+    def __iter__(self):
+        graph = self._graph
+        for node in graph:
+            for neighbor in graph.neighbors(node):
+                if node < neighbor:
+                    yield (node, neighbor)
+
+    def __len__(self):
+        return len(self._graph.indices) // 2
+
+    def __contains__(self, edge):
+        try:
+            self._graph._entry(*edge)
+        except (KeyError, IndexError, TypeError, ValueError):
+            return False
+        return True
+
+    def __getitem__(self, edge):
+        return _Attributes(self._graph.edge_columns, self._graph._entry(*edge))
+
+
+class _Adjacency(collections.abc.Mapping):
+    """The neighbors of a node, mapped to the attributes of the edges to them."""
+
+    def __init__(self, graph, node):
+        self._graph = graph
+        self._node = node
+
+    def __iter__(self):
+        return iter(self._graph.neighbors(self._node))
+
+    def __len__(self):
+        return self._graph.degree(self._node)
+
+    def __getitem__(self, neighbor):
+        return _Attributes(self._graph.edge_columns, self._graph._entry(self._node, neighbor))
+
+
+class _Attributes(collections.abc.Mapping):
+    """The attributes of one node or edge, read from the columns."""
+
+    def __init__(self, columns, index):
+        self._columns = columns
+        self._index = index
+
+    def __getitem__(self, name):
+        return _value(self._columns[name], self._index)
+
+    def __iter__(self):
+        return (name for name, column in self._columns.items()
+                if column[self._index] is not None)
+
+    def __len__(self):
+        return sum(1 for _ in self)
@@ -42,7 +42,10 @@ class PeriodicFlipsReport:
 
 
 def flips_to_dict(chain, handlers=None):
-    hist = {0: chain.state.assignment}
-    for state in chain:
-        hist[chain.counter + 1] = state.flips
+    """Return the initial assignment (at step 0) and the accepted flips of
+    every later step, keyed by step."""
+    hist = {0: dict(chain.state.assignment)}
+    for step, flips, accepted, _ in chain.deltas():
+        if step > 0:
+            hist[step] = flips if accepted else {}
     return hist
@@ -0,0 +1,172 @@
+import collections.abc
+
+
+class _Store:
+    """The array and position map shared by every version of an IndexedSet."""
+
+    def __init__(self, items):
+        self.items = items
+        self.positions = {item: index for index, item in enumerate(items)}
+        self.live = None
+
+
+class IndexedSet(collections.abc.Set):
+    """
+    Read-only set that can also be indexed like a sequence, so that
+    ``random.choice(indexed_set)`` draws a uniform element in ``O(1)``.
+
+    The elements are kept in an array, along with a dictionary of their
+    positions in the array; removing an element swaps the last element into
+    its slot. :meth:`update` returns a new version of the set, and every
+    version shares the same array: only the latest version accessed is stored
+    in it, and the others keep the list of changes that lead to it from them.
+    Accessing another version replays those changes backwards (and records the
+    inverse changes on the version it leaves), so moving between a partition
+    and its parent costs ``O(|changes|)`` rather than a copy of the set.
+
+    """
+
+    def __init__(self, items=()):
+        """
+        :items: Iterable of the elements of the set.
+
+        """
+        items = list(dict.fromkeys(items))
+        self._store = _Store(items)
+        self._store.live = self
+        self._length = len(items)
+        # While this version is not the live one, _next is the version that is
+        # closer to it, and _changes turns that version into this one.
+        self._next = None
+        self._changes = None
+
+    @classmethod
+    def _from_iterable(cls, iterable):
+        # The results of set operations like | and - are plain sets.
+        return set(iterable)
+
+    def update(self, added=(), removed=()):
+        """
+        :added: Elements to add to the set.
+        :removed: Elements to remove from the set. These are removed after
+                  the added elements are added.
+        :returns: A new :class:`IndexedSet` with the changes applied. This
+                  version is left unchanged.
+
+        """
+        self._reroot()
+        store = self._store
+        changes = []
+
+        for item in added:
+            if item not in store.positions:
+                changes.append(_add(store, item))
+        for item in removed:
+            if item in store.positions:
+                changes.append(_remove(store, item))
+
+        new = object.__new__(self.__class__)
+        new._store = store
+        new._length = len(store.items)
+        new._next = None
+        new._changes = None
+
+        self._next = new
+        self._changes = [_inverse(change) for change in reversed(changes)]
+        store.live = new
+        return new
+
+    def _reroot(self):
+        store = self._store
+        if store.live is self:
+            return
+
+        path = []
+        version = self
+        while version._next is not None:
+            path.append(version)
+            version = version._next
+
+        for version in reversed(path):
+            following = version._next
+            inverse = [_inverse(change) for change in reversed(version._changes)]
+            for change in version._changes:
+                _apply(store, change)
+            following._next = version
+            following._changes = inverse
+            version._next = None
+            version._changes = None
+
+        store.live = self
+
+    def __getitem__(self, index):
+        self._reroot()
+        return self._store.items[index]
+
+    def __contains__(self, item):
+        self._reroot()
+        return item in self._store.positions
+
+    def __iter__(self):
+        self._reroot()
+        return iter(list(self._store.items))
+
+    def __len__(self):
+        return self._length
+
+    def __reduce__(self):
+        return (self.__class__, (list(self),))
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({list(self)!r})"
+
+
+# A change is ('add', item, index), which appends item at position index, or
+# ('remove', item, index), which swap-removes item from position index, or
+# ('restore', item, index), which undoes that removal exactly.
+
+def _add(store, item):
+    index = len(store.items)
+    store.positions[item] = index
+    store.items.append(item)
+    return ('add', item, index)
+
+
+def _remove(store, item):
+    index = store.positions.pop(item)
+    last = store.items.pop()
+    if index < len(store.items):
+        store.items[index] = last
+        store.positions[last] = index
+    return ('remove', item, index)
+
+
+def _restore(store, item, index):
+    if index < len(store.items):
+        moved = store.items[index]
+        store.positions[moved] = len(store.items)
+        store.items.append(moved)
+        store.items[index] = item
+    else:
+        store.items.append(item)
+    store.positions[item] = index
+
+
+def _apply(store, change):
+    kind, item, index = change
+    if kind == 'add':
+        _add(store, item)
+    elif kind == 'remove':
+        _remove(store, item)
+    else:
+        _restore(store, item, index)
+
+
+def _inverse(change):
+    kind, item, index = change
+    if kind == 'restore':
+        return ('remove', item, index)
+    if kind == 'remove':
+        return ('restore', item, index)
+    # Removing the last element does not move any other element.
+    return ('remove', item, index)
@@ -1,2 +1,3 @@
 from .output import ChainOutputTable, p_value_report, pipe_to_table, handle_scores_separately
+from .diagnostics import BatchMeans, Diagnostics, split_r_hat
 from .vis_output import hist_of_table_scores, trace_of_table_scores
@@ -0,0 +1,305 @@
+"""
+Convergence diagnostics that are updated one score at a time, as a chain
+runs, in constant memory: effective sample size, batch-means variance,
+integrated autocorrelation time and split R-hat.
+
+Example usage, stopping a chain once every score has an effective sample
+size of 1000:
+
+.. code-block:: python
+
+    diagnostics = Diagnostics({'Mean-Median': mean_median}, min_ess=1000)
+    for state in diagnostics.monitor(chain):
+        # Do whatever you want with the states
+
+    print(diagnostics.report())
+
+For an ensemble, pass the scores of each chain along with its index:
+
+.. code-block:: python
+
+    diagnostics = Diagnostics(scores, min_ess=1000, max_r_hat=1.01)
+    for chain_index, step, row in runner.run():
+        diagnostics.update(row, chain=chain_index)
+        if diagnostics.converged():
+            break
+
+"""
+import collections
+import math
+
+
+class BatchMeans:
+    """
+    Streaming statistics of one score along one chain.
+
+    The values are grouped into consecutive batches of equal size, of which
+    at most `number_of_batches` are kept: when they are all full, neighboring
+    batches are merged and the batch size doubles. Each batch keeps its count,
+    mean and sum of squared deviations, so it takes constant memory.
+
+    The variance of the batch means estimates the asymptotic variance of the
+    chain's mean (the batch-means estimator), and its ratio to the variance of
+    the values is the integrated autocorrelation time. The first and second
+    halves of the batches give the split chains for R-hat.
+
+    """
+
+    def __init__(self, number_of_batches=128):
+        """
+        :number_of_batches: The most batches to keep; it must be even.
+        """
+        if number_of_batches < 4 or number_of_batches % 2:
+            raise ValueError("The number of batches must be an even number of at least 4.")
+        self.number_of_batches = number_of_batches
+
+        self.total = Moments()
+        self.batch_size = 1
+        self.batches = []
+        self._batch = Moments()
+
+    def update(self, value):
+        self.total.update(value)
+        self._batch.update(value)
+
+        if self._batch.count == self.batch_size:
+            self.batches.append(self._batch)
+            self._batch = Moments()
+
+            if len(self.batches) == self.number_of_batches:
+                self.batches = [first.merged(second)
+                                for first, second in zip(self.batches[::2], self.batches[1::2])]
+                self.batch_size *= 2
+
+    @property
+    def count(self):
+        return self.total.count
+
+    @property
+    def mean(self):
+        return self.total.mean
+
+    @property
+    def asymptotic_variance(self):
+        """The batch-means estimate of the variance of the mean, times the
+        number of values; None until there are two full batches."""
+        if len(self.batches) < 2:
+            return None
+        means = Moments()
+        for batch in self.batches:
+            means.update(batch.mean)
+        return self.batch_size * means.variance
+
+    @property
+    def standard_error(self):
+        """The Monte Carlo standard error of the mean."""
+        variance = self.asymptotic_variance
+        if variance is None:
+            return None
+        return math.sqrt(variance / self.count)
+
+    @property
+    def integrated_autocorrelation_time(self):
+        variance = self.asymptotic_variance
+        if variance is None:
+            return None
+        if self.total.variance == 0:
+            # A constant score is as good as independent.
+            return 1.0
+        return variance / self.total.variance
+
+    @property
+    def effective_sample_size(self):
+        """The number of values divided by the integrated autocorrelation
+        time; None while the batches are shorter than five autocorrelation
+        times, since the estimate is too low until then (Sokal's rule)."""
+        time = self.integrated_autocorrelation_time
+        if time is None or self.batch_size < 5 * time:
+            return None
+        if time == 0:
+            return math.inf
+        return self.count / time
+
+    def halves(self):
+        """
+        :returns: The :class:`Moments` of the first and second halves of the
+                  full batches, for split R-hat. With an odd number of
+                  batches, the middle one is left out.
+        """
+        half = len(self.batches) // 2
+        return (Moments.combine(self.batches[:half]),
+                Moments.combine(self.batches[len(self.batches) - half:]))
+
+
+class Moments:
+    """Count, mean and sum of squared deviations of some values, updated with
+    Welford's algorithm."""
+
+    def __init__(self, count=0, mean=0.0, squares=0.0):
+        self.count = count
+        self.mean = mean
+        self.squares = squares
+
+    def update(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.squares += delta * (value - self.mean)
+
+    def merged(self, other):
+        """:returns: The moments of the values of both."""
+        count = self.count + other.count
+        if count == 0:
+            return Moments()
+        delta = other.mean - self.mean
+        squares = self.squares + other.squares + delta * delta * self.count * other.count / count
+        return Moments(count, self.mean + delta * other.count / count, squares)
+
+    @classmethod
+    def combine(cls, moments):
+        combined = cls()
+        for item in moments:
+            combined = combined.merged(item)
+        return combined
+
+    @property
+    def variance(self):
+        """The sample variance, or 0 with fewer than two values."""
+        if self.count < 2:
+            return 0.0
+        return self.squares / (self.count - 1)
+
+
+def split_r_hat(chains):
+    """
+    :chains: :class:`BatchMeans` of the same score along one or more chains.
+    :returns: The split R-hat of the score (Gelman et al.), from the first and
+              second halves of each chain, or None if some chain does not
+              have two full batches yet.
+    """
+    halves = []
+    for chain in chains:
+        if len(chain.batches) < 2:
+            return None
+        halves.extend(chain.halves())
+
+    length = sum(half.count for half in halves) / len(halves)
+    within = sum(half.variance for half in halves) / len(halves)
+    means = Moments()
+    for half in halves:
+        means.update(half.mean)
+    between = means.variance
+
+    if within == 0:
+        return 1.0 if between == 0 else math.inf
+    pooled = (length - 1) / length * within + between
+    return math.sqrt(pooled / within)
+
+
+class Diagnostics:
+    """
+    Streaming convergence diagnostics of some scores, for one chain or an
+    ensemble of chains, with an optional stopping rule.
+
+    Each score of each chain is a :class:`BatchMeans`. Across chains, the
+    effective sample sizes add up, and split R-hat compares the halves of
+    every chain.
+
+    """
+
+    def __init__(self, scores, number_of_batches=128, min_ess=None, max_r_hat=None,
+                 check_every=1000):
+        """
+        :scores: Dictionary from score names to functions of a partition, or
+                 just the names if the scores are passed to :meth:`update`.
+        :number_of_batches: The most batches to keep for each score of each
+                            chain.
+        :min_ess: (optional) The effective sample size that every score must
+                  reach for :meth:`converged`.
+        :max_r_hat: (optional) The split R-hat that every score must be under
+                    for :meth:`converged`.
+        :check_every: Number of states between checks of the stopping rule in
+                      :meth:`monitor`.
+
+        """
+        self.scores = scores
+        self.number_of_batches = number_of_batches
+        self.min_ess = min_ess
+        self.max_r_hat = max_r_hat
+        self.check_every = check_every
+
+        self.chains = collections.defaultdict(
+            lambda: {name: BatchMeans(number_of_batches) for name in scores})
+
+    def update(self, row, chain=0):
+        """
+        :row: Dictionary from score names to the scores of a state.
+        :chain: The index of the chain that the state is from.
+        """
+        statistics = self.chains[chain]
+        for name, value in row.items():
+            statistics[name].update(value)
+
+    def observe(self, partition, chain=0):
+        """Compute the scores of the partition, and :meth:`update` with them."""
+        self.update({name: score(partition) for name, score in self.scores.items()}, chain)
+
+    def monitor(self, chain, chain_index=0):
+        """
+        Iterate over the chain, observing every state, and stop once the
+        diagnostics have :meth:`converged` (checking every `check_every`
+        states).
+
+        :returns: A generator of the states of the chain.
+        """
+        for counter, state in enumerate(chain, 1):
+            self.observe(state, chain_index)
+            yield state
+            if counter % self.check_every == 0 and self.converged():
+                return
+
+    def effective_sample_size(self, name):
+        sizes = [chain[name].effective_sample_size for chain in self.chains.values()]
+        if not sizes or None in sizes:
+            return None
+        return sum(sizes)
+
+    def r_hat(self, name):
+        return split_r_hat([chain[name] for chain in self.chains.values()])
+
+    def converged(self):
+        """
+        :returns: True if every score has reached `min_ess` and is under
+                  `max_r_hat` (when they are given).
+        """
+        for name in self.scores:
+            if self.min_ess is not None:
+                size = self.effective_sample_size(name)
+                if size is None or size < self.min_ess:
+                    return False
+            if self.max_r_hat is not None:
+                r_hat = self.r_hat(name)
+                if r_hat is None or r_hat > self.max_r_hat:
+                    return False
+        return True
+
+    def report(self):
+        """
+        :returns: Dictionary from score names to dictionaries with their
+                  `count`, `mean`, effective sample size `ess`, integrated
+                  autocorrelation time `iat`, Monte Carlo `standard_error`
+                  of the mean, and split `r_hat`, over all chains.
+        """
+        report = {}
+        for name in self.scores:
+            chains = [chain[name] for chain in self.chains.values()]
+            total = Moments.combine(chain.total for chain in chains)
+            size = self.effective_sample_size(name)
+            report[name] = {
+                'count': total.count,
+                'mean': total.mean,
+                'ess': size,
+                'iat': total.count / size if size else None,
+                'standard_error': math.sqrt(total.variance / size) if size else None,
+                'r_hat': self.r_hat(name)}
+        return report
@@ -115,20 +115,40 @@ def get_chain_scores(chain, handlers):
 
 
 def pipe_to_table(chain, handlers, display=True, number_to_display=10,
-                  number_to_bin=100):
+                  number_to_bin=100, thin=None):
+    """Score some of the states of the chain, and collect the scores in a table.
+
+    The handlers are only called on the states that are kept in the table or
+    displayed, so the other states cost nothing but running the chain.
+
+    :chain: :class:`rundmcmc.chain.MarkovChain` instance.
+    :handlers: Dictionary of {name: func} pairs.
+    :display: Whether to print some of the rows.
+    :number_to_display: Roughly how many rows to print.
+    :number_to_bin: Roughly how many rows to keep, if `thin` is not given.
+    :thin: (optional) Keep the scores of every `thin`-th state the chain
+           yields. For a long run, consider also passing `thin` to the
+           chain itself, so that it does not yield the states in between.
+    :returns: A :class:`ChainOutputTable` of the kept rows.
+
+    """
     table = ChainOutputTable()
-    display_interval = math.floor(len(chain) / number_to_display)
-    bin_interval = math.floor(len(chain) / number_to_bin)
-    counter = 0
-
-    for row in get_chain_scores(chain, handlers):
-        if counter % display_interval == 0:
-            if display:
-                print(f"Step {counter}")
-                print(row)
-        if counter % bin_interval == 0:
+    display_interval = max(1, math.floor(len(chain) / number_to_display))
+    if thin is None:
+        thin = max(1, math.floor(len(chain) / number_to_bin))
+
+    for counter, state in enumerate(chain):
+        kept = counter % thin == 0
+        displayed = display and counter % display_interval == 0
+        if not (kept or displayed):
+            continue
+
+        row = {key: handler(state) for key, handler in handlers.items()}
+        if displayed:
+            print(f"Step {counter}")
+            print(row)
+        if kept:
             table.append(row)
-        counter += 1
     return table
 
 
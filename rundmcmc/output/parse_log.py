@@ -1,27 +1,53 @@
-from collections import Counter
+"""
+Plot how often each constraint of a chain's Validator rejected a proposal,
+and how much time was spent checking it, from the counters returned by
+:meth:`~rundmcmc.validity.Validator.statistics` and saved as JSON::
+
+    with open("constraints.json", "w") as f:
+        json.dump(validator.statistics(), f)
+
+Then run::
+
+    python parse_log.py constraints.json
+
+"""
+import json
+import sys
+
 import matplotlib.pyplot as plt
 import numpy as np
-import re
 
-log_name = "template.log"
 
-regex = re.compile("constraint failed: (.*)")
+def plot_constraint_statistics(statistics):
+    """
+    :statistics: List of dictionaries from
+                 :meth:`~rundmcmc.validity.Validator.statistics`.
+
+    """
+    labels = [item['name'] for item in statistics]
+    indexes = np.arange(len(labels))
+    width = 1
+
+    plt.style.use("ggplot")
+    figure, (rejections, times) = plt.subplots(1, 2)
 
-fails = []
-with open(log_name) as f:
-    for line in f:
-        match = regex.search(line.strip())
+    # Rejections and time of the constraints and of their pre-merge checks,
+    # which older logs do not have.
+    rejections.bar(indexes, [item['rejections'] + item.get('check_rejections', 0)
+                             for item in statistics], width)
+    rejections.set_title("Rejections")
+    times.bar(indexes, [item['time'] + item.get('check_time', 0.0) for item in statistics], width)
+    times.set_title("Time (s)")
 
-        if match:
-            fails.append(match.group(1))
+    for axes in (rejections, times):
+        axes.set_xticks(indexes)
+        axes.set_xticklabels(labels, rotation=90)
 
-counter = Counter(fails)
+    return figure
 
-labels, values = zip(*counter.items())
-indexes = np.arange(len(labels))
-width = 1
 
-plt.style.use("ggplot")
-plt.bar(indexes, values, width)
-plt.xticks(indexes, labels)
-plt.show()
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "constraints.json"
+    with open(path) as f:
+        plot_constraint_statistics(json.load(f))
+    plt.show()
@@ -0,0 +1,423 @@
+import collections
+import functools
+import math
+import multiprocessing
+import queue
+import random
+
+import numpy
+
+from rundmcmc.accept import Metropolis
+from rundmcmc.chain import MarkovChain
+from rundmcmc.output.output import Histogram
+from rundmcmc.rng import RandomStream
+
+# The queue that a worker process sends its rows through, set by _set_queue
+# when the worker starts.
+_rows = None
+
+
+class EnsembleRunner:
+    """
+    Runs an ensemble of Markov chains in a pool of worker processes, and
+    streams the scores of their states back as they are computed.
+
+    Each chain gets its own seed, derived from one master seed and the index
+    of the chain, and the global :mod:`random` module is seeded with it in
+    the worker before the chain is built. With ``pass_rng=True``, the chain
+    also gets its own :class:`~rundmcmc.rng.RandomStream` from that seed, so
+    that it does not depend on what else draws from the :mod:`random` module
+    in the worker. The rows of each chain only depend on the master seed,
+    whatever the number of workers and whichever worker runs the chain, as
+    long as its proposal draws from ``partition['cut_edges']`` (like
+    :func:`~rundmcmc.proposals.propose_random_flip`). Proposals that draw
+    from plain sets, like ``cut_edges_by_part``, also depend on the order of
+    iterating over them, which for string node IDs depends on
+    ``PYTHONHASHSEED``; fix it in the environment for those.
+
+    The scores of every row are also counted into histograms and p-value
+    counters, which are merged across chains as the rows arrive (see
+    :meth:`histograms` and :meth:`p_value_reports`).
+
+    The initial partition is pickled and sent to every worker along with
+    `make_chain`. Build it on a shared
+    :class:`~rundmcmc.frozen_graph.FrozenGraph` so that the workers attach
+    to one copy of the graph instead of each receiving its own.
+
+    Example usage:
+
+    .. code-block:: python
+
+        runner = EnsembleRunner(functools.partial(BasicChain, initial_partition),
+                                {'Mean-Median': mean_median}, number_of_chains=8,
+                                seed=2018)
+        for chain_index, step, row in runner.run():
+            # Do whatever you want with the row of scores
+
+        reports = runner.p_value_reports()
+
+    """
+
+    def __init__(self, make_chain, scores, number_of_chains, seed, processes=None,
+                 histogram_bounds=None, batch_size=100, pass_rng=False):
+        """
+        :make_chain: Function without arguments that builds a chain, like a
+                     :class:`~rundmcmc.chain.MarkovChain`. It is pickled and
+                     called in the worker processes, so it should be a
+                     module-level function or a :func:`functools.partial`.
+        :scores: Dictionary from score names to functions of a partition.
+                 They are pickled and called in the workers too.
+        :number_of_chains: Number of chains to run.
+        :seed: The master seed, from which the seed of each chain is derived.
+        :processes: Number of worker processes; defaults to the number of CPUs.
+        :histogram_bounds: (optional) Dictionary from score names to
+                           `(bounds, number_of_bins)` pairs, for the
+                           :class:`~rundmcmc.output.output.Histogram` of that
+                           score.
+        :batch_size: Number of rows that a worker sends back at once.
+        :pass_rng: Whether to call `make_chain` with the keyword argument
+                   `rng`, a :class:`~rundmcmc.rng.RandomStream` seeded with the
+                   chain's seed, for its proposal and acceptance function.
+
+        """
+        self.make_chain = make_chain
+        self.scores = scores
+        self.number_of_chains = number_of_chains
+        self.seed = seed
+        self.processes = processes
+        self.batch_size = batch_size
+        self.pass_rng = pass_rng
+
+        if histogram_bounds is None:
+            histogram_bounds = {}
+        self._histograms = {name: Histogram(bounds, number_of_bins)
+                            for name, (bounds, number_of_bins) in histogram_bounds.items()}
+        self._reset()
+
+    def _reset(self):
+        self.bin_counts = {name: collections.Counter() for name in self._histograms}
+        # The scores of each chain's initial state, and the numbers of its
+        # scores that are at least as high, for the p-values.
+        self.initial_scores = {}
+        self.as_high_counts = {name: collections.Counter() for name in self.scores}
+        self.row_counts = collections.Counter()
+
+    def chain_seeds(self):
+        """
+        :returns: The seed of each chain, derived from the master seed with a
+                  :class:`numpy.random.SeedSequence`.
+        """
+        return _spawn_seeds(self.seed, self.number_of_chains)
+
+    def run(self):
+        """
+        Run the chains, and yield their rows of scores as they arrive. Rows of
+        different chains arrive in no particular order, but the rows of each
+        chain arrive in order.
+
+        :returns: A generator of `(chain_index, step, row)` tuples, where `row`
+                  is a dictionary from score names to the scores of the state.
+
+        """
+        self._reset()
+        rows = multiprocessing.Queue()
+        tasks = [(index, seed, self.make_chain, self.scores, self.batch_size, self.pass_rng)
+                 for index, seed in enumerate(self.chain_seeds())]
+
+        with multiprocessing.Pool(self.processes, initializer=_set_queue,
+                                  initargs=(rows,)) as pool:
+            result = pool.map_async(_run_chain, tasks)
+            remaining = self.number_of_chains
+
+            while remaining:
+                try:
+                    index, first_step, batch = rows.get(timeout=0.1)
+                except queue.Empty:
+                    if result.ready() and not result.successful():
+                        # Raise the worker's exception.
+                        result.get()
+                    continue
+
+                if batch is None:
+                    remaining -= 1
+                    continue
+
+                for step, row in enumerate(batch, first_step):
+                    self._count(index, step, row)
+                    yield index, step, row
+
+            result.get()
+
+    def _count(self, index, step, row):
+        self.row_counts[index] += 1
+        if step == 0:
+            self.initial_scores[index] = row
+
+        for name, histogram in self._histograms.items():
+            self.bin_counts[name][histogram.find_bin_index(row[name])] += 1
+
+        initial = self.initial_scores[index]
+        for name in self.scores:
+            self.as_high_counts[name][index] += row[name] >= initial[name]
+
+    def histograms(self):
+        """
+        :returns: Dictionary from score names to Counters of the number of
+                  rows in each bin (by bin index) of their histograms, over
+                  all chains.
+        """
+        return {name: collections.Counter(counts) for name, counts in self.bin_counts.items()}
+
+    def p_value_reports(self):
+        """
+        :returns: A list of reports like those of
+                  :func:`~rundmcmc.output.p_value_report`, with the fraction
+                  of all rows that scored at least as high as the initial
+                  state of their chain. The `initial_plan_score` is that of
+                  chain 0, so it describes the whole ensemble only if every
+                  chain starts from the same plan, as when `make_chain`
+                  always builds its chain from one initial partition. The
+                  initial scores of every chain are in :attr:`initial_scores`.
+        """
+        total = sum(self.row_counts.values())
+        reports = []
+        for name, counts in self.as_high_counts.items():
+            fraction_as_high = sum(counts.values()) / total
+            fraction_lower = 1 - fraction_as_high
+            reports.append({'name': name,
+                            'initial_plan_score': self.initial_scores[0][name],
+                            'fraction_as_high': fraction_as_high,
+                            'p_value': math.sqrt(2 * fraction_as_high),
+                            'opposite_p_value': math.sqrt(2 * fraction_lower)})
+        return reports
+
+
+class ReplicaExchangeChain:
+    """
+    Parallel tempering: runs replicas of a Markov chain at several inverse
+    temperatures of an energy, each in its own process, and periodically
+    swaps the states of replicas at neighboring temperatures. Hot replicas
+    move freely between modes, and the swaps carry their states down to the
+    cold chain, which would otherwise stay stuck in one mode.
+
+    Iterating over a ReplicaExchangeChain yields the states of the cold
+    chain, the one at inverse temperature ``betas[0]``, like iterating over
+    a :class:`~rundmcmc.chain.MarkovChain` (except that proposals that are
+    not accepted are not yielded). Each replica is a MarkovChain that
+    accepts flips with :class:`~rundmcmc.accept.Metropolis`, drawing from
+    its own :class:`~rundmcmc.rng.RandomStream`. Every
+    `swap_interval` steps, each replica sends back only the nodes that it
+    flipped, and its energy; the cold chain's replica sends the flips of
+    each step. The swaps exchange the temperatures of the replicas, so no
+    states are sent to the processes either.
+
+    Example usage:
+
+    .. code-block:: python
+
+        chain = ReplicaExchangeChain(propose_random_flip, is_valid, initial_state,
+                                     number_of_cut_edges, betas=[1, 0.5, 0.25, 0],
+                                     seed=2018)
+        for state in chain:
+            # Do whatever you want with the states of the cold chain
+
+    """
+
+    def __init__(self, proposal, is_valid, initial_state, energy, betas, seed,
+                 swap_interval=10, total_steps=1000, pass_rng=False):
+        """
+        :proposal: Function proposing the next state from the current state.
+        :is_valid: :class:`~rundmcmc.validity.Validator` class instance.
+        :initial_state: Initial :class:`~rundmcmc.partition.Partition`, for
+                        every replica. It is pickled and sent to each process,
+                        so consider building it on a shared
+                        :class:`~rundmcmc.frozen_graph.FrozenGraph`.
+        :energy: Function of a partition, like the number of cut edges. The
+                 replica at inverse temperature `beta` samples partitions with
+                 probability proportional to ``exp(-beta * energy)``.
+        :betas: The inverse temperatures of the replicas. The first is the
+                cold chain, and swaps are proposed between neighbors in this
+                list, which should be in decreasing order.
+        :seed: The master seed, from which the seeds of the replicas and of
+               the swaps are derived.
+        :swap_interval: Number of steps between swaps.
+        :total_steps: Number of states of the cold chain to yield.
+        :pass_rng: Whether to call `proposal` with the keyword argument `rng`,
+                   the replica's :class:`~rundmcmc.rng.RandomStream`, like the
+                   proposals in :mod:`rundmcmc.proposals`. Otherwise, it draws
+                   from the :mod:`random` module, seeded in each process.
+
+        """
+        if not is_valid(initial_state):
+            raise ValueError('The given initial_state is not valid according is_valid.')
+
+        self.proposal = proposal
+        self.is_valid = is_valid
+        self.initial_state = initial_state
+        self.energy = energy
+        self.betas = list(betas)
+        self.seed = seed
+        self.swap_interval = swap_interval
+        self.total_steps = total_steps
+        self.pass_rng = pass_rng
+
+        self.attempted_swaps = [0] * (len(self.betas) - 1)
+        self.accepted_swaps = [0] * (len(self.betas) - 1)
+
+    def __iter__(self):
+        *replica_seeds, swap_seed = _spawn_seeds(self.seed, len(self.betas) + 1)
+        self._random = random.Random(swap_seed)
+        # The replica at each temperature, and the assignment of each replica.
+        self.replicas = list(range(len(self.betas)))
+        assignments = [dict(self.initial_state.assignment) for _ in self.betas]
+
+        connections, processes = [], []
+        for replica_seed in replica_seeds:
+            connection, worker_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_run_replica, daemon=True,
+                args=(worker_connection, replica_seed, self.proposal, self.is_valid,
+                      self.initial_state, self.energy, self.pass_rng))
+            process.start()
+            connections.append(connection)
+            processes.append(process)
+
+        try:
+            self.state = self.initial_state
+            yield self.state
+
+            step, swap_round = 1, 0
+            while step < self.total_steps:
+                steps = min(self.swap_interval, self.total_steps - step)
+                for position, replica in enumerate(self.replicas):
+                    connections[replica].send((steps, self.betas[position], position == 0))
+
+                energies = []
+                for replica, connection in enumerate(connections):
+                    result = connection.recv()
+                    if isinstance(result, Exception):
+                        raise result
+                    changes, step_flips, energy = result
+                    assignments[replica].update(changes)
+                    energies.append(energy)
+                    if step_flips is not None:
+                        cold_flips = step_flips
+
+                for flips in cold_flips:
+                    if flips:
+                        self._move(flips)
+                    yield self.state
+                step += steps
+
+                cold_replica = self.replicas[0]
+                self._swap(energies, swap_round)
+                swap_round += 1
+                if self.replicas[0] != cold_replica:
+                    assignment = self.state.assignment
+                    self._move({node: part for node, part in assignments[self.replicas[0]].items()
+                                if assignment[node] != part})
+        finally:
+            for connection in connections:
+                try:
+                    connection.send(None)
+                except OSError:
+                    # The replica already stopped, after an error.
+                    pass
+            for process in processes:
+                process.join()
+
+    def _move(self, flips):
+        state = self.state.merge(flips)
+        # Drop the reference to the previous state, so that the chain
+        # of parents does not grow.
+        self.state.parent = None
+        self.state = state
+
+    def _swap(self, energies, swap_round):
+        """Propose swaps between the replicas at the neighboring temperatures
+        `(0, 1), (2, 3), ...` and `(1, 2), (3, 4), ...` in alternate rounds,
+        and accept each with the Metropolis probability of the exchange."""
+        for position in range(swap_round % 2, len(self.betas) - 1, 2):
+            first, second = self.replicas[position], self.replicas[position + 1]
+            exponent = (self.betas[position] - self.betas[position + 1]) * \
+                (energies[first] - energies[second])
+
+            self.attempted_swaps[position] += 1
+            if exponent >= 0 or self._random.random() < math.exp(exponent):
+                self.accepted_swaps[position] += 1
+                self.replicas[position], self.replicas[position + 1] = second, first
+
+    def swap_rates(self):
+        """
+        :returns: The fraction of proposed swaps between each pair of
+                  neighboring temperatures that were accepted.
+        """
+        return [accepted / attempted if attempted else None
+                for accepted, attempted in zip(self.accepted_swaps, self.attempted_swaps)]
+
+    def __len__(self):
+        return self.total_steps
+
+
+def _run_replica(connection, seed, proposal, is_valid, initial_state, energy, pass_rng):
+    """
+    Run one replica of a :class:`ReplicaExchangeChain`. For each message
+    `(steps, beta, send_steps)` it runs that many steps at the inverse
+    temperature `beta`, and sends back the new parts of the nodes that were
+    flipped, the flips of each step (if `send_steps`, and otherwise None),
+    and the energy of its state. It stops when it receives None.
+    """
+    random.seed(seed)
+    rng = RandomStream(seed)
+    if pass_rng:
+        proposal = functools.partial(proposal, rng=rng)
+    accept = Metropolis(energy, rng=rng)
+    chain = iter(MarkovChain(proposal, is_valid, accept, initial_state, total_steps=math.inf))
+    next(chain)
+
+    try:
+        for steps, beta, send_steps in iter(connection.recv, None):
+            accept.beta = beta
+            changes, step_flips = {}, []
+            for _ in range(steps):
+                previous = chain.state
+                next(chain)
+                flips = chain.state.flips if chain.state is not previous else None
+                if flips:
+                    changes.update(flips)
+                step_flips.append(flips)
+            connection.send((changes, step_flips if send_steps else None, energy(chain.state)))
+    except Exception as error:
+        connection.send(error)
+        raise
+
+
+def _spawn_seeds(seed, number):
+    """Derive `number` independent integer seeds from one seed, with a
+    :class:`numpy.random.SeedSequence`."""
+    children = numpy.random.SeedSequence(seed).spawn(number)
+    return [int.from_bytes(child.generate_state(4).tobytes(), 'little') for child in children]
+
+
+def _set_queue(rows):
+    global _rows
+    _rows = rows
+
+
+def _run_chain(task):
+    """Run one chain in a worker, sending its rows back in batches."""
+    index, seed, make_chain, scores, batch_size, pass_rng = task
+
+    random.seed(seed)
+    chain = make_chain(rng=RandomStream(seed)) if pass_rng else make_chain()
+
+    batch, first_step = [], 0
+    for step, state in enumerate(chain):
+        batch.append({name: score(state) for name, score in scores.items()})
+        if len(batch) == batch_size:
+            _rows.put((index, first_step, batch))
+            batch, first_step = [], step + 1
+
+    if batch:
+        _rows.put((index, first_step, batch))
+    _rows.put((index, None, None))
@@ -1,5 +1,10 @@
 import collections
+import collections.abc
 
+import networkx
+
+from rundmcmc.assignment import ArrayAssignment, PersistentAssignment
+from rundmcmc.frozen_graph import FrozenGraph
 from rundmcmc.proposals import max_edge_cuts
 from rundmcmc.updaters import flows_from_changes
 
@@ -17,7 +22,9 @@ class Partition:
         """
         :graph: Underlying graph; a NetworkX object.
         :assignment: Dictionary assigning nodes to districts. If None,
-                     initialized to assign all nodes to district 0.
+                     initialized to assign all nodes to district 0. It is
+                     stored as a :class:`~rundmcmc.assignment.PersistentAssignment`,
+                     which has the same read interface as a dictionary.
         :updaters: Dictionary of functions to track data about the partition.
                    The keys are stored as attributes on the partition class,
                    which the functions compute.
@@ -25,20 +32,28 @@ class Partition:
         """
         if parent:
             self._from_parent(parent, flips)
+            self._update()
         else:
             self._first_time(graph, assignment, updaters)
+            self._update()
 
-        self._update()
-
-        self.max_edge_cuts = max_edge_cuts(self)
+            # There is nothing to update the initial partition from, so
+            # every updater is computed up front.
+            self.evaluate()
 
     def _first_time(self, graph, assignment, updaters):
         self.graph = graph
-        self.assignment = assignment
 
         if not assignment:
             assignment = {node: 0 for node in graph.nodes}
 
+        # Assignments that cannot merge flips themselves, like dicts and other
+        # mappings, are copied into a PersistentAssignment.
+        if isinstance(assignment, collections.abc.Mapping) and not hasattr(assignment, 'merge'):
+            assignment = PersistentAssignment.from_dict(assignment)
+
+        self.assignment = assignment
+
         if not updaters:
             updaters = dict()
 
@@ -47,6 +62,8 @@ class Partition:
         self.parent = None
         self.flips = None
         self.flows = None
+        # Hooks around the computation of updaters, see rundmcmc.profiling.
+        self.instrumentation = None
 
         self.max_edge_cuts = max_edge_cuts(self)
 
@@ -55,13 +72,19 @@ class Partition:
             self.parts[part].add(node)
 
     def _from_parent(self, parent, flips):
+        # Updaters compute their values incrementally from the parent's
+        # values, which the parent can only compute while its own parent is
+        # around. Only a partition that gets children pays for this.
+        parent.evaluate()
+
         self.parent = parent
         self.flips = flips
 
-        self.assignment = {**parent.assignment, **flips}
+        self.assignment = parent.assignment.merge(flips)
 
         self.graph = parent.graph
         self.updaters = parent.updaters
+        self.instrumentation = parent.instrumentation
 
         self.max_edge_cuts = parent.max_edge_cuts
 
@@ -88,11 +111,31 @@ class Partition:
         self.parts = {part: nodes for part, nodes in self.parts.items() if len(nodes) > 0}
 
     def _update(self):
+        # Updaters are computed lazily, when they are first looked up, so
+        # that a proposal that is rejected only computes what was read.
         self._cache = dict()
+        self._computing = set()
+
+    def evaluate(self, keys=None):
+        """Compute the given updaters now, if they have not been computed yet.
+
+        :keys: Iterable of updater names. Defaults to all of the updaters.
+
+        """
+        if keys is None:
+            keys = self.updaters
+
+        for key in keys:
+            # An updater that is being computed can make children of this
+            # partition (to try out flips, for instance), which evaluate it.
+            if key not in self._computing:
+                self[key]
 
-        for key in self.updaters:
-            if key not in self._cache:
-                self._cache[key] = self.updaters[key](self)
+    @property
+    def evaluated_updaters(self):
+        """Names of the updaters computed on this partition so far, in the order
+        that they were computed."""
+        return list(self._cache)
 
     def merge(self, flips):
         """
@@ -106,12 +149,321 @@ class Partition:
     def crosses_parts(self, edge):
         return self.assignment[edge[0]] != self.assignment[edge[1]]
 
+    def snapshot(self):
+        """
+        :returns: A picklable dictionary with everything about this partition
+                  except its graph, updaters and parent: the assignment, the
+                  parts, the flips and the values of the updaters, which are
+                  all computed first. Restore it with :meth:`from_snapshot`.
+        """
+        self.evaluate()
+        state = {key: value for key, value in self.__dict__.items()
+                 if key not in _NOT_IN_SNAPSHOTS}
+        return {'class': self.__class__, 'state': state}
+
+    @staticmethod
+    def from_snapshot(graph, updaters, snapshot):
+        """
+        Rebuild a partition from a :meth:`snapshot`, with the same class. The
+        values of the updaters are restored as they were, rather than computed
+        again.
+
+        :graph: The graph that the partition was created with.
+        :updaters: The updaters that the partition was created with.
+        :snapshot: Dictionary returned by :meth:`snapshot`.
+
+        """
+        partition_class = snapshot['class']
+        partition = partition_class.__new__(partition_class)
+        partition.__dict__.update(snapshot['state'])
+        partition._restore(graph, updaters or dict())
+        return partition
+
+    def _restore(self, graph, updaters):
+        self.graph = graph
+        self.updaters = updaters
+        self.instrumentation = None
+        self.parent = None
+        self._computing = set()
+
     def __getitem__(self, key):
-        """Allows keying on a Partition instance.
+        """Allows keying on a Partition instance. The updater is computed the
+        first time it is accessed, after the updaters it declares as its
+        ``dependencies`` (see :func:`~rundmcmc.updaters.depends_on`).
 
         :key: Property to access.
 
         """
         if key not in self._cache:
-            self._cache[key] = self.updaters[key](self)
+            if key in self._computing:
+                raise RuntimeError(f"The updater {key!r} depends on its own value.")
+
+            self._computing.add(key)
+            try:
+                self._cache[key] = _compute(self, key)
+            finally:
+                self._computing.discard(key)
+        return self._cache[key]
+
+
+# The attributes that snapshots leave out, because they are not data about
+# the partition itself or would drag its history along.
+_NOT_IN_SNAPSHOTS = {'graph', 'updaters', 'instrumentation', 'parent', '_computing',
+                     '_journal'}
+
+
+def _compute(partition, key):
+    """Compute the updater `key` on the partition, after its dependencies."""
+    updater = partition.updaters[key]
+    for dependency in getattr(updater, 'dependencies', ()):
+        partition[dependency]
+
+    instrumentation = partition.instrumentation
+    if instrumentation is None:
+        return updater(partition)
+
+    instrumentation.before('updater', key)
+    try:
+        return updater(partition)
+    finally:
+        instrumentation.after('updater', key)
+
+
+class ArrayPartition(Partition):
+    """
+    Partition that relabels the nodes of its graph to the integers ``0..n-1``
+    once, when the initial partition is created, and keeps the assignment in
+    chunks indexed by those integers, which are shared between a partition and
+    the partitions merged from it (see
+    :class:`~rundmcmc.assignment.ArrayAssignment`).
+
+    Integer node IDs are much cheaper to hash than GEOID strings or grid
+    tuples, and they locate their parts without any hashing. The assignment
+    is also available as an ``int32`` NumPy vector. District labels must be
+    integers.
+
+    Updaters, proposals and validators all see the relabeled graph. Use
+    :meth:`index_of`, :meth:`label_of`, :meth:`labeled_assignment` and
+    :meth:`labeled_flips` to translate between node indices and the original
+    node IDs.
+
+    The graph can also be a :class:`~rundmcmc.frozen_graph.FrozenGraph`,
+    whose nodes are already numbered; the partition then uses it as it is,
+    without copying it, and takes the original node IDs from it.
+
+    """
+
+    def _first_time(self, graph, assignment, updaters):
+        if isinstance(graph, FrozenGraph):
+            self.node_labels = graph.node_labels
+        else:
+            self.node_labels = list(graph.nodes)
+        self.node_indices = {label: index for index, label in enumerate(self.node_labels)}
+
+        if not assignment:
+            assignment = {node: 0 for node in self.node_labels}
+
+        assignment = ArrayAssignment.from_dict(assignment, self.node_indices)
+        super()._first_time(self._relabeled(graph), assignment, updaters)
+
+    def _restore(self, graph, updaters):
+        super()._restore(self._relabeled(graph), updaters)
+
+    def _relabeled(self, graph):
+        if isinstance(graph, FrozenGraph):
+            return graph
+        return networkx.relabel_nodes(graph, self.node_indices)
+
+    def _from_parent(self, parent, flips):
+        self.node_labels = parent.node_labels
+        self.node_indices = parent.node_indices
+
+        super()._from_parent(parent, flips)
+
+    def index_of(self, label):
+        """Return the node index of the node with the given original ID."""
+        return self.node_indices[label]
+
+    def label_of(self, node):
+        """Return the original ID of the node with the given index."""
+        return self.node_labels[node]
+
+    def labeled_assignment(self):
+        """Return the assignment as a dictionary keyed on the original node IDs."""
+        return dict(zip(self.node_labels, self.assignment.values()))
+
+    def labeled_flips(self):
+        """Return the flips of this step keyed on the original node IDs."""
+        if self.flips is None:
+            return None
+        return {self.node_labels[node]: part for node, part in self.flips.items()}
+
+
+class MutablePartition(Partition):
+    """
+    Partition that is changed in place by :meth:`apply` instead of creating a
+    new instance for every proposal with :meth:`merge`. :meth:`revert` undoes
+    the most recent :meth:`apply` from a journal of what it changed, so
+    rejecting a proposal costs only as much as the proposal touched.
+
+    :meth:`apply` flips the assignment (a
+    :class:`~rundmcmc.assignment.PersistentAssignment`, so the journal keeps
+    the previous version), moves the flipped nodes between the sets in
+    :attr:`parts`, and recomputes the updaters. While a proposal is applied,
+    :attr:`parent` is a read-only view of the partition as it was before,
+    so updaters can compute their new values incrementally as usual.
+
+    :class:`~rundmcmc.chain.MarkovChain` detects a mutable initial state and
+    yields the same instance at every step. Only the most recent
+    :meth:`apply` can be reverted, and partitions created from this one by
+    :meth:`merge` are only valid until the next :meth:`apply`.
+
+    """
+
+    def _first_time(self, graph, assignment, updaters):
+        super()._first_time(graph, assignment, updaters)
+
+        # Parts are edited in place, so they must not spring into existence
+        # when they are looked up.
+        self.parts = dict(self.parts)
+        self._journal = None
+
+    def _from_parent(self, parent, flips):
+        raise TypeError("A MutablePartition can only be changed in place with apply().")
+
+    def _restore(self, graph, updaters):
+        # The most recent apply() cannot be reverted after a snapshot.
+        super()._restore(graph, updaters)
+        self._journal = None
+
+    def merge(self, flips):
+        """
+        :flips: dict assigning nodes of the graph to their new districts
+        :returns: A new (immutable) :class:`Partition` obtained by performing
+                  the given flips on this partition. It shares data with this
+                  partition and is only valid until the next :meth:`apply`.
+
+        """
+        return Partition(parent=self, flips=flips)
+
+    def apply(self, flips):
+        """Perform the given flips on this partition, in place.
+
+        :flips: dict assigning nodes of the graph to their new districts
+
+        """
+        # The previous state is about to become unavailable, so this is the
+        # last chance to compute the updaters incrementally.
+        self.evaluate()
+
+        flows = flows_from_changes(self.assignment, flips)
+
+        self._journal = (self.assignment, flows, self._cache, self.flips, self.flows,
+                         self.parent)
+        self.parent = _PreviousPartition(self, self.assignment, flows, self._cache)
+
+        self.assignment = self.assignment.merge(flips)
+        _move_nodes(self.parts, flows, 'out', 'in')
+
+        self.flips = flips
+        self.flows = flows
+
+        self._update()
+
+    def revert(self):
+        """Undo the most recent :meth:`apply`."""
+        if self._journal is None:
+            raise ValueError("There are no flips to revert.")
+
+        assignment, flows, cache, flips, previous_flows, parent = self._journal
+        self._journal = None
+
+        self.assignment = assignment
+        _move_nodes(self.parts, flows, 'in', 'out')
+
+        self._cache = cache
+        self.flips = flips
+        self.flows = previous_flows
+        self.parent = parent
+
+
+def _move_nodes(parts, flows, leaving, joining):
+    """Move the nodes of each flow between the sets in `parts`, in place."""
+    for part, flow in flows.items():
+        nodes = parts.setdefault(part, set())
+        nodes -= flow[leaving]
+        nodes |= flow[joining]
+        if not nodes:
+            del parts[part]
+
+
+class _PreviousPartition:
+    """
+    Read-only view of a :class:`MutablePartition` as it was before its most
+    recent :meth:`~MutablePartition.apply`. It shares the (already edited)
+    sets of nodes in each part, and undoes the flows only for the parts that
+    are looked up.
+
+    """
+
+    def __init__(self, partition, assignment, flows, cache):
+        self.graph = partition.graph
+        self.updaters = partition.updaters
+        self.instrumentation = partition.instrumentation
+        self.max_edge_cuts = partition.max_edge_cuts
+        self.assignment = assignment
+        self.parts = _PreviousParts(partition.parts, flows)
+
+        self.parent = None
+        self.flips = None
+        self.flows = None
+
+        self._cache = cache
+
+    def __len__(self):
+        return len(self.parts)
+
+    def crosses_parts(self, edge):
+        return self.assignment[edge[0]] != self.assignment[edge[1]]
+
+    def __getitem__(self, key):
+        if key not in self._cache:
+            self._cache[key] = _compute(self, key)
         return self._cache[key]
+
+
+class _PreviousParts(collections.abc.Mapping):
+    """The parts of a :class:`_PreviousPartition`."""
+
+    def __init__(self, parts, flows):
+        self.parts = parts
+        self.flows = flows
+
+    def __getitem__(self, part):
+        if part not in self.flows:
+            return self.parts[part]
+        if part not in self:
+            raise KeyError(part)
+
+        flow = self.flows[part]
+        return (self.parts.get(part, set()) | flow['out']) - flow['in']
+
+    def __contains__(self, part):
+        if part not in self.flows:
+            return part in self.parts
+
+        # The nodes flowing in are all in the edited part, and the nodes
+        # flowing out are not, so we can count without building the set.
+        flow = self.flows[part]
+        return len(self.parts.get(part, ())) - len(flow['in']) + len(flow['out']) > 0
+
+    def __iter__(self):
+        for part in self.parts:
+            if part in self:
+                yield part
+        for part in self.flows:
+            if part not in self.parts and part in self:
+                yield part
+
+    def __len__(self):
+        return sum(1 for part in self)
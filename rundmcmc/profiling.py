@@ -0,0 +1,152 @@
+import json
+import sys
+import time
+
+
+class Instrumentation:
+    """
+    Hooks that a :class:`~rundmcmc.chain.MarkovChain` calls around each phase
+    of a step. Subclass it and override the hooks you need.
+
+    The phases are ``'proposal'``, ``'check'`` (the cheap checks of the flips,
+    see :meth:`~rundmcmc.validity.Validator.check`), ``'merge'`` (building or
+    applying the proposed partition), ``'validate'``, ``'accept'`` and
+    ``'revert'`` (undoing a proposal to a
+    :class:`~rundmcmc.partition.MutablePartition`). The computation of an
+    updater is the phase ``'updater'``, with the updater's name as the `key`;
+    since updaters are computed lazily, it happens inside the other phases.
+
+    """
+
+    def before(self, phase, key=None):
+        """Called when a phase starts."""
+
+    def after(self, phase, key=None):
+        """Called when a phase ends, even if it raised an exception."""
+
+    def finish(self):
+        """Called when the chain has run all of its steps."""
+
+
+class PhaseStatistics:
+    """
+    The calls of one phase, or of one updater.
+
+    :calls: Number of calls.
+    :time: Total wall time of the calls, in seconds.
+    :self_time: Wall time of the calls, minus the time spent in the phases
+                nested in them (like the updaters computed while validating).
+    :allocated_blocks: Total change of :func:`sys.getallocatedblocks` across
+                       the calls, if the :class:`Profiler` counts allocations.
+
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.time = 0.0
+        self.self_time = 0.0
+        self.allocated_blocks = 0
+
+    def as_dict(self):
+        return {'calls': self.calls, 'time': self.time, 'self_time': self.self_time,
+                'allocated_blocks': self.allocated_blocks}
+
+    def __repr__(self):
+        return "PhaseStatistics(calls={calls}, time={time:.6f}, self_time={self_time:.6f}, " \
+               "allocated_blocks={allocated_blocks})".format(**self.as_dict())
+
+
+class Profiler(Instrumentation):
+    """
+    Instrumentation that adds up the wall time and number of calls of each
+    phase of a chain's steps and of each updater.
+
+    Each hook costs a call to :func:`time.perf_counter`, so the profiler can
+    be left on for production runs. Counting allocations too calls
+    :func:`sys.getallocatedblocks`, which takes time proportional to the size
+    of the heap, so it is off by default.
+
+    Example usage:
+
+    .. code-block:: python
+
+        profiler = Profiler(path="profile.json")
+        chain = MarkovChain(proposal, is_valid, accept, initial_state,
+                            instrumentation=profiler)
+        for state in chain:
+            # The profile is saved when the chain is done
+
+    """
+
+    def __init__(self, path=None, allocations=False):
+        """
+        :path: (optional) Path to save the profile to as JSON when the chain
+               is done (see :meth:`dump`).
+        :allocations: Whether to count the net number of memory blocks that
+                      each phase allocates.
+
+        """
+        self.path = path
+        self.allocations = allocations
+
+        self.phases = {}
+        self.updaters = {}
+        self.wall_time = 0.0
+        # The phases in progress, each as a list of
+        # [statistics, start time, time of nested phases, allocated blocks].
+        self._stack = []
+        self._start = None
+
+    def before(self, phase, key=None):
+        if self._start is None:
+            self._start = time.perf_counter()
+
+        blocks = sys.getallocatedblocks() if self.allocations else 0
+        self._stack.append([self._statistics(phase, key), time.perf_counter(), 0.0, blocks])
+
+    def after(self, phase, key=None):
+        end = time.perf_counter()
+        statistics, start, nested_time, blocks = self._stack.pop()
+
+        elapsed = end - start
+        statistics.calls += 1
+        statistics.time += elapsed
+        statistics.self_time += elapsed - nested_time
+        if self.allocations:
+            statistics.allocated_blocks += sys.getallocatedblocks() - blocks
+
+        if self._stack:
+            self._stack[-1][2] += elapsed
+
+    def finish(self):
+        if self._start is not None:
+            self.wall_time = time.perf_counter() - self._start
+        if self.path is not None:
+            self.dump(self.path)
+
+    def _statistics(self, phase, key):
+        if phase == 'updater':
+            table, name = self.updaters, key
+        else:
+            table, name = self.phases, phase
+
+        if name not in table:
+            table[name] = PhaseStatistics()
+        return table[name]
+
+    def as_dict(self):
+        """
+        :returns: Dictionary with the total `wall_time` of the run so far, and
+                  the statistics of each phase and each updater, as
+                  dictionaries like :meth:`PhaseStatistics.as_dict`.
+        """
+        return {'wall_time': self.wall_time,
+                'phases': {name: statistics.as_dict()
+                           for name, statistics in self.phases.items()},
+                'updaters': {name: statistics.as_dict()
+                             for name, statistics in self.updaters.items()}}
+
+    def dump(self, path):
+        """Save :meth:`as_dict` to a JSON file."""
+        with open(path, "w") as f:
+            json.dump(self.as_dict(), f, indent=2)
@@ -1,3 +1,9 @@
+"""
+Proposals for :class:`~rundmcmc.chain.MarkovChain`. Each proposal draws its
+random numbers from `rng`, which is the :mod:`random` module by default; pass
+a :class:`~rundmcmc.rng.RandomStream` (with :func:`functools.partial`) to give
+a chain its own stream.
+"""
 import random
 
 
@@ -26,7 +32,7 @@ import random
 #     return flip
 
 
-def propose_random_flip_metagraph(partition):
+def propose_random_flip_metagraph(partition, rng=random):
     """Proposes a random boundary flip from the partition.
     Uses the metagraph degree to determine self--loops.
     Very slow.
@@ -36,11 +42,11 @@ def propose_random_flip_metagraph(partition):
 
     """
     # self loop
-    numEdges = partition["metagraph_degree"]
-    if random.random() < 1.0 - (numEdges * 1.0 / partition.max_edge_cuts):
+    numEdges = partition["metagraph_degree"]['valid']
+    if rng.random() < 1.0 - (numEdges * 1.0 / partition.max_edge_cuts):
         return dict()
 
-    flip = propose_random_flip_no_loops(partition)
+    flip = propose_random_flip_no_loops(partition, rng)
 
     # checks for a frozen nodes field and self loops if the value has
     # been set to 1
@@ -52,7 +58,7 @@ def propose_random_flip_metagraph(partition):
     return flip
 
 
-def propose_several_random_flips(partition):
+def propose_several_random_flips(partition, rng=random):
     """Proposes between 2 and 7 random boundary flips from the partition.
        Calls the propose_random_flip() method from this file.
 
@@ -60,17 +66,17 @@ def propose_several_random_flips(partition):
     :returns: a dictionary with the flipped nodes mapped to their new assignments
 
     """
-    number_of_flips = random.randint(2, 7)
+    number_of_flips = rng.randint(2, 7)
 
     proposal = dict()
 
     for i in range(number_of_flips):
-        proposal.update(propose_random_flip(partition))
+        proposal.update(propose_random_flip(partition, rng))
 
     return proposal
 
 
-def propose_flip_every_district(partition):
+def propose_flip_every_district(partition, rng=random):
     """Proposes a random boundary flip for each district in the partition.
 
     :partition: The current partition to propose a flip from.
@@ -80,9 +86,9 @@ def propose_flip_every_district(partition):
     proposal = dict()
 
     for dist_edges in partition['cut_edges_by_part'].values():
-        edge = random.choice(list(dist_edges))
+        edge = rng.choice(list(dist_edges))
 
-        index = random.choice((0, 1))
+        index = rng.choice((0, 1))
         flipped_node, other_node = edge[index], edge[1 - index]
         flip = {flipped_node: partition.assignment[other_node]}
 
@@ -91,7 +97,7 @@ def propose_flip_every_district(partition):
     return proposal
 
 
-def propose_chunk_flip(partition):
+def propose_chunk_flip(partition, rng=random):
     """Chooses a random boundary node and proposes to flip it and all of its neighbors
 
     :partition: The current partition to propose a flip from.
@@ -100,8 +106,8 @@ def propose_chunk_flip(partition):
     """
     proposal = dict()
 
-    edge = random.choice(tuple(partition['cut_edges']))
-    index = random.choice((0, 1))
+    edge = rng.choice(partition['cut_edges'])
+    index = rng.choice((0, 1))
 
     flipped_node = edge[index]
 
@@ -114,7 +120,7 @@ def propose_chunk_flip(partition):
     return proposal
 
 
-def propose_flip_every_edge_of_district(partition):
+def propose_flip_every_edge_of_district(partition, rng=random):
     """Chooses a random district to manipulate. Each edge on the boundary is
        incident to a node in this district and a node outside of it. For each
        edge, toss a fair coin. If tails, do nothing. If heads, toss a second
@@ -127,18 +133,18 @@ def propose_flip_every_edge_of_district(partition):
     """
     proposal = dict()
 
-    edges = random.choice(list(partition['cut_edges_by_part'].values()))
+    edges = rng.choice(list(partition['cut_edges_by_part'].values()))
 
     for edge in edges:
-        if(random.random() > .5):
-            index = random.choice((0, 1))
+        if(rng.random() > .5):
+            index = rng.choice((0, 1))
             flipped_node, other_node = edge[index], edge[1 - index]
             proposal.update({flipped_node: partition.assignment[other_node]})
 
     return proposal
 
 
-def propose_single_or_chunk(partition):
+def propose_single_or_chunk(partition, rng=random):
     """With probability .9, chooses a random boundary node and proposes to flip it.
        With probability .1, chooses a random boundary node and proposes to flip it
        and all of its neighbors.
@@ -150,10 +156,10 @@ def propose_single_or_chunk(partition):
     :returns: a dictionary with the flipped nodes mapped to their new assignments
 
     """
-    if(random.random() > .1):
-        return propose_random_flip(partition)
+    if(rng.random() > .1):
+        return propose_random_flip(partition, rng)
     else:
-        return propose_chunk_flip(partition)
+        return propose_chunk_flip(partition, rng)
 
 
 def number_of_flips(partition, dict_of_flips, prev_partition):
@@ -166,15 +172,15 @@ def number_of_flips(partition, dict_of_flips, prev_partition):
         return dict_of_flips, prev_partition
 
 
-def propose_random_flip_no_loops(partition):
+def propose_random_flip_no_loops(partition, rng=random):
     """Proposes a random boundary flip from the partition.
 
     :partition: The current partition to propose a flip from.
     :returns: a dictionary with the flipped node mapped to its new assignment
 
     """
-    edge = random.choice(tuple(partition['cut_edges']))
-    index = random.choice((0, 1))
+    edge = rng.choice(partition['cut_edges'])
+    index = rng.choice((0, 1))
 
     flipped_node, other_node = edge[index], edge[1 - index]
 
@@ -186,13 +192,14 @@ def propose_random_flip_no_loops(partition):
 propose_random_flip = propose_random_flip_no_loops
 
 
-def propose_lowest_pop_single_flip(partition):
-    dists = list(partition['population'])
-    pops = partition['population'].values()
-    rev_pop = dict(zip(pops, dists))
-    dist = rev_pop[min(pops)]
+def propose_lowest_pop_single_flip(partition, rng=random):
+    population = partition['population']
+    if hasattr(population, 'min_part'):
+        dist = population.min_part()
+    else:
+        dist = min(population, key=population.get)
 
-    edge = random.choice(tuple(partition['cut_edges_by_part'][dist]))
+    edge = rng.choice(tuple(partition['cut_edges_by_part'][dist]))
 
     if partition.assignment[edge[0]] == dist:
         flip = {edge[1]: dist}
@@ -202,22 +209,22 @@ def propose_lowest_pop_single_flip(partition):
     return flip
 
 
-def propose_single_lowest_pop_or_random(partition):
-    if(random.random() > .2):
-        return propose_random_flip(partition)
+def propose_single_lowest_pop_or_random(partition, rng=random):
+    if(rng.random() > .2):
+        return propose_random_flip(partition, rng)
     else:
-        return propose_lowest_pop_single_flip(partition)
+        return propose_lowest_pop_single_flip(partition, rng)
 
 
-def propose_chunk_swap(partition):
+def propose_chunk_swap(partition, rng=random):
     proposal = dict()
     dists = list(partition.parts.keys())
 
     while len(dists) != 0:
         dist = dists[0]
 
-        edge = random.choice(list(partition['cut_edges_by_part'][dist]))
-        index = random.choice((0, 1))
+        edge = rng.choice(list(partition['cut_edges_by_part'][dist]))
+        index = rng.choice((0, 1))
         flipped_node = edge[index]
 
         if partition.assignment[flipped_node] != dist:
@@ -246,9 +253,9 @@ def propose_chunk_swap(partition):
     return proposal
 
 
-def reversible_chunk_flip(partition):
-    edge = random.choice(tuple(partition['cut_edges']))
-    index = random.choice((0, 1))
+def reversible_chunk_flip(partition, rng=random):
+    edge = rng.choice(partition['cut_edges'])
+    index = rng.choice((0, 1))
 
     flipped_node, other_node = edge[index], edge[1 - index]
     flip_to = partition.assignment[flipped_node]
@@ -258,8 +265,8 @@ def reversible_chunk_flip(partition):
     flips = [flipped_node]
     choices = [nbr for nbr in partition.graph.neighbors(flipped_node)
                if partition.assignment[nbr] == flip_from]
-    while(choices and random.random() < .5 ** num_flips):
-        next_flip = random.choice(tuple(choices))
+    while(choices and rng.random() < .5 ** num_flips):
+        next_flip = rng.choice(tuple(choices))
         flips.append(next_flip)
         num_flips += 1
         choices.remove(next_flip)
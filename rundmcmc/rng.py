@@ -0,0 +1,127 @@
+import bisect
+import itertools
+import operator
+
+import numpy
+
+
+class RandomStream:
+    """
+    Random number generator for one chain, backed by a
+    :class:`numpy.random.Generator`, with the methods of the :mod:`random`
+    module that proposals and acceptance functions use.
+
+    The uniforms are drawn from the generator `batch_size` at a time, and
+    every other draw is computed from them: an integer below ``n`` is
+    ``int(n * uniform)``, which is uniform up to a relative error of
+    ``n / 2**53``. A stream seeded with a given seed draws the same numbers
+    whatever else draws from the :mod:`random` module or from other streams,
+    so each chain of an ensemble can have its own.
+
+    The functions in :mod:`rundmcmc.proposals` and :mod:`rundmcmc.accept`
+    take it as their `rng` argument:
+
+    .. code-block:: python
+
+        rng = RandomStream(seed=2018)
+        proposal = functools.partial(propose_random_flip, rng=rng)
+        accept = Metropolis(number_of_cut_edges, beta=2, rng=rng)
+        chain = MarkovChain(proposal, is_valid, accept, initial_state)
+
+    Pickling a stream saves its position, so a
+    :meth:`~rundmcmc.chain.MarkovChain.checkpoint` of such a chain saves the
+    stream along with the proposal, and the resumed chain draws the same
+    numbers that the original would have.
+
+    """
+
+    def __init__(self, seed=None, batch_size=1024):
+        """
+        :seed: (optional) Seed of the generator, or anything else that
+               :func:`numpy.random.default_rng` accepts.
+        :batch_size: Number of uniforms to draw from the generator at once.
+
+        """
+        self.batch_size = batch_size
+        self.generator = numpy.random.default_rng(seed)
+        self._start()
+
+    def _start(self):
+        batches = self._batches()
+        first = next(batches)
+        # random(), which returns a uniform float in [0, 1), is the __next__
+        # of an iterator over the batches, so that calling it is as fast as
+        # calling random.random().
+        self.random = itertools.chain(first, itertools.chain.from_iterable(batches)).__next__
+
+    def _batches(self):
+        while True:
+            # The state of the generator before the batch was drawn, so that
+            # getstate() can describe the position in the batch compactly.
+            self._state = self.generator.bit_generator.state
+            self._uniforms = iter(self.generator.random(self.batch_size).tolist())
+            yield self._uniforms
+
+    def seed(self, seed=None):
+        """Start over from a new seed, like :func:`random.seed`."""
+        self.generator = numpy.random.default_rng(seed)
+        self._start()
+
+    def randrange(self, start, stop=None):
+        """:returns: A uniform integer in ``range(start, stop)``, or in
+        ``range(start)`` if `stop` is not given."""
+        if stop is None:
+            start, stop = 0, start
+        if stop <= start:
+            raise ValueError("empty range for randrange() ({}, {})".format(start, stop))
+        return start + int((stop - start) * self.random())
+
+    def randint(self, a, b):
+        """:returns: A uniform integer `n` with ``a <= n <= b``."""
+        return self.randrange(a, b + 1)
+
+    def choice(self, sequence):
+        """:returns: A uniform element of the sequence, which must support
+        :func:`len` and indexing (like an
+        :class:`~rundmcmc.indexed_set.IndexedSet`)."""
+        if not len(sequence):
+            raise IndexError("Cannot choose from an empty sequence")
+        return sequence[int(len(sequence) * self.random())]
+
+    def choices(self, population, weights=None, k=1):
+        """:returns: A list of `k` elements of the population, drawn with
+        replacement and with probabilities proportional to the weights, like
+        :func:`random.choices`."""
+        if weights is None:
+            return [self.choice(population) for _ in range(k)]
+
+        cumulative = list(itertools.accumulate(weights))
+        if len(cumulative) != len(population):
+            raise ValueError("The number of weights does not match the population")
+        total = cumulative[-1]
+        if not total > 0:
+            raise ValueError("Total of weights must be greater than zero")
+        return [population[bisect.bisect(cumulative, total * self.random(), 0, len(cumulative) - 1)]
+                for _ in range(k)]
+
+    def getstate(self):
+        """:returns: The state of the stream, for :meth:`setstate`."""
+        position = self.batch_size - operator.length_hint(self._uniforms)
+        return (self._state, position)
+
+    def setstate(self, state):
+        """Return to a state from :meth:`getstate`."""
+        generator_state, position = state
+        self.generator.bit_generator.state = generator_state
+        self._start()
+        # Skip the uniforms that were already drawn.
+        next(itertools.islice(self._uniforms, position, position), None)
+
+    def __getstate__(self):
+        return {'generator': self.generator, 'batch_size': self.batch_size,
+                'state': self.getstate()}
+
+    def __setstate__(self, state):
+        self.generator = state['generator']
+        self.batch_size = state['batch_size']
+        self.setstate(state['state'])
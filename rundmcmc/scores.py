@@ -1,6 +1,7 @@
 import numpy
 
 from rundmcmc.proposals import number_of_flips
+from rundmcmc.updaters.metagraph_degree import metagraph_degree
 
 
 class DukeGerrymanderingIndex:
@@ -75,26 +76,32 @@ def final_report():
 
 
 class MetaGraphDegree:
+    """
+    Computes the metagraph degree of the states of a chain, with the chain's
+    validator. The validity of each flip is cached, and when a state is
+    called right after its parent, only the flips that could have changed are
+    tried again (see :func:`~rundmcmc.updaters.metagraph_degree.metagraph_degree`).
+    """
+
     def __init__(self, chain):
         self.is_valid = chain.is_valid
         self.data = []
+        # The most recent states and their degrees. The chain yields proposals
+        # that are not accepted, so the next state's parent may be the one
+        # before the last.
+        self.recent = []
 
     def __call__(self, partition):
-        total_available_flips = 2 * len(partition['cut_edges'])
-        total_valid_flips = sum(self.num_valid_flips(edge, partition)
-                                for edge in partition['cut_edges'])
-        return {'total': total_available_flips, 'valid': total_valid_flips}
-
-    def num_valid_flips(self, edge, partition):
-        """
-        Takes an edge and a partition and returns the number of valid
-        flips the partition can make across this edge (0, 1, or 2).
-        """
-        flip = {edge[0]: partition.assignment[edge[1]]}
-        reverse_flip = {edge[1]: partition.assignment[edge[0]]}
-        flip_valid = 1 if self.is_valid(partition.merge(flip)) else 0
-        reverse_valid = 1 if self.is_valid(partition.merge(reverse_flip)) else 0
-        return flip_valid + reverse_valid
+        previous, previous_degree = None, None
+        for state, degree in self.recent:
+            if state is partition:
+                return degree
+            if state is partition.parent:
+                previous, previous_degree = state, degree
+
+        degree = metagraph_degree(partition, self.is_valid, previous, previous_degree)
+        self.recent = self.recent[-1:] + [(partition, degree)]
+        return degree
 
 
 def compute_meta_graph_degree(chain):
@@ -157,3 +164,9 @@ def mean_pop(partition):
     mean_population = total_population / number_of_districts
 
     return mean_population
+
+
+def evaluated_updaters(partition):
+    """The names of the updaters that have been computed on the partition. List
+    this handler first to see what the chain itself needed at each step."""
+    return partition.evaluated_updaters
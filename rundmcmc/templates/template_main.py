@@ -20,7 +20,7 @@ from rundmcmc.partition import Partition
 
 from rundmcmc.proposals import propose_random_flip_no_loops
 
-from rundmcmc.updaters import (Tally, boundary_nodes, cut_edges,
+from rundmcmc.updaters import (Tally, boundary_nodes, county_splits, cut_edges,
                                cut_edges_by_part, exterior_boundaries,
                                perimeters, polsby_popper,
                                votes_updaters,
@@ -49,6 +49,10 @@ unique_label = "wes_id"
 pop_col = "POP100"
 area_col = "ALAND10"
 district_col = "CD"
+# (Optional) Name of a county column, on the graph or in the data added below.
+# If it is set and every node has it, the chain refuses new county splits.
+# None of the test data has a county column.
+county_col = None
 
 
 # This builds a graph
@@ -76,9 +80,13 @@ vote_col2 = "voteB"
 
 # This adds the data to the graph
 data_list = [vote_col1, vote_col2]
+if county_col in df.columns:
+    data_list.append(county_col)
 
 add_data_to_graph(df, graph, data_list, id_col=unique_label)
 
+use_counties = county_col is not None and all(county_col in graph.nodes[node] for node in graph)
+
 
 # Desired proposal method
 proposal_method = propose_random_flip_no_loops
@@ -97,7 +105,7 @@ print("loaded data")
 # Necessary updaters go here
 updaters = {
             **votes_updaters([vote_col1, vote_col2]),
-            'population': Tally(pop_col, alias='population'),
+            'population': Tally(pop_col, alias='population', extremes=True),
             'perimeters': perimeters,
             'exterior_boundaries': exterior_boundaries,
             'interior_boundaries': interior_boundaries,
@@ -107,6 +115,9 @@ updaters = {
             'polsby_popper': polsby_popper,
             'cut_edges_by_part': cut_edges_by_part}
 
+if use_counties:
+    updaters['counties'] = county_splits('counties', county_col)
+
 # This builds the partition object
 initial_partition = Partition(graph, assignment, updaters)
 
@@ -118,9 +129,15 @@ population_constraint = within_percent_of_ideal_population(initial_partition, po
 compactness_limit = L1_reciprocal_polsby_popper(initial_partition)
 compactness_constraint = UpperBound(L1_reciprocal_polsby_popper, compactness_limit)
 
-validator = Validator([refuse_new_splits, no_vanishing_districts,
-                       single_flip_contiguous, population_constraint,
-                       compactness_constraint])
+validators = [no_vanishing_districts, single_flip_contiguous, population_constraint,
+              compactness_constraint]
+
+if use_counties:
+    # Once a county is whole, it can never be split again, so a chain may get
+    # stuck with no valid flips.
+    validators.insert(0, refuse_new_splits('counties'))
+
+validator = Validator(validators)
 
 # Add cyclic updaters :(
 # updaters['metagraph_degree'] = MetagraphDegree(validator, "metagraph_degree")
@@ -176,7 +193,7 @@ print("computed p-values")
 
 # Write flips to file
 
-allAssignments = {0: chain.state.assignment}
+allAssignments = {0: dict(chain.state.assignment)}
 
 for step in chain:
     allAssignments[chain.counter + 1] = [step.flips]
@@ -24,10 +24,10 @@ from rundmcmc.partition import Partition
 
 from rundmcmc.proposals import propose_random_flip_no_loops
 
-from rundmcmc.updaters import (Tally, boundary_nodes, cut_edges,
+from rundmcmc.updaters import (Tally, boundary_nodes, county_splits, cut_edges,
                                cut_edges_by_part, exterior_boundaries,
                                perimeters, polsby_popper,
-                               votes_updaters,
+                               election_updaters,
                                interior_boundaries)
 
 from rundmcmc.validity import (L1_reciprocal_polsby_popper,
@@ -72,6 +72,10 @@ unique_label = "wes_id"
 pop_col = "population"
 area_col = "area"
 district_col = "Remedial"
+# (Optional) Name of a county column, on the graph or in the data added below.
+# If it is set and every node has it, the chain refuses new county splits.
+# None of the test data has a county column.
+county_col = None
 
 
 # This builds a graph
@@ -103,9 +107,15 @@ election_columns = [['T16PRESD', 'T16PRESR'], ['T16SEND', 'T16SENR']]
 
 
 # This adds the data to the graph
-add_data_to_graph(df, graph, [cols for pair in election_columns for cols in pair])
+data_list = [cols for pair in election_columns for cols in pair]
+if county_col in df.columns:
+    data_list.append(county_col)
+
+add_data_to_graph(df, graph, data_list)
 # , id_col=unique_label)
 
+use_counties = county_col is not None and all(county_col in graph.nodes[node] for node in graph)
+
 
 # Desired proposal method
 proposal_method = propose_random_flip_no_loops
@@ -122,7 +132,7 @@ print("loaded data")
 
 
 # Necessary updaters go here
-updaters = {'population': Tally(pop_col, alias='population'),
+updaters = {'population': Tally(pop_col, alias='population', extremes=True),
             'perimeters': perimeters,
             'exterior_boundaries': exterior_boundaries,
             'interior_boundaries': interior_boundaries,
@@ -132,11 +142,13 @@ updaters = {'population': Tally(pop_col, alias='population'),
             'polsby_popper': polsby_popper,
             'cut_edges_by_part': cut_edges_by_part}
 
+if use_counties:
+    updaters['counties'] = county_splits('counties', county_col)
+
 
 # Add the vote updaters for multiple plans
 
-for i in range(num_elections):
-    updaters = {**updaters, **votes_updaters(election_columns[i], election_names[i])}
+updaters = {**updaters, **election_updaters(dict(zip(election_names, election_columns)))}
 
 
 # This builds the partition object
@@ -154,15 +166,22 @@ compactness_constraint_L1 = UpperBound(L1_reciprocal_polsby_popper, compactness_
 compactness_limit_Lm1 = .99 * L_minus_1_polsby_popper(initial_partition)
 compactness_constraint_Lm1 = LowerBound(L_minus_1_polsby_popper, compactness_limit_Lm1)
 
-validator = Validator([refuse_new_splits, no_vanishing_districts,
-                       single_flip_contiguous, population_constraint,
-                       compactness_constraint_Lm1])
+validators = [no_vanishing_districts, single_flip_contiguous, population_constraint,
+              compactness_constraint_Lm1]
+
+if use_counties:
+    # Once a county is whole, it can never be split again, so a chain may get
+    # stuck with no valid flips.
+    validators.insert(0, refuse_new_splits('counties'))
+
+validator = Validator(validators)
 
 # Names of validators for output
 # Necessary since bounds don't have __name__'s
-list_of_validators = [refuse_new_splits, no_vanishing_districts,
-                      single_flip_contiguous, within_percent_of_ideal_population,
-                      L_minus_1_polsby_popper]
+list_of_validators = [no_vanishing_districts, single_flip_contiguous,
+                      within_percent_of_ideal_population, L_minus_1_polsby_popper]
+if use_counties:
+    list_of_validators.insert(0, validators[0])
 
 
 # Add cyclic updaters :(
@@ -233,7 +252,7 @@ print("computed p-values")
 """
 # Write flips to file
 
-allAssignments = {0: chain.state.assignment}
+allAssignments = {0: dict(chain.state.assignment)}
 
 for step in chain:
     allAssignments[chain.counter + 1] = [step.flips]
@@ -310,3 +329,11 @@ with open(newdir + "parameters.txt", "w") as f:
         f.write(v.__name__ + "\n")
 
 print("wrote paramters")
+
+
+# Record how often each constraint rejected a proposal, and how long it took;
+# plot them with rundmcmc/output/parse_log.py
+with open(newdir + "constraints.json", "w") as f:
+    json.dump(validator.statistics(), f)
+
+print("wrote constraint statistics")
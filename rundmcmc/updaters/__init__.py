@@ -2,13 +2,15 @@ from .compactness import (boundary_nodes, exterior_boundaries, interior_boundari
                           exterior_boundaries_as_a_set, flips, perimeters, polsby_popper)
 from .county_splits import CountySplit, county_splits
 from .cut_edges import cut_edges, cut_edges_by_part
-from .election import votes_updaters
+from .dependencies import depends_on
+from .election import ElectionTally, election_updaters, votes_updaters
 from .flows import flows_from_changes
-from .tally import Tally
+from .tally import SortedTally, Tally
 from .metagraph_degree import MetagraphDegree
 
 __all__ = ['flows_from_changes', 'votes_updaters', 'polsby_popper',
            'county_splits', 'cut_edges', 'cut_edges_by_part', 'Tally',
            'boundary_nodes', 'flips', 'perimeters', 'exterior_boundaries',
            'interior_boundaries', 'exterior_boundaries_as_a_set', 'CountySplit',
-           'MetagraphDegree']
+           'MetagraphDegree', 'depends_on', 'ElectionTally', 'election_updaters',
+           'SortedTally']
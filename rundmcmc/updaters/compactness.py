@@ -1,14 +1,16 @@
 import collections
 import math
 
-from .flows import on_flow
 from .cut_edges import on_edge_flow
+from .dependencies import depends_on
+from .flows import on_flow
 
 
 def compute_polsby_popper(area, perimeter):
     return 4 * math.pi * area / perimeter**2
 
 
+@depends_on('areas', 'perimeters')
 def polsby_popper(partition):
     return {part: compute_polsby_popper(partition['areas'][part], partition['perimeters'][part])
             for part in partition.parts}
@@ -27,6 +29,7 @@ def initialize_exterior_boundaries_as_a_set(partition):
     return part_boundaries
 
 
+@depends_on('boundary_nodes')
 @on_flow(initialize_exterior_boundaries_as_a_set, alias='exterior_boundaries_as_a_set')
 def exterior_boundaries_as_a_set(partition, previous, inflow, outflow):
     graph_boundary = partition['boundary_nodes']
@@ -40,6 +43,7 @@ def initialize_exterior_boundaries(partition):
                       for part in partition.parts}
 
 
+@depends_on('boundary_nodes')
 @on_flow(initialize_exterior_boundaries, alias='exterior_boundaries')
 def exterior_boundaries(partition, previous, inflow, outflow):
     graph_boundary = partition['boundary_nodes']
@@ -56,6 +60,7 @@ def initialize_interior_boundaries(partition):
             for part in partition.parts}
 
 
+@depends_on('cut_edges_by_part')
 @on_edge_flow(initialize_interior_boundaries, alias='interior_boundaries')
 def interior_boundaries(partition, previous, new_edges, old_edges):
     added_perimeter = sum(partition.graph.edges[edge]['shared_perim'] for edge in new_edges)
@@ -79,5 +84,6 @@ def perimeter_of_part(partition, part):
     return exterior_perimeter + interior_perimeter
 
 
+@depends_on('exterior_boundaries', 'interior_boundaries')
 def perimeters(partition):
     return {part: perimeter_of_part(partition, part) for part in partition.parts}
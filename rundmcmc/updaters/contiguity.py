@@ -0,0 +1,70 @@
+import collections
+
+
+def connected_within_part(graph, assignment, nodes, part):
+    """
+    Check if the given nodes are connected to each other through the nodes
+    assigned to `part`.
+
+    This runs one breadth-first search from each of the nodes at the same
+    time, taking turns one node at a time. Searches that meet are merged, so
+    the check stops as soon as all of the searches have met, or as soon as one
+    group of searches runs out of nodes without meeting the others. Either
+    way, it only explores about as much of the part as the smallest piece
+    around the nodes, instead of the whole graph.
+
+    :graph: The graph.
+    :assignment: Dictionary assigning nodes to parts.
+    :nodes: The nodes to connect; they should all be assigned to `part`.
+    :part: The part to search through.
+    :returns: True if the nodes are connected within the part.
+
+    """
+    nodes = list(dict.fromkeys(nodes))
+    if len(nodes) < 2:
+        return True
+
+    # Union-find over the searches, to record which ones have met.
+    leaders = list(range(len(nodes)))
+
+    def leader(search):
+        while leaders[search] != search:
+            leaders[search] = leaders[leaders[search]]
+            search = leaders[search]
+        return search
+
+    owners = {node: search for search, node in enumerate(nodes)}
+    frontiers = {search: collections.deque([node]) for search, node in enumerate(nodes)}
+
+    while True:
+        for search in list(frontiers):
+            frontier = frontiers.get(search)
+            if frontier is None:
+                # This search has been merged into another one in this round.
+                continue
+            if not frontier:
+                # This group of searches has explored a whole piece of the
+                # part without reaching the others.
+                return False
+
+            for neighbor in graph.neighbors(frontier.popleft()):
+                if neighbor not in owners:
+                    if assignment[neighbor] == part:
+                        owners[neighbor] = search
+                        frontier.append(neighbor)
+                    continue
+
+                other = leader(owners[neighbor])
+                if other == search:
+                    continue
+
+                # The searches meet: merge the smaller frontier into the larger.
+                other_frontier = frontiers.pop(other)
+                if len(other_frontier) > len(frontier):
+                    frontier, other_frontier = other_frontier, frontier
+                frontier.extend(other_frontier)
+                leaders[other] = search
+                frontiers[search] = frontier
+
+                if len(frontiers) == 1:
+                    return True
@@ -1,7 +1,7 @@
 import collections
 from enum import Enum
 
-CountyInfo = collections.namedtuple("CountyInfo", "split nodes contains")
+CountyInfo = collections.namedtuple("CountyInfo", "split nodes contains counts")
 
 
 class CountySplit(Enum):
@@ -17,21 +17,28 @@ def county_splits(partition_name, county_field_name):
     :county_field_name: Name of county ID field on the graph.
 
     :returns: The tracked data is a dictionary keyed on the county ID. The
-              stored values are tuples of the form `(split, nodes, seen)`.
-              `split` is a :class:`.CountySplit` enum, `nodes` is a list of
-              node IDs, and `seen` is a list of assignment IDs that are
-              contained in the county.
+              stored values are tuples of the form `(split, nodes, seen,
+              counts)`. `split` is a :class:`.CountySplit` enum, `nodes` is a
+              list of node IDs, `seen` is a set of assignment IDs that are
+              contained in the county, and `counts` is a dictionary from those
+              assignment IDs to their numbers of nodes in the county.
 
     """
     def _get_county_splits(partition):
         return compute_county_splits(partition, county_field_name,
                                      partition_name)
 
+    _get_county_splits.county_field = county_field_name
     return _get_county_splits
 
 
 def compute_county_splits(partition, county_field, partition_field):
-    """Track nodes in counties and information about their splitting."""
+    """Track nodes in counties and information about their splitting.
+
+    After the first step, only the counties containing flipped nodes are
+    recomputed, from the numbers of their nodes in each part; the other
+    counties keep their :class:`CountyInfo` from the parent.
+    """
 
     # Create the initial county data containers.
     if not partition.parent:
@@ -40,25 +47,48 @@ def compute_county_splits(partition, county_field, partition_field):
         for node in partition.graph:
             county = partition.graph.nodes[node][county_field]
             if county in county_dict:
-                split, nodes, seen = county_dict[county]
+                split, nodes, seen, counts = county_dict[county]
             else:
-                split, nodes, seen = CountySplit.NOT_SPLIT, [], set()
+                split, nodes, seen, counts = CountySplit.NOT_SPLIT, [], set(), {}
 
             nodes.append(node)
-            seen.update(set([partition.assignment[node]]))
+            part = partition.assignment[node]
+            seen.add(part)
+            counts[part] = counts.get(part, 0) + 1
 
             if len(seen) > 1:
                 split = CountySplit.OLD_SPLIT
 
-            county_dict[county] = CountyInfo(split, nodes, seen)
+            county_dict[county] = CountyInfo(split, nodes, seen, counts)
 
         return county_dict
 
-    new_county_dict = dict()
-
     parent = partition.parent
-    for county, county_info in parent[partition_field].items():
-        seen = set(partition.assignment[node] for node in county_info.nodes)
+    parent_county_dict = parent[partition_field]
+
+    new_counts = dict()
+    for node, part in partition.flips.items():
+        old_part = parent.assignment[node]
+        if part == old_part:
+            continue
+
+        county = partition.graph.nodes[node][county_field]
+        if county not in new_counts:
+            new_counts[county] = dict(parent_county_dict[county].counts)
+        counts = new_counts[county]
+
+        counts[old_part] -= 1
+        if not counts[old_part]:
+            del counts[old_part]
+        counts[part] = counts.get(part, 0) + 1
+
+    if not new_counts:
+        return parent_county_dict
+
+    new_county_dict = dict(parent_county_dict)
+    for county, counts in new_counts.items():
+        county_info = parent_county_dict[county]
+        seen = set(counts)
 
         split = CountySplit.NOT_SPLIT
 
@@ -68,6 +98,6 @@ def compute_county_splits(partition, county_field, partition_field):
             else:
                 split = CountySplit.OLD_SPLIT
 
-        new_county_dict[county] = CountyInfo(split, county_info.nodes, seen)
+        new_county_dict[county] = CountyInfo(split, county_info.nodes, seen, counts)
 
     return new_county_dict
@@ -1,6 +1,8 @@
 import collections
 import functools
 
+from ..indexed_set import IndexedSet
+
 
 def put_edges_into_parts(edges, assignment):
     by_part = collections.defaultdict(set)
@@ -26,6 +28,35 @@ def obsolete_cuts(partition):
             not partition.crosses_parts((node, neighbor))}
 
 
+def edge_flows(partition):
+    """
+    The cut edges that join and leave each part at this step, as two
+    dictionaries `{part: <set of edges>}`.
+
+    An edge that stays cut can still move between parts, when one of its
+    endpoints is flipped from one part to another.
+    """
+    new_by_part = collections.defaultdict(set)
+    obsolete_by_part = collections.defaultdict(set)
+
+    parent = partition.parent
+    edges = {tuple(sorted((node, neighbor))) for node in partition.flips
+             for neighbor in partition.graph[node]}
+
+    for edge in edges:
+        before = ({parent.assignment[edge[0]], parent.assignment[edge[1]]}
+                  if parent.crosses_parts(edge) else set())
+        after = ({partition.assignment[edge[0]], partition.assignment[edge[1]]}
+                 if partition.crosses_parts(edge) else set())
+
+        for part in after - before:
+            new_by_part[part].add(edge)
+        for part in before - after:
+            obsolete_by_part[part].add(edge)
+
+    return new_by_part, obsolete_by_part
+
+
 def on_edge_flow(initializer, alias):
     """
     Use this decorator to create an updater that responds to flows of cut
@@ -40,7 +71,9 @@ def on_edge_flow(initializer, alias):
     - The new value of the updater for the fixed part P_i.
 
     This will create an updater whose values are dictionaries of the
-    form `{part: <value of the given function on the part>}`.
+    form `{part: <value of the given function on the part>}`. The function is
+    only called for the parts that gain or lose cut edges at this step; the
+    other parts keep their previous values.
 
     The initializer, by contrast, should take the entire partition and
     return the entire `{part: <value>}` dictionary.
@@ -58,13 +91,19 @@ def on_edge_flow(initializer, alias):
         def wrapper(partition):
             if not partition.parent:
                 return initializer(partition)
-            new_by_part = put_edges_into_parts(new_cuts(partition), partition.assignment)
-            obsolete_by_part = put_edges_into_parts(obsolete_cuts(partition),
-                                                    partition.parent.assignment)
+            new_by_part, obsolete_by_part = edge_flows(partition)
             previous = partition.parent[alias]
-            return {part: f(partition, previous[part], new_edges=new_by_part[part],
-                            old_edges=obsolete_by_part[part])
-                    for part in partition.parts}
+
+            new_values = {part: f(partition, previous[part], new_edges=new_by_part[part],
+                                  old_edges=obsolete_by_part[part])
+                          for part in new_by_part.keys() | obsolete_by_part.keys()}
+            result = {**previous, **new_values}
+
+            for part in partition.flows:
+                if part not in partition.parts:
+                    result.pop(part, None)
+
+            return result
         return wrapper
     return decorator
 
@@ -81,14 +120,23 @@ def cut_edges_by_part(partition, previous, new_edges, old_edges):
 
 
 def cut_edges(partition):
+    """
+    The set of cut edges, as an :class:`~rundmcmc.indexed_set.IndexedSet`, so
+    that proposals can draw a uniform cut edge with ``random.choice``.
+
+    The changes are applied in sorted order, so that the order of the edges,
+    and hence which edge a given random number picks, does not depend on the
+    order of iterating over sets (which, for string node IDs, depends on
+    ``PYTHONHASHSEED``).
+    """
     parent = partition.parent
 
     if not parent:
-        return {edge for edge in partition.graph.edges
-                if partition.crosses_parts(edge)}
+        return IndexedSet(tuple(sorted(edge)) for edge in partition.graph.edges
+                          if partition.crosses_parts(edge))
     # Edges that weren't cut, but now are cut
     # We sort the tuples to make sure we don't accidentally end
     # up with both (4,5) and (5,4) (for example) in it
     new, obsolete = new_cuts(partition), obsolete_cuts(partition)
 
-    return (parent['cut_edges'] | new) - obsolete
+    return parent['cut_edges'].update(added=sorted(new), removed=sorted(obsolete))
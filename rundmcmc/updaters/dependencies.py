@@ -0,0 +1,22 @@
+def depends_on(*keys):
+    """
+    Use this decorator to declare the updaters that an updater reads, so that
+    a :class:`~rundmcmc.partition.Partition` can compute them first.
+
+    Updaters are computed lazily, the first time they are accessed; the
+    declared dependencies are computed right before the updater itself. An
+    updater class can declare its dependencies with a ``dependencies``
+    attribute instead.
+
+    Example:
+
+    .. code-block:: python
+
+        @depends_on('areas', 'perimeters')
+        def polsby_popper(partition):
+            # read partition['areas'] and partition['perimeters']
+    """
+    def decorator(function):
+        function.dependencies = keys
+        return function
+    return decorator
@@ -1,18 +1,45 @@
+import collections.abc
 import math
+import warnings
 
-from .tally import Tally
+import numpy
+
+from ..frozen_graph import FrozenGraph
+from .tally import Tally, flow_changes
 
 
 class Proportion:
-    def __init__(self, tally_name, total_name):
+    """
+    An updater computing the ratio of two tallies in each part. When it knows
+    its own alias, only the parts in the partition's flows are recomputed.
+    """
+
+    def __init__(self, tally_name, total_name, alias=None):
         self.tally_name = tally_name
         self.total_name = total_name
+        self.alias = alias
+        self.dependencies = (tally_name, total_name)
 
     def __call__(self, partition):
-        return {part: partition[self.tally_name][part] / partition[self.total_name][part]
-                if partition[self.total_name][part] > 0
-                else math.nan
-                for part in partition.parts}
+        if not self.alias or not partition.flips or not partition.parent:
+            return {part: self._proportion(partition, part) for part in partition.parts}
+
+        previous = partition.parent[self.alias]
+        new_values = {part: self._proportion(partition, part)
+                      for part in partition.flows if part in partition.parts}
+        result = {**previous, **new_values}
+
+        for part in partition.flows:
+            if part not in partition.parts:
+                result.pop(part, None)
+
+        return result
+
+    def _proportion(self, partition, part):
+        total = partition[self.total_name][part]
+        if total > 0:
+            return partition[self.tally_name][part] / total
+        return math.nan
 
 
 def votes_updaters(columns, election_name=''):
@@ -45,5 +72,197 @@ def votes_updaters(columns, election_name=''):
     total_name = 'total_votes' + election_name
     tallies[total_name] = Tally(columns, alias=total_name)
     proportions = {name_proportion(column): Proportion(
-        name_count(column), total_name) for column in columns}
+        name_count(column), total_name, alias=name_proportion(column)) for column in columns}
     return {**tallies, **proportions}
+
+
+class ElectionTally:
+    """
+    An updater that tallies many vote columns at once (for instance, every
+    party in several elections). It keeps a nodes-by-columns matrix of the
+    votes, and updates a parts-by-columns matrix of totals with one pass over
+    the nodes that moved at each step. Its value is an
+    :class:`ElectionResults`; use :func:`election_updaters` to get the usual
+    per-party updaters as views of it.
+
+    :columns: the names of the node attributes storing vote counts
+    :alias: the key of this updater in the Partition's updaters dictionary
+    """
+
+    def __init__(self, columns, alias):
+        self.columns = list(columns)
+        self.alias = alias
+
+        self._graph = None
+        self._rows = None
+        self._matrix = None
+
+    def __call__(self, partition):
+        if not partition.flips or not partition.parent:
+            return self._initialize(partition)
+        return self._update(partition)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.update(_graph=None, _rows=None, _matrix=None)
+        return state
+
+    def _initialize(self, partition):
+        rows, matrix = self._get_matrix(partition.graph)
+
+        part_rows = {part: index for index, part in enumerate(partition.parts)}
+        totals = numpy.zeros((len(part_rows), len(self.columns)), dtype=matrix.dtype)
+        for part, nodes in partition.parts.items():
+            totals[part_rows[part]] = matrix[[rows[node] for node in nodes]].sum(axis=0)
+
+        return ElectionResults(self.columns, part_rows, totals, list(partition.parts))
+
+    def _update(self, partition):
+        previous = partition.parent[self.alias]
+        rows, matrix = self._get_matrix(partition.graph)
+
+        part_rows = previous.part_rows
+        totals = previous.totals
+
+        new_parts = [part for part in partition.flows if part not in part_rows]
+        if new_parts:
+            part_rows = {**part_rows, **{part: len(part_rows) + index
+                                         for index, part in enumerate(new_parts)}}
+            totals = numpy.vstack([totals, numpy.zeros((len(new_parts), len(self.columns)),
+                                                       dtype=totals.dtype)])
+        else:
+            totals = totals.copy()
+
+        signed_parts, nodes = flow_changes(partition.flows)
+        if nodes:
+            signs = numpy.array([sign for _, sign in signed_parts])
+            targets = [part_rows[part] for part, _ in signed_parts]
+            values = matrix[[rows[node] for node in nodes]]
+            numpy.add.at(totals, targets, signs[:, numpy.newaxis] * values)
+
+        return ElectionResults(self.columns, part_rows, totals, list(partition.parts))
+
+    def _get_matrix(self, graph):
+        if graph is not self._graph:
+            if isinstance(graph, FrozenGraph):
+                self._rows = range(len(graph))
+                matrix = numpy.column_stack([graph.node_columns[column]
+                                             for column in self.columns])
+            else:
+                self._rows = {node: row for row, node in enumerate(graph.nodes)}
+                matrix = numpy.array([[graph.nodes[node][column] for column in self.columns]
+                                      for node in graph.nodes])
+            if numpy.issubdtype(matrix.dtype, numpy.floating) and numpy.isnan(matrix).any():
+                warnings.warn("ElectionTally found NaN votes; they will be counted as zero.")
+                matrix = numpy.nan_to_num(matrix)
+            self._matrix = matrix
+            self._graph = graph
+        return self._rows, self._matrix
+
+
+class ElectionResults:
+    """
+    The value of an :class:`ElectionTally`: a matrix of vote totals with a
+    row for each part and a column for each vote column.
+
+    :columns: the names of the vote columns
+    :part_rows: dictionary from parts to their rows in the matrix
+    :totals: the matrix of totals
+    :parts: the parts of the partition
+    """
+
+    def __init__(self, columns, part_rows, totals, parts):
+        self.columns = columns
+        self.column_indices = {column: index for index, column in enumerate(columns)}
+        self.part_rows = part_rows
+        self.totals = totals
+        self.parts = parts
+
+    def tally(self, columns):
+        """The total of the given columns in each part, as a mapping."""
+        if isinstance(columns, str):
+            columns = [columns]
+        indices = [self.column_indices[column] for column in columns]
+        return PartView(self.part_rows, self.parts, self.totals[:, indices].sum(axis=1))
+
+    def proportion(self, column, columns):
+        """The share of `column` in the total of `columns` in each part, as a mapping."""
+        totals = self.tally(columns).values_by_row
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            shares = self.tally(column).values_by_row / totals
+        shares[totals <= 0] = math.nan
+        return PartView(self.part_rows, self.parts, shares)
+
+
+class PartView(collections.abc.Mapping):
+    """Read-only mapping from parts to the entries of a vector with a row for each part."""
+
+    def __init__(self, part_rows, parts, values_by_row):
+        self.part_rows = part_rows
+        self.parts = parts
+        self.values_by_row = values_by_row
+        self._values = None
+
+    def __getitem__(self, part):
+        if self._values is None:
+            self._values = self.values_by_row.tolist()
+        return self._values[self.part_rows[part]]
+
+    def __iter__(self):
+        return iter(self.parts)
+
+    def __len__(self):
+        return len(self.parts)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class ElectionView:
+    """Updater exposing a tally of some of the columns of an :class:`ElectionTally`."""
+
+    def __init__(self, election_alias, columns):
+        self.election_alias = election_alias
+        self.columns = columns
+        self.dependencies = (election_alias,)
+
+    def __call__(self, partition):
+        return partition[self.election_alias].tally(self.columns)
+
+
+class ElectionProportionView:
+    """Updater exposing the share of one column of an :class:`ElectionTally` in
+    the total of several columns."""
+
+    def __init__(self, election_alias, column, columns):
+        self.election_alias = election_alias
+        self.column = column
+        self.columns = columns
+        self.dependencies = (election_alias,)
+
+    def __call__(self, partition):
+        return partition[self.election_alias].proportion(self.column, self.columns)
+
+
+def election_updaters(elections, alias='elections'):
+    """
+    Returns a dictionary of updaters like :func:`votes_updaters`, for several
+    elections at once, backed by a single :class:`ElectionTally`. Example:
+    `election_updaters({'08': ['D08', 'R08'], '12': ['D12', 'R12']})` has the
+    entries `'D08'`, `'R08'`, `'total_votes08'`, `'D08%'`, `'R08%'` and the
+    same for `'12'`, as well as the `'elections'` tally itself.
+
+    :elections: dictionary from election names to the names of the node
+        attributes storing vote counts for each party in that election
+    :alias: the name of the :class:`ElectionTally` updater
+    """
+    all_columns = [column for columns in elections.values() for column in columns]
+    updaters = {alias: ElectionTally(all_columns, alias=alias)}
+
+    for election_name, columns in elections.items():
+        for column in columns:
+            updaters[column] = ElectionView(alias, [column])
+            updaters[f"{column}%"] = ElectionProportionView(alias, column, columns)
+        updaters['total_votes' + election_name] = ElectionView(alias, columns)
+
+    return updaters
@@ -4,6 +4,9 @@ class MetagraphDegree:
     Updater that computes the metagraph degree of a proposed partition; i.e.,
     the number of possible single flips to make to turn into another partition.
 
+    The validity of each flip is cached, and only the flips that could have
+    changed are tried again at the next step (see :func:`metagraph_degree`).
+
     """
 
     def __init__(self, validator, alias):
@@ -13,24 +16,100 @@ class MetagraphDegree:
         """
         self.validator = validator
         self.alias = alias
+        self.dependencies = ('cut_edges',)
 
     def __call__(self, partition):
-        total_available_flips = 2 * len(partition['cut_edges'])
+        parent = partition.parent
+        if not parent:
+            return metagraph_degree(partition, self.validator)
+        return metagraph_degree(partition, self.validator, parent, parent[self.alias])
+
+
+def metagraph_degree(partition, is_valid, previous=None, previous_degree=None):
+    """
+    Compute the metagraph degree of a partition, optionally from that of a
+    partition it was obtained from by flipping nodes.
+
+    Each cut edge `(u, v)` gives two single flips: `u` to the part of `v`,
+    and `v` to the part of `u`. A flip is tried with `is_valid` on
+    `partition.merge(flip)`, and the results are cached by the pair of parts
+    the flip moves a node between.
+
+    From a previous partition, only the flips in and out of the parts that the
+    flips between them changed are tried again; the others keep their cached
+    results. This is only correct when the validity of a flip depends only on
+    the two parts it changes, so it is only done when `is_valid` has a true
+    `local` attribute, like a :class:`~rundmcmc.validity.Validator` whose
+    constraints are all marked local (contiguity, population bounds, vanishing
+    districts and county splits are). Otherwise every flip is tried again.
+
+    :partition: The partition.
+    :is_valid: Function of a partition, like a :class:`~rundmcmc.validity.Validator`.
+    :previous: (optional) A partition that `partition` was obtained from.
+    :previous_degree: The metagraph degree of `previous`.
+    :returns: Dictionary with the number of flips across cut edges
+              (`'total'`), the number of those flips that are valid
+              (`'valid'`), and the cached results (`'flips'`), a dictionary
+              from `frozenset((from_part, to_part))` to dictionaries from
+              flips `(node, to_part)` to their validity.
+
+    """
+    total_available_flips = 2 * len(partition['cut_edges'])
+
+    if previous is None or previous_degree is None or not getattr(is_valid, 'local', False):
+        valid_flips = {}
+        total_valid_flips = _count_valid_flips(partition, partition['cut_edges'],
+                                               is_valid, valid_flips)
+        return {'total': total_available_flips, 'valid': total_valid_flips,
+                'flips': valid_flips}
+
+    changed_parts = _changed_parts(previous, partition)
+    valid_flips = {parts: flips for parts, flips in previous_degree['flips'].items()
+                   if not parts & changed_parts}
+
+    # Take out the flips in and out of the changed parts, and count them again.
+    total_valid_flips = previous_degree['valid'] - _count_valid_flips(
+        previous, _cut_edges_of_parts(previous, changed_parts), None,
+        previous_degree['flips'])
+    total_valid_flips += _count_valid_flips(
+        partition, _cut_edges_of_parts(partition, changed_parts), is_valid, valid_flips)
+
+    return {'total': total_available_flips, 'valid': total_valid_flips, 'flips': valid_flips}
+
+
+def _count_valid_flips(partition, edges, is_valid, valid_flips):
+    """Count the valid flips across the given cut edges, trying out the ones
+    that are not in `valid_flips` yet with `is_valid`."""
+    assignment = partition.assignment
+    count = 0
+
+    for edge in edges:
+        for node, other in (edge, reversed(edge)):
+            part, new_part = assignment[node], assignment[other]
+            flips = valid_flips.setdefault(frozenset((part, new_part)), {})
+            flip = (node, new_part)
+            if flip not in flips:
+                flips[flip] = bool(is_valid(partition.merge({node: new_part})))
+            count += flips[flip]
+
+    return count
 
-        total_valid_flips = sum(self.num_valid_flips(edge, partition)
-                                for edge in partition['cut_edges'])
 
-        return {'total': total_available_flips, 'valid': total_valid_flips}
+def _changed_parts(previous, partition):
+    """The parts that nodes moved in or out of between the two partitions."""
+    changed = set()
+    for node, part in partition.flips.items():
+        old_part = previous.assignment[node]
+        if part != old_part:
+            changed.update((part, old_part))
+    return changed
 
-    def num_valid_flips(self, edge, partition):
-        """Determine number of valid flips for the given edge (0, 1, or 2)."""
-        flip = {edge[0]: partition.assignment[edge[1]]}
-        reverse_flip = {edge[1]: partition.assignment[edge[0]]}
 
-        # XXX: This is really awful.
-        del partition.updaters[self.alias]
-        flip_valid = self.validator(partition.merge(flip))
-        reverse_valid = self.validator(partition.merge(reverse_flip))
-        partition.updaters[self.alias] = self
+def _cut_edges_of_parts(partition, parts):
+    """The cut edges that have an endpoint in one of the given parts."""
+    if 'cut_edges_by_part' in partition.updaters:
+        cut_edges_by_part = partition['cut_edges_by_part']
+        return set().union(*(cut_edges_by_part.get(part, ()) for part in parts))
 
-        return flip_valid + reverse_valid
+    return [edge for edge in partition['cut_edges']
+            if partition.assignment[edge[0]] in parts or partition.assignment[edge[1]] in parts]
@@ -1,8 +1,13 @@
+import bisect
 import collections
+import collections.abc
 import warnings
 import math
 
-from .flows import flows_from_changes
+import numpy
+
+from rundmcmc.frozen_graph import FrozenGraph
+from rundmcmc.updaters.flows import flows_from_changes
 
 
 class Tally:
@@ -14,9 +19,16 @@ class Tally:
     :alias: the aliased name of this Tally (meaning, the key corresponding to
     this Tally in the Partition's updaters dictionary)
     :dtype: the type (int, float, etc.) that you want the tally to have
+    :extremes: whether to also keep the tallies in sorted order, so that the
+    smallest and largest are found without looking at every part (see
+    :class:`SortedTally`)
+
+    The tallied attributes are read from the graph once, into a column with
+    the total of the fields for each node. At each step, the values of all of
+    the nodes in the partition's flows are gathered from that column at once.
     """
 
-    def __init__(self, fields, alias=None, dtype=int):
+    def __init__(self, fields, alias=None, dtype=int, extremes=False):
         if not isinstance(fields, list):
             fields = [fields]
         if not alias:
@@ -24,12 +36,23 @@ class Tally:
         self.fields = fields
         self.alias = alias
         self.dtype = dtype
+        self.extremes = extremes
+
+        self._graph = None
+        self._rows = None
+        self._column = None
 
     def __call__(self, partition):
         if not partition.flips or not partition.parent:
             return self._initialize_tally(partition)
         return self._update_tally(partition)
 
+    def __getstate__(self):
+        # The column is cheap to rebuild, so don't copy it (or the graph).
+        state = self.__dict__.copy()
+        state.update(_graph=None, _rows=None, _column=None)
+        return state
+
     def _initialize_tally(self, partition):
         """
         Compute the initial district-wide tally of data stored in the "field"
@@ -40,15 +63,15 @@ class Tally:
         :partition: :class:`Partition` class.
 
         """
+        rows, column = self._get_column(partition.graph)
+        values = column.tolist()
+
         tally = collections.defaultdict(self.dtype)
         for node, part in partition.assignment.items():
-            add = self._get_tally_from_node(partition, node)
+            tally[part] += values[rows[node]]
 
-            if math.isnan(add):
-                warnings.warn("ignoring nan encountered at node '{}' for attribute '{}' "
-                              "with fields {}".format(node, self.alias, self.fields))
-            else:
-                tally[part] += add
+        if self.extremes:
+            return SortedTally.from_dict(tally)
         return tally
 
     def _update_tally(self, partition):
@@ -62,32 +85,163 @@ class Tally:
         :changes: Proposed changes.
 
         """
-        parent = partition.parent
-        flips = partition.flips
+        old_tally = partition.parent[self.alias]
+        new_tally = self._tally_flows(partition.graph, old_tally, partition.flows)
 
-        old_tally = parent[self.alias]
-        new_tally = dict()
+        if isinstance(old_tally, SortedTally):
+            return old_tally.updated(new_tally)
+        return {**old_tally, **new_tally}
 
-        graph = partition.graph
+    def changed_tallies(self, partition, flips):
+        """
+        Compute the tallies of the parts that the given flips would change,
+        without building the partition that they lead to.
 
-        for part, flow in flows_from_changes(parent.assignment, flips).items():
-            out_flow = compute_out_flow(graph, self.fields, flow)
-            in_flow = compute_in_flow(graph, self.fields, flow)
-            new_tally[part] = old_tally[part] - out_flow + in_flow
+        :partition: :class:`Partition` class, with this Tally among its updaters.
+        :flips: Proposed changes.
+        :returns: Dictionary from the changed parts to their new tallies.
 
-        return {**old_tally, **new_tally}
+        """
+        flows = flows_from_changes(partition.assignment, flips)
+        return self._tally_flows(partition.graph, partition[self.alias], flows)
 
-    def _get_tally_from_node(self, partition, node):
-        return sum(partition.graph.nodes[node][field] for field in self.fields)
+    def _tally_flows(self, graph, old_tally, flows):
+        rows, column = self._get_column(graph)
 
+        # Gather the values of all of the nodes that moved at once.
+        signed_parts, nodes = flow_changes(flows)
+        values = column[[rows[node] for node in nodes]].tolist()
 
-def compute_out_flow(graph, fields, flow):
-    return sum(graph.nodes[node][field]
-               for node in flow['out']
-               for field in fields)
+        new_tally = {part: old_tally.get(part, self.dtype()) for part in flows}
+        for (part, sign), value in zip(signed_parts, values):
+            new_tally[part] += sign * value
+        return new_tally
 
+    def _get_column(self, graph):
+        """
+        :returns: a dictionary from nodes to their rows, and a NumPy array with
+            the total of the tallied fields for the node in each row.
+        """
+        if graph is not self._graph:
+            if isinstance(graph, FrozenGraph):
+                self._rows, self._column = self._get_frozen_column(graph)
+            else:
+                self._rows = {node: row for row, node in enumerate(graph.nodes)}
+                self._column = numpy.array([self._get_tally_from_node(graph, node)
+                                            for node in graph.nodes])
+            self._graph = graph
+        return self._rows, self._column
+
+    def _get_frozen_column(self, graph):
+        """
+        The nodes of a :class:`~rundmcmc.frozen_graph.FrozenGraph` are their
+        own rows, and the graph already stores each field as a column. A
+        single field is used in place, so it stays in shared memory.
+        """
+        columns = [numpy.asarray(graph.node_columns[field]) for field in self.fields]
+        column = columns[0] if len(columns) == 1 else sum(columns)
+
+        if numpy.issubdtype(column.dtype, numpy.floating) and numpy.isnan(column).any():
+            for node in numpy.flatnonzero(numpy.isnan(column)).tolist():
+                warnings.warn("ignoring nan encountered at node '{}' for attribute '{}' "
+                              "with fields {}".format(node, self.alias, self.fields))
+            column = numpy.nan_to_num(column)
+        return range(len(graph)), column
+
+    def _get_tally_from_node(self, graph, node):
+        add = sum(graph.nodes[node][field] for field in self.fields)
 
-def compute_in_flow(graph, fields, flow):
-    return sum(graph.nodes[node][field]
-               for node in flow['in']
-               for field in fields)
+        if math.isnan(add):
+            warnings.warn("ignoring nan encountered at node '{}' for attribute '{}' "
+                          "with fields {}".format(node, self.alias, self.fields))
+            return 0
+        return add
+
+
+class SortedTally(dict):
+    """
+    Dictionary from parts to their tallies that also keeps a list of the
+    `(tally, part)` pairs in increasing order, so that the smallest and
+    largest tallies are read in constant time. Its :meth:`values` view has an
+    :meth:`~SortedValues.extremes` method, which :class:`~rundmcmc.validity.Bounds`
+    and the population constraints use instead of scanning every value.
+
+    :meth:`updated` moves only the parts that changed, with :mod:`bisect`.
+    """
+
+    def __init__(self, tally, order):
+        """
+        :tally: Dictionary from parts to tallies.
+        :order: Sorted list of the `(tally, part)` pairs of `tally`.
+        """
+        super().__init__(tally)
+        self.order = order
+
+    @classmethod
+    def from_dict(cls, tally):
+        return cls(tally, sorted((value, part) for part, value in tally.items()))
+
+    def updated(self, new_tally):
+        """
+        :new_tally: Dictionary from the parts that changed to their new tallies.
+        :returns: A new :class:`SortedTally` with the changes. This one is left
+                  unchanged.
+        """
+        order = list(self.order)
+        for part, value in new_tally.items():
+            if part in self:
+                del order[bisect.bisect_left(order, (self[part], part))]
+            bisect.insort(order, (value, part))
+        return self.__class__({**self, **new_tally}, order)
+
+    def min_part(self):
+        """The part with the smallest tally."""
+        return self.order[0][1]
+
+    def max_part(self):
+        """The part with the largest tally."""
+        return self.order[-1][1]
+
+    def values(self):
+        return SortedValues(self)
+
+    def __reduce__(self):
+        return (self.__class__, (dict(self), self.order))
+
+
+class SortedValues(collections.abc.ValuesView):
+    """The values of a :class:`SortedTally`."""
+
+    def extremes(self):
+        """:returns: The smallest and the largest values, as a tuple."""
+        order = self._mapping.order
+        return order[0][0], order[-1][0]
+
+
+def min_and_max(values):
+    """
+    :values: Iterable of values, like the values of a tally.
+    :returns: The smallest and the largest of the values, as a tuple. The
+              values of a :class:`SortedTally` are not scanned.
+    """
+    if hasattr(values, 'extremes'):
+        return values.extremes()
+    return min(values), max(values)
+
+
+def flow_changes(flows):
+    """
+    Flatten flows of nodes into two lists: `(part, sign)` pairs, where the
+    sign is 1 for nodes joining the part and -1 for nodes leaving it, and the
+    nodes themselves.
+    """
+    signed_parts = []
+    nodes = []
+    for part, flow in flows.items():
+        for node in flow['in']:
+            signed_parts.append((part, 1))
+            nodes.append(node)
+        for node in flow['out']:
+            signed_parts.append((part, -1))
+            nodes.append(node)
+    return signed_parts, nodes
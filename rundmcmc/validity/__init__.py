@@ -5,6 +5,7 @@ Collection of constraint functions for the validation step in RunDMCMC.
 Helper classes
 ==========================================================================
 Validator                   Collection of constraints
+ConstraintStatistics        Call counts and timings of a constraint
 Bounds                      Bounds on numeric constraints
 UpperBounds                 Upper bounds on numeric constraints
 LowerBounds                 Lower bounds on numeric constraints
@@ -42,11 +43,26 @@ and should return whether or not the instance is valid according to their
 rules. Many top-level functions following this signature in this module are
 examples of this.
 
+A validator can also have a ``check(parent, flips)`` attribute, which decides
+from the current partition and the proposed flips alone whether the proposal
+could be valid. :meth:`Validator.check` runs these, and the chain calls it
+before building the proposed partition, so that the proposals they reject
+cost no more than the check. A check must only return ``False`` when the
+validator would also fail on the merged partition. The population
+:class:`Bounds` of :func:`within_percent_of_ideal_population`,
+:func:`no_vanishing_districts` and :func:`refuse_new_splits` have checks.
+
+A validator with a true ``local`` attribute promises that whether a single
+flip is valid only depends on the two parts that it changes. The
+:class:`~rundmcmc.updaters.MetagraphDegree` updater only reuses the validity
+of flips between unchanged parts when every constraint of its
+:class:`Validator` is local; bounds on sums over every district are not.
+
 """
 
 from .validity import (L1_reciprocal_polsby_popper,
                        L1_reciprocal_discrete_polsby_popper,
-                       L_minus_1_polsby_popper, Validator,
+                       L_minus_1_polsby_popper, Validator, ConstraintStatistics,
                        no_worse_L_minus_1_polsby_popper,
                        no_worse_L1_reciprocal_polsby_popper,
                        no_vanishing_districts, refuse_new_splits,
@@ -1,3 +1,6 @@
+from rundmcmc.updaters.tally import min_and_max
+
+
 class Bounds:
     """
     Wrapper for numeric-validators to enforce upper and lower limits.
@@ -7,18 +10,39 @@ class Bounds:
     ``False`` otherwise.
 
     """
-    def __init__(self, func, bounds):
+    def __init__(self, func, bounds, changed_values=None):
         """
         :func: Numeric validator function. Should return an iterable of values.
         :bounds: Tuple of (lower, upper) numeric bounds.
+        :changed_values: (optional) Function of a partition and proposed flips
+                         that returns the values of `func` that the flips
+                         would change, for :meth:`check`.
         """
         self.func = func
         self.bounds = bounds
+        self.changed_values = changed_values
 
     def __call__(self, *args, **kwargs):
         lower, upper = self.bounds
-        values = self.func(*args, **kwargs)
-        return lower <= min(values) and max(values) <= upper
+        lowest, highest = min_and_max(self.func(*args, **kwargs))
+        return lower <= lowest and highest <= upper
+
+    def check(self, parent, flips):
+        """
+        Check the values that the given flips would change, before the
+        partition they lead to is built. This returns ``False`` only if
+        calling the bounds on that partition would too.
+
+        :parent: The partition that the flips are proposed from.
+        :flips: Dictionary of proposed flips.
+
+        """
+        if self.changed_values is None:
+            return True
+
+        lower, upper = self.bounds
+        values = list(self.changed_values(parent, flips))
+        return not values or (lower <= min(values) and max(values) <= upper)
 
     @property
     def __name__(self):
@@ -1,12 +1,13 @@
 import collections
+import copy
 import logging
-import random
+import time
 
 import networkx as nx
-import networkx.algorithms.shortest_paths.weighted as nx_path
-from networkx import NetworkXNoPath
 
-from rundmcmc.updaters import CountySplit
+from rundmcmc.updaters import CountySplit, flows_from_changes
+from rundmcmc.updaters.contiguity import connected_within_part
+from rundmcmc.updaters.tally import min_and_max
 from rundmcmc.validity.bounds import (SelfConfiguringLowerBound, SelfConfiguringUpperBound,
                                       Bounds)
 
@@ -21,10 +22,31 @@ class Validator:
     This class is meant to be called as a function after instantiation; its
     return is ``True`` if all validators pass, and ``False`` if any one fails.
 
+    Every call of a constraint is counted and timed, along with whether it
+    rejected the partition, and so is every call of its pre-merge check from
+    :meth:`check` (see :meth:`statistics`). In adaptive mode, the
+    constraints are reordered every `reorder_every` calls so that the ones
+    that reject the most partitions per second of checking run first. The
+    result of a call does not depend on the order, but constraints after a
+    failing one are not called at all, so cheap constraints that reject often
+    save the time of expensive ones like contiguity checks.
+
     """
-    def __init__(self, constraints):
-        """:constraints: List of validator functions that will check partitions."""
-        self.constraints = constraints
+    def __init__(self, constraints, adaptive=False, reorder_every=1000):
+        """
+        :constraints: List of validator functions that will check partitions.
+        :adaptive: Whether to reorder the constraints by their rejections per
+                   unit of time.
+        :reorder_every: Number of calls between reorderings, in adaptive mode.
+
+        """
+        self.constraints = list(constraints)
+        self.adaptive = adaptive
+        self.reorder_every = reorder_every
+
+        self._statistics = [ConstraintStatistics(index, _constraint_name(constraint))
+                            for index, constraint in enumerate(self.constraints)]
+        self._calls = 0
 
     def __call__(self, partition):
         """Determine if the given partition is valid.
@@ -32,14 +54,154 @@ class Validator:
         :partition: :class:`Partition` class to check.
 
         """
+        self._calls += 1
+        if self.adaptive and self._calls % self.reorder_every == 0:
+            self.reorder()
+
         # check each constraint function and fail when a constraint test fails
-        for constraint in self.constraints:
-            if not constraint(partition):
+        for constraint, statistics in zip(self.constraints, self._statistics):
+            start = time.perf_counter()
+            is_valid = constraint(partition)
+            statistics.time += time.perf_counter() - start
+            statistics.calls += 1
+
+            if not is_valid:
+                statistics.rejections += 1
                 return False
 
         # all constraints are satisfied
         return True
 
+    def reorder(self):
+        """Order the constraints by their rejections per second spent calling
+        them, from the highest. Constraints that have not rejected anything yet
+        keep their place relative to each other, after the others."""
+        order = sorted(zip(self._statistics, self.constraints),
+                       key=lambda pair: -pair[0].rejections_per_second)
+        self._statistics = [statistics for statistics, _ in order]
+        self.constraints = [constraint for _, constraint in order]
+
+    def statistics(self):
+        """
+        :returns: List of dictionaries with the `name`, number of `calls`,
+                  number of `rejections` and total `time` in seconds of each
+                  constraint, and the same for the pre-merge checks of
+                  :meth:`check` as `check_calls`, `check_rejections` and
+                  `check_time`, in the order the constraints were given. The
+                  list can be saved with :func:`json.dump`.
+
+        """
+        return [statistics.as_dict()
+                for statistics in sorted(self._statistics, key=lambda item: item.index)]
+
+    def snapshot(self):
+        """
+        :returns: A picklable dictionary with the state of this validator: the
+                  order and statistics of its constraints, and the bounds
+                  that its self-configuring constraints have set. Restore it
+                  with :meth:`restore`.
+        """
+        bounds = {statistics.index: constraint.bound
+                  for statistics, constraint in zip(self._statistics, self.constraints)
+                  if isinstance(constraint, (SelfConfiguringLowerBound,
+                                             SelfConfiguringUpperBound))}
+        return {'statistics': copy.deepcopy(self._statistics), 'calls': self._calls,
+                'bounds': bounds}
+
+    def restore(self, snapshot):
+        """
+        Restore the state of a validator with the same constraints, from its
+        :meth:`snapshot`.
+        """
+        constraints = {statistics.index: constraint
+                       for statistics, constraint in zip(self._statistics, self.constraints)}
+
+        self._statistics = copy.deepcopy(snapshot['statistics'])
+        self.constraints = [constraints[statistics.index] for statistics in self._statistics]
+        self._calls = snapshot['calls']
+
+        for index, bound in snapshot['bounds'].items():
+            constraints[index].bound = bound
+
+    @property
+    def local(self):
+        """True if every constraint is marked ``local``, meaning that whether
+        a flip is valid only depends on the two parts that it changes."""
+        return all(getattr(constraint, 'local', False) for constraint in self.constraints)
+
+    def check(self, parent, flips):
+        """Check the proposed flips with the constraints that can do so
+        before the partition they lead to is built.
+
+        Constraints with a ``check(parent, flips)`` method are asked whether
+        the flips could be valid, using only the parent partition. A ``False``
+        from any of them means that calling this validator on the merged
+        partition would return ``False`` too, so the chain can reject the
+        proposal without merging it.
+
+        :parent: :class:`Partition` class that the flips are proposed from.
+        :flips: Dictionary of proposed flips.
+
+        """
+        for constraint, statistics in zip(self.constraints, self._statistics):
+            check = getattr(constraint, 'check', None)
+            if check is None:
+                continue
+
+            start = time.perf_counter()
+            could_be_valid = check(parent, flips)
+            statistics.check_time += time.perf_counter() - start
+            statistics.check_calls += 1
+
+            if not could_be_valid:
+                statistics.check_rejections += 1
+                return False
+
+        return True
+
+
+class ConstraintStatistics:
+    """Counters of the calls of one constraint of a :class:`Validator`."""
+
+    def __init__(self, index, name):
+        """
+        :index: Position of the constraint in the list given to the Validator.
+        :name: Name of the constraint.
+
+        """
+        self.index = index
+        self.name = name
+        self.calls = 0
+        self.rejections = 0
+        self.time = 0.0
+        # The same, for the constraint's pre-merge check.
+        self.check_calls = 0
+        self.check_rejections = 0
+        self.check_time = 0.0
+
+    @property
+    def rejections_per_second(self):
+        """Rejections per second, by the constraint and by its check together."""
+        time = self.time + self.check_time
+        if not time:
+            return 0.0
+        return (self.rejections + self.check_rejections) / time
+
+    def as_dict(self):
+        return {'name': self.name, 'calls': self.calls, 'rejections': self.rejections,
+                'time': self.time, 'check_calls': self.check_calls,
+                'check_rejections': self.check_rejections, 'check_time': self.check_time}
+
+    def __repr__(self):
+        return "ConstraintStatistics({name!r}, calls={calls}, rejections={rejections}, " \
+               "time={time:.6f}, check_calls={check_calls}, " \
+               "check_rejections={check_rejections}, " \
+               "check_time={check_time:.6f})".format(**self.as_dict())
+
+
+def _constraint_name(constraint):
+    return getattr(constraint, '__name__', type(constraint).__name__)
+
 
 def L1_reciprocal_polsby_popper(partition):
     return sum(1 / value for value in partition['polsby_popper'].values())
@@ -73,12 +235,20 @@ def within_percent_of_ideal_population(initial_partition, percent=0.01):
     def population(partition):
         return partition["population"].values()
 
+    def changed_population(partition, flips):
+        tally = partition.updaters["population"]
+        if not hasattr(tally, 'changed_tallies'):
+            return ()
+        return tally.changed_tallies(partition, flips).values()
+
     number_of_districts = len(initial_partition['population'].keys())
     total_population = sum(initial_partition['population'].values())
     ideal_population = total_population / number_of_districts
     bounds = ((1 - percent) * ideal_population, (1 + percent) * ideal_population)
 
-    return Bounds(population, bounds=bounds)
+    constraint = Bounds(population, bounds=bounds, changed_values=changed_population)
+    constraint.local = True
+    return constraint
 
 
 def single_flip_contiguous(partition):
@@ -97,7 +267,7 @@ def single_flip_contiguous(partition):
     We assume that `removed_node` belonged to an assignment class that formed a
     connected subgraph. To see if its removal left the subgraph connected, we
     check that the neighbors of the removed node are still connected through
-    the changed graph.
+    the changed graph, with :func:`connected_within_part`.
 
     """
     parent = partition.parent
@@ -106,48 +276,17 @@ def single_flip_contiguous(partition):
         return contiguous(partition)
 
     graph = partition.graph
-    assignment_dict = parent.assignment
-
-    def proposed_assignment(node):
-        """Return the proposed assignment of the given node."""
-        if node in flips:
-            return flips[node]
-
-        return assignment_dict[node]
-
-    def partition_edge_weight(start_node, end_node, edge_attrs):
-        """
-        Compute the district edge weight, which is 1 if the nodes have the same
-        assignment, and infinity otherwise.
-        """
-        if proposed_assignment(start_node) != proposed_assignment(end_node):
-            return float("inf")
-
-        return 1
-
-    for changed_node, _ in flips.items():
-        old_neighbors = []
-        old_assignment = assignment_dict[changed_node]
-
-        for node in graph.neighbors(changed_node):
-            if proposed_assignment(node) == old_assignment:
-                old_neighbors.append(node)
-
-        if not old_neighbors:
-            # Under our assumptions, if there are no old neighbors, then the
-            # old_assignment district has vanished. It is trivially connected.
-            return True
+    assignment = partition.assignment
 
-        start_neighbor = random.choice(old_neighbors)
+    for changed_node in flips:
+        old_assignment = parent.assignment[changed_node]
+        old_neighbors = [node for node in graph.neighbors(changed_node)
+                         if assignment[node] == old_assignment]
 
-        for neighbor in old_neighbors:
-            try:
-                distance, _ = nx_path.single_source_dijkstra(graph, start_neighbor, neighbor,
-                                                             weight=partition_edge_weight)
-                if not (distance < float("inf")):
-                    return False
-            except NetworkXNoPath:
-                return False
+        # Under our assumptions, if there are no old neighbors, then the
+        # old_assignment district has vanished. It is trivially connected.
+        if not connected_within_part(graph, assignment, old_neighbors, old_assignment):
+            return False
 
     # All neighbors of all changed nodes are connected, so the new graph is
     # connected.
@@ -297,10 +436,10 @@ def districts_within_tolerance(partition, attribute_name="population", percentag
     if percentage >= 1:
         percentage *= 0.01
 
-    values = partition[attribute_name].values()
-    max_difference = max(values) - min(values)
+    lowest, highest = min_and_max(partition[attribute_name].values())
+    max_difference = highest - lowest
 
-    within_tolerance = max_difference <= percentage * min(values)
+    within_tolerance = max_difference <= percentage * lowest
     return within_tolerance
 
 
@@ -309,14 +448,18 @@ def population_balance(partition, attribute_name="population"):
     Compute the ratio "range / minimum value" of the given attribute on
     assignment blocks.
     """
-    values = partition[attribute_name].values()
-    max_difference = max(values) - min(values)
-    return max_difference / min(values)
+    lowest, highest = min_and_max(partition[attribute_name].values())
+    return (highest - lowest) / lowest
 
 
 def refuse_new_splits(partition_county_field):
     """Refuse all proposals that split a county that was previous unsplit.
 
+    A county that is split in one partition but whole in the next is unsplit
+    from then on, so it can never be split again. Chains with this constraint
+    can therefore run into partitions where every county is whole and no flip
+    across a district boundary is valid.
+
     :partition_county_field: Name of field for county information generated by
                              :func:`.county_splits`.
 
@@ -328,6 +471,34 @@ def refuse_new_splits(partition_county_field):
 
         return True
 
+    def check(parent, flips):
+        county_field = getattr(parent.updaters[partition_county_field], 'county_field', None)
+        if county_field is None:
+            return True
+
+        county_dict = parent[partition_county_field]
+        counts = collections.defaultdict(collections.Counter)
+        for node, part in flips.items():
+            old_part = parent.assignment[node]
+            if part != old_part:
+                county = parent.graph.nodes[node][county_field]
+                counts[county][old_part] -= 1
+                counts[county][part] += 1
+
+        for county, changes in counts.items():
+            county_info = county_dict[county]
+            if county_info.split == CountySplit.OLD_SPLIT:
+                continue
+            parts = [part for part in set(county_info.counts) | set(changes)
+                     if county_info.counts.get(part, 0) + changes[part] > 0]
+            if len(parts) > 1:
+                return False
+
+        return True
+
+    _refuse_new_splits.check = check
+    _refuse_new_splits.local = True
+    _refuse_new_splits.__name__ = "refuse_new_splits({!r})".format(partition_county_field)
     return _refuse_new_splits
 
 
@@ -336,3 +507,25 @@ def no_vanishing_districts(partition):
     if not partition.parent:
         return True
     return len(partition) == len(partition.parent)
+
+
+def _no_vanishing_districts_check(parent, flips):
+    """Count the parts that the flips would empty or create, from the sizes
+    of the parts of the parent."""
+    number_of_parts = len(parent)
+    for part, flow in flows_from_changes(parent.assignment, flips).items():
+        old_size = len(parent.parts[part]) if part in parent.parts else 0
+        new_size = old_size + len(flow['in']) - len(flow['out'])
+        if old_size and not new_size:
+            number_of_parts -= 1
+        elif new_size and not old_size:
+            number_of_parts += 1
+    return number_of_parts == len(parent)
+
+
+no_vanishing_districts.check = _no_vanishing_districts_check
+
+# Whether a single flip is valid under these constraints only depends on the
+# two parts that it changes (see Validator.local).
+for _constraint in (single_flip_contiguous, contiguous, fast_connected, no_vanishing_districts):
+    _constraint.local = True
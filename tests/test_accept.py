@@ -0,0 +1,18 @@
+from rundmcmc.accept import metagraph_accept
+
+
+class MockPartition:
+    def __init__(self, valid, parent=None):
+        self.metagraph_degree = {'valid': valid}
+        self.parent = parent
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+
+def test_metagraph_accept_rejects_partitions_without_valid_flips():
+    parent = MockPartition(valid=4)
+
+    assert not metagraph_accept(MockPartition(valid=0, parent=parent))
+    assert metagraph_accept(MockPartition(valid=2, parent=parent))
+    assert metagraph_accept(MockPartition(valid=0))
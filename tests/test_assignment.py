@@ -0,0 +1,27 @@
+from rundmcmc.assignment import PersistentAssignment
+
+
+def example_assignment(size=200):
+    return PersistentAssignment.from_dict({node: node % 3 for node in range(size)})
+
+
+def test_PersistentAssignment_reads_like_a_dict():
+    assignment = example_assignment()
+    assert assignment[5] == 2
+    assert len(assignment) == 200
+    assert 199 in assignment and 200 not in assignment
+    assert dict(assignment) == {node: node % 3 for node in range(200)}
+
+
+def test_PersistentAssignment_merge_does_not_mutate_original():
+    assignment = example_assignment()
+    merged = assignment.merge({5: 0, 150: 7})
+    assert merged[5] == 0 and merged[150] == 7
+    assert assignment[5] == 2 and assignment[150] == 0
+
+
+def test_PersistentAssignment_merge_shares_untouched_chunks():
+    assignment = example_assignment()
+    merged = assignment.merge({5: 0})
+    shared = [new is old for new, old in zip(merged.chunks, assignment.chunks)]
+    assert shared.count(False) == 1
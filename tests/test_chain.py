@@ -1,4 +1,16 @@
-from rundmcmc.chain import MarkovChain
+import collections
+import random
+
+import networkx
+import pytest
+
+from rundmcmc.accept import cut_edge_accept
+from rundmcmc.chain import MarkovChain, RejectionFreeChain
+from rundmcmc.partition import ArrayPartition, MutablePartition, Partition
+from rundmcmc.proposals import propose_random_flip
+from rundmcmc.updaters import Tally, cut_edges
+from rundmcmc.validity import (SelfConfiguringUpperBound, Validator, no_vanishing_districts,
+                               single_flip_contiguous, within_percent_of_ideal_population)
 
 
 class MockState:
@@ -29,3 +41,173 @@ def test_MarkovChain_runs_only_total_steps_times():
         counter += 1
     if counter < 10:
         assert False
+
+
+def two_by_three_partition():
+    graph = networkx.grid_graph([2, 3])
+    assignment = {node: int(node[1] >= 1) for node in graph}
+    return Partition(graph, assignment, {'cut_edges': cut_edges})
+
+
+def cut_edge_acceptance(partition):
+    return min(1, len(partition.parent['cut_edges']) / len(partition['cut_edges']))
+
+
+def test_RejectionFreeChain_only_makes_valid_flips():
+    random.seed(2018)
+    validator = Validator([single_flip_contiguous, no_vanishing_districts])
+    chain = RejectionFreeChain(validator, two_by_three_partition(), total_steps=100)
+
+    previous = None
+    for state in chain:
+        assert chain.holding_time == 1
+        if previous is not None:
+            assert len(state.flips) == 1
+            assert validator(previous.merge(state.flips))
+        previous = state
+
+
+def test_RejectionFreeChain_weighted_by_holding_times_matches_MarkovChain():
+    validator = Validator([single_flip_contiguous, no_vanishing_districts])
+
+    def key(partition):
+        return tuple(sorted(partition.assignment.items()))
+
+    random.seed(2018)
+    chain = MarkovChain(propose_random_flip, validator, cut_edge_accept,
+                        two_by_three_partition(), total_steps=10000)
+    expected = collections.Counter(key(chain.state) for _ in chain)
+
+    random.seed(2018)
+    chain = RejectionFreeChain(validator, two_by_three_partition(), cut_edge_acceptance,
+                               total_steps=3000)
+    weighted = collections.Counter()
+    for state in chain:
+        weighted[key(state)] += chain.holding_time
+
+    expected_total, weighted_total = sum(expected.values()), sum(weighted.values())
+    distance = sum(abs(expected[state] / expected_total - weighted[state] / weighted_total)
+                   for state in set(expected) | set(weighted)) / 2
+    assert distance < 0.1
+
+
+def grid_graph():
+    graph = networkx.grid_graph([6, 6])
+    for node in graph:
+        graph.nodes[node]['population'] = 1
+    return graph
+
+
+def key(partition):
+    return tuple(sorted(partition.assignment.items()))
+
+
+def test_RejectionFreeChain_caches_local_acceptance_probabilities():
+    validator = Validator([single_flip_contiguous, no_vanishing_districts])
+    graph = networkx.grid_graph([9, 9])
+    assignment = {node: 3 * (node[0] // 3) + node[1] // 3 for node in graph}
+
+    runs, calls = [], []
+    for local in (False, True):
+        def acceptance(partition):
+            calls.append(local)
+            # The change in the number of cut edges only depends on the parts
+            # that the flip moves a node between.
+            increase = len(partition['cut_edges']) - len(partition.parent['cut_edges'])
+            return min(1, 2 ** -increase)
+        acceptance.local = local
+
+        random.seed(2018)
+        chain = RejectionFreeChain(validator, Partition(graph, assignment,
+                                                        {'cut_edges': cut_edges}),
+                                   acceptance, total_steps=100)
+        runs.append([(key(state), chain.holding_time) for state in chain])
+
+    assert runs[0] == runs[1]
+    assert calls.count(True) < calls.count(False) / 2
+
+
+@pytest.mark.parametrize('partition_class', [Partition, ArrayPartition, MutablePartition])
+def test_resumed_chain_yields_the_same_states(tmp_path, partition_class):
+    path = str(tmp_path / 'chain.checkpoint')
+    assignment = {node: int(node[0] >= 3) + 2 * int(node[1] >= 3) for node in grid_graph()}
+    initial_state = partition_class(grid_graph(), assignment,
+                                    {'cut_edges': cut_edges, 'population': Tally('population')})
+    validator = Validator([single_flip_contiguous, no_vanishing_districts], adaptive=True,
+                          reorder_every=20)
+
+    random.seed(2018)
+    chain = MarkovChain(propose_random_flip, validator, cut_edge_accept, initial_state,
+                        total_steps=130, checkpoint_path=path, checkpoint_every=50)
+    states = [key(state) for state in chain]
+
+    random.seed(0)
+    resumed = MarkovChain.resume(path, grid_graph())
+    assert [key(state) for state in resumed] == states[100:]
+    assert resumed.is_valid.statistics()[0]['calls'] == validator.statistics()[0]['calls']
+
+
+def number_of_cut_edges(partition):
+    return len(partition['cut_edges'])
+
+
+def make_validator(initial_state):
+    return Validator([single_flip_contiguous,
+                      within_percent_of_ideal_population(initial_state, 0.5),
+                      SelfConfiguringUpperBound(number_of_cut_edges)])
+
+
+def test_resume_restores_the_bounds_of_validators_that_are_passed_again(tmp_path):
+    path = str(tmp_path / 'chain.checkpoint')
+    assignment = {node: int(node[0] + node[1] % 2 >= 3) for node in grid_graph()}
+    updaters = {'cut_edges': cut_edges, 'population': Tally('population')}
+    initial_state = Partition(grid_graph(), assignment, updaters)
+
+    validator = make_validator(initial_state)
+
+    random.seed(2018)
+    chain = MarkovChain(propose_random_flip, validator, cut_edge_accept, initial_state,
+                        total_steps=100)
+    states = []
+    for state in chain:
+        states.append(key(state))
+        if len(states) == 60:
+            chain.checkpoint(path)
+
+    # The validator's closures cannot be saved.
+    with pytest.raises(ValueError):
+        MarkovChain.resume(path, grid_graph())
+
+    new_validator = make_validator(initial_state)
+    new_validator.constraints[2].bound = 1000
+    resumed = MarkovChain.resume(path, grid_graph(), is_valid=new_validator)
+    assert new_validator.constraints[2].bound == validator.constraints[2].bound
+    assert [key(state) for state in resumed] == states[60:]
+
+
+@pytest.mark.parametrize('partition_class', [Partition, MutablePartition])
+def test_deltas_replay_the_chain(partition_class):
+    assignment = {node: int(node[0] >= 3) for node in grid_graph()}
+    initial_state = Partition(grid_graph(), assignment, {'cut_edges': cut_edges})
+    validator = Validator([single_flip_contiguous, no_vanishing_districts])
+
+    random.seed(2018)
+    chain = MarkovChain(propose_random_flip, validator, cut_edge_accept, initial_state,
+                        total_steps=200)
+    expected = [(key(chain.state), len(state['cut_edges'])) for state in chain]
+
+    random.seed(2018)
+    initial_state = partition_class(grid_graph(), assignment, {'cut_edges': cut_edges})
+    chain = MarkovChain(propose_random_flip, validator, cut_edge_accept, initial_state,
+                        total_steps=200)
+    assignment = dict(assignment)
+    replayed = []
+    for step, flips, accepted, values in chain.deltas(['cut_edges']):
+        assert step == len(replayed)
+        assert (flips is None) == (step == 0)
+        if accepted and flips:
+            assignment.update(flips)
+        replayed.append((tuple(sorted(assignment.items())), len(values['cut_edges'])))
+
+    assert replayed == expected
+    assert any(not delta.accepted for delta in chain.deltas())
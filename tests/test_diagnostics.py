@@ -0,0 +1,83 @@
+import random
+
+import networkx
+
+from rundmcmc.accept import always_accept
+from rundmcmc.chain import MarkovChain
+from rundmcmc.output import BatchMeans, Diagnostics, split_r_hat
+from rundmcmc.partition import Partition
+from rundmcmc.proposals import propose_random_flip
+from rundmcmc.updaters import cut_edges
+from rundmcmc.validity import Validator, no_vanishing_districts, single_flip_contiguous
+
+
+def autoregressive(correlation, length, seed, shift=0):
+    """Values of an AR(1) process, whose integrated autocorrelation time is
+    (1 + correlation) / (1 - correlation)."""
+    generator = random.Random(seed)
+    value = 0
+    for _ in range(length):
+        value = correlation * value + generator.gauss(0, 1)
+        yield value + shift
+
+
+def batch_means(values, number_of_batches=128):
+    statistics = BatchMeans(number_of_batches)
+    for value in values:
+        statistics.update(value)
+    return statistics
+
+
+def test_BatchMeans_estimates_the_autocorrelation_time_in_constant_memory():
+    independent = batch_means(autoregressive(0, 100000, seed=1))
+    correlated = batch_means(autoregressive(0.5, 100000, seed=1))
+
+    assert 0.7 < independent.integrated_autocorrelation_time < 1.4
+    assert 2 < correlated.integrated_autocorrelation_time < 4
+    assert 25000 < correlated.effective_sample_size < 50000
+    assert len(correlated.batches) <= 128
+    assert correlated.count == 100000
+
+
+def test_split_r_hat_detects_chains_that_disagree():
+    agreeing = [batch_means(autoregressive(0.5, 10000, seed)) for seed in range(4)]
+    assert split_r_hat(agreeing) < 1.01
+
+    disagreeing = agreeing[:3] + [batch_means(autoregressive(0.5, 10000, 4, shift=1))]
+    assert split_r_hat(disagreeing) > 1.05
+
+    drifting = batch_means(value + index / 1000
+                           for index, value in enumerate(autoregressive(0.5, 10000, 5)))
+    assert split_r_hat([drifting]) > 1.05
+
+
+def test_Diagnostics_adds_up_the_chains_of_an_ensemble():
+    diagnostics = Diagnostics(['x'], min_ess=1000, max_r_hat=1.01)
+    for seed in range(3):
+        for value in autoregressive(0.5, 5000, seed):
+            diagnostics.update({'x': value}, chain=seed)
+
+    report = diagnostics.report()['x']
+    assert report['count'] == 15000
+    assert report['ess'] == sum(chain['x'].effective_sample_size
+                                for chain in diagnostics.chains.values())
+    assert diagnostics.converged()
+    assert not Diagnostics(['x'], min_ess=1000).converged()
+
+
+def test_Diagnostics_monitor_stops_the_chain_once_converged():
+    graph = networkx.grid_graph([6, 6])
+    partition = Partition(graph, {node: int(node[0] >= 3) for node in graph},
+                          {'cut_edges': cut_edges})
+    validator = Validator([single_flip_contiguous, no_vanishing_districts])
+    chain = MarkovChain(propose_random_flip, validator, always_accept, partition,
+                        total_steps=100000)
+
+    random.seed(2018)
+    diagnostics = Diagnostics({'cut_edges': lambda state: len(state['cut_edges'])},
+                              min_ess=100, check_every=100)
+    states = sum(1 for _ in diagnostics.monitor(chain))
+
+    assert states < 100000
+    assert states % 100 == 0
+    assert diagnostics.effective_sample_size('cut_edges') >= 100
@@ -0,0 +1,106 @@
+import multiprocessing
+import pickle
+import random
+
+import networkx
+import pytest
+
+from rundmcmc.accept import always_accept
+from rundmcmc.chain import MarkovChain
+from rundmcmc.frozen_graph import FrozenGraph
+from rundmcmc.partition import ArrayPartition
+from rundmcmc.proposals import propose_random_flip
+from rundmcmc.updaters import (ElectionTally, Tally, boundary_nodes, cut_edges,
+                               cut_edges_by_part, exterior_boundaries, interior_boundaries)
+from rundmcmc.validity import (Validator, contiguous, fast_connected, no_vanishing_districts,
+                               single_flip_contiguous)
+
+
+def grid_graph():
+    graph = networkx.grid_graph([5, 6])
+    for node in graph:
+        graph.nodes[node]['population'] = node[0] + 2 * node[1]
+        graph.nodes[node]['votes'] = node[0] % 3
+        graph.nodes[node]['boundary_node'] = 0 in node
+        graph.nodes[node]['boundary_perim'] = 1.5 if 0 in node else 0.0
+        graph.nodes[node]['county'] = 'county {}'.format(node[0] // 2)
+    for edge in graph.edges:
+        graph.edges[edge]['shared_perim'] = 1.0 + sum(edge[0]) / 10
+    return graph
+
+
+@pytest.fixture
+def shared_graph():
+    with FrozenGraph.from_networkx(grid_graph(), shared=True) as graph:
+        yield graph
+
+
+def test_FrozenGraph_has_the_nodes_edges_and_attributes_of_the_graph(shared_graph):
+    graph = grid_graph()
+    labels = shared_graph.node_labels
+
+    assert len(shared_graph) == len(graph)
+    assert len(shared_graph.edges) == len(graph.edges)
+    assert {frozenset((labels[u], labels[v])) for u, v in shared_graph.edges} == \
+        {frozenset(edge) for edge in graph.edges}
+
+    for node in shared_graph.nodes:
+        assert dict(shared_graph.nodes[node]) == graph.nodes[labels[node]]
+        assert [labels[neighbor] for neighbor in shared_graph.neighbors(node)] == \
+            sorted(graph.neighbors(labels[node]), key=labels.index)
+        for neighbor in shared_graph[node]:
+            assert shared_graph[node][neighbor]['shared_perim'] == \
+                graph.edges[labels[node], labels[neighbor]]['shared_perim']
+            assert shared_graph.edges[neighbor, node] == shared_graph[node][neighbor]
+
+
+def test_unpickled_FrozenGraph_attaches_to_the_same_memory(shared_graph):
+    attached = pickle.loads(pickle.dumps(shared_graph))
+
+    shared_graph.node_columns['population'][0] = 1000
+    assert attached.nodes[0]['population'] == 1000
+    assert attached.nodes[0]['county'] == shared_graph.nodes[0]['county']
+    attached.close()
+
+
+def set_population(graph):
+    graph.node_columns['population'][1] = 2000
+
+
+def test_worker_processes_see_the_shared_graph(shared_graph):
+    with multiprocessing.Pool(1) as pool:
+        pool.map(set_population, [shared_graph])
+
+    assert shared_graph.nodes[1]['population'] == 2000
+
+
+def scores(partition):
+    return (partition.labeled_assignment(), dict(partition['population']),
+            partition['votes'].totals.tolist(), dict(partition['exterior_boundaries']),
+            dict(partition['interior_boundaries']), set(partition['cut_edges']),
+            contiguous(partition), fast_connected(partition))
+
+
+def make_updaters():
+    return {'cut_edges': cut_edges,
+            'cut_edges_by_part': cut_edges_by_part,
+            'boundary_nodes': boundary_nodes,
+            'population': Tally('population'),
+            'votes': ElectionTally(['votes', 'population'], 'votes'),
+            'exterior_boundaries': exterior_boundaries,
+            'interior_boundaries': interior_boundaries}
+
+
+def test_updaters_and_validators_agree_on_a_FrozenGraph(shared_graph):
+    random.seed(2018)
+    assignment = {node: int(node[1] >= 3) for node in grid_graph()}
+    validator = Validator([single_flip_contiguous, no_vanishing_districts])
+    chain = MarkovChain(propose_random_flip, validator, always_accept,
+                        ArrayPartition(grid_graph(), assignment, make_updaters()), total_steps=200)
+
+    # Both partitions number the nodes in the order of the original graph.
+    frozen = ArrayPartition(shared_graph, assignment, make_updaters())
+    for state in chain:
+        if state.flips:
+            frozen = frozen.merge(state.flips)
+        assert scores(frozen) == scores(state)
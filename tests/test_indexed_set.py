@@ -0,0 +1,42 @@
+import pickle
+import random
+
+from rundmcmc.indexed_set import IndexedSet
+
+
+def test_IndexedSet_reads_like_a_set_and_a_sequence():
+    indexed_set = IndexedSet([(0, 1), (1, 2), (2, 3)])
+    assert indexed_set == {(0, 1), (1, 2), (2, 3)}
+    assert len(indexed_set) == 3
+    assert (1, 2) in indexed_set and (1, 3) not in indexed_set
+    assert {indexed_set[i] for i in range(len(indexed_set))} == indexed_set
+    assert random.choice(indexed_set) in indexed_set
+
+
+def test_IndexedSet_update_does_not_change_the_original():
+    original = IndexedSet(range(10))
+    updated = original.update(added=[10, 11], removed=[0, 5, 11])
+    assert updated == set(range(1, 11)) - {5}
+    assert original == set(range(10))
+    assert list(original) == list(range(10))
+    assert updated == set(range(1, 11)) - {5}
+
+
+def test_IndexedSet_versions_stay_consistent_when_accessed_in_any_order():
+    random.seed(2018)
+    versions = [(IndexedSet(range(5)), set(range(5)))]
+    for step in range(500):
+        indexed_set, expected = random.choice(versions)
+        added, removed = random.sample(range(30), 3), random.sample(range(30), 3)
+        versions.append((indexed_set.update(added, removed),
+                         (expected | set(added)) - set(removed)))
+
+    for indexed_set, expected in versions:
+        assert indexed_set == expected
+        assert len(indexed_set) == len(expected)
+        assert [indexed_set[i] for i in range(len(indexed_set))] == list(indexed_set)
+
+
+def test_IndexedSet_can_be_pickled():
+    indexed_set = IndexedSet(range(5)).update(added=[7], removed=[2])
+    assert pickle.loads(pickle.dumps(indexed_set)) == {0, 1, 3, 4, 7}
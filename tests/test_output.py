@@ -1,4 +1,14 @@
-from rundmcmc.output import ChainOutputTable
+import random
+
+import networkx
+
+from rundmcmc.accept import always_accept
+from rundmcmc.chain import MarkovChain
+from rundmcmc.output import ChainOutputTable, pipe_to_table
+from rundmcmc.partition import Partition
+from rundmcmc.proposals import propose_random_flip
+from rundmcmc.updaters import cut_edges
+from rundmcmc.validity import Validator, no_vanishing_districts, single_flip_contiguous
 
 
 def setup():
@@ -27,3 +37,41 @@ def test_chain_output_table_can_access_by_district():
     table, mock_row1, mock_row2 = setup()
     assert table.district(1) == [{'population': 100.0, 'area': 1000},
                           {'population': 125.0, 'area': 1200}]
+
+
+def grid_chain(total_steps, thin=1):
+    graph = networkx.grid_graph([6, 6])
+    assignment = {node: int(node[0] >= 3) for node in graph}
+    partition = Partition(graph, assignment, {'cut_edges': cut_edges})
+    validator = Validator([single_flip_contiguous, no_vanishing_districts])
+    return MarkovChain(propose_random_flip, validator, always_accept, partition,
+                       total_steps=total_steps, thin=thin)
+
+
+def test_thinned_chain_yields_every_kth_state():
+    random.seed(2018)
+    states = [dict(state.assignment) for state in grid_chain(100)]
+
+    random.seed(2018)
+    chain = grid_chain(100, thin=7)
+    thinned = [dict(state.assignment) for state in chain]
+
+    assert len(chain) == len(thinned) == 15
+    assert thinned == states[::7]
+
+
+def test_pipe_to_table_only_scores_the_kept_states():
+    calls = []
+
+    def score(partition):
+        calls.append(partition)
+        return len(partition['cut_edges'])
+
+    random.seed(2018)
+    table = pipe_to_table(grid_chain(100), {'cut_edges': score}, display=False, thin=10)
+    assert len(table['cut_edges']) == len(calls) == 10
+
+    random.seed(2018)
+    thinned_chain = pipe_to_table(grid_chain(100, thin=10), {'cut_edges': score},
+                                  display=False, thin=1)
+    assert thinned_chain['cut_edges'] == table['cut_edges']
@@ -0,0 +1,120 @@
+import collections
+import functools
+import random
+
+import networkx
+
+from rundmcmc.accept import Metropolis, always_accept
+from rundmcmc.chain import MarkovChain
+from rundmcmc.parallel import EnsembleRunner, ReplicaExchangeChain
+from rundmcmc.partition import Partition
+from rundmcmc.proposals import propose_random_flip
+from rundmcmc.rng import RandomStream
+from rundmcmc.updaters import cut_edges
+from rundmcmc.validity import Validator, no_vanishing_districts, single_flip_contiguous
+
+
+def make_grid_chain(total_steps, rng=random):
+    graph = networkx.grid_graph([6, 6])
+    assignment = {node: int(node[0] >= 3) for node in graph}
+    partition = Partition(graph, assignment, {'cut_edges': cut_edges})
+    validator = Validator([single_flip_contiguous, no_vanishing_districts])
+    return MarkovChain(functools.partial(propose_random_flip, rng=rng), validator,
+                       always_accept, partition, total_steps=total_steps)
+
+
+def number_of_cut_edges(partition):
+    return len(partition['cut_edges'])
+
+
+def run_ensemble(processes, seed=2018):
+    runner = EnsembleRunner(functools.partial(make_grid_chain, 50),
+                            {'cut_edges': number_of_cut_edges}, number_of_chains=3,
+                            seed=seed, processes=processes,
+                            histogram_bounds={'cut_edges': ((0, 40), 40)}, batch_size=7)
+    rows = sorted(runner.run(), key=lambda item: item[:2])
+    return runner, rows
+
+
+def test_EnsembleRunner_is_reproducible_with_any_number_of_processes():
+    runner, rows = run_ensemble(processes=2)
+    _, same_rows = run_ensemble(processes=1)
+
+    assert rows == same_rows
+    assert [(index, step) for index, step, _ in rows] == [
+        (index, step) for index in range(3) for step in range(50)]
+
+    _, other_rows = run_ensemble(processes=2, seed=2019)
+    assert rows != other_rows
+
+
+def test_EnsembleRunner_merges_histograms_and_p_value_counters():
+    runner, rows = run_ensemble(processes=2)
+
+    histogram = runner.histograms()['cut_edges']
+    assert sum(histogram.values()) == 150
+    assert histogram[6] == sum(row['cut_edges'] == 6 for _, _, row in rows)
+
+    report, = runner.p_value_reports()
+    as_high = sum(row['cut_edges'] >= 6 for _, _, row in rows)
+    assert report['initial_plan_score'] == 6
+    assert report['fraction_as_high'] == as_high / 150
+
+
+def test_EnsembleRunner_passes_each_chain_its_own_RandomStream():
+    runner = EnsembleRunner(functools.partial(make_grid_chain, 50),
+                            {'cut_edges': number_of_cut_edges}, number_of_chains=2,
+                            seed=2018, processes=2, pass_rng=True)
+    rows = sorted(runner.run(), key=lambda item: item[:2])
+
+    for index, seed in enumerate(runner.chain_seeds()):
+        random.seed(0)
+        chain = make_grid_chain(50, RandomStream(seed))
+        assert [row for chain_index, _, row in rows if chain_index == index] == [
+            {'cut_edges': number_of_cut_edges(state)} for state in chain]
+
+
+def two_by_three_partition():
+    graph = networkx.grid_graph([2, 3])
+    assignment = {node: int(node[1] >= 1) for node in graph}
+    return Partition(graph, assignment, {'cut_edges': cut_edges})
+
+
+def key(partition):
+    return tuple(sorted(partition.assignment.items()))
+
+
+def run_replica_exchange(total_steps, seed=2018, pass_rng=False):
+    validator = Validator([single_flip_contiguous, no_vanishing_districts])
+    chain = ReplicaExchangeChain(propose_random_flip, validator, two_by_three_partition(),
+                                 number_of_cut_edges, betas=[1, 0.5, 0], seed=seed,
+                                 swap_interval=5, total_steps=total_steps, pass_rng=pass_rng)
+    return chain, [key(state) for state in chain]
+
+
+def test_ReplicaExchangeChain_is_reproducible():
+    chain, states = run_replica_exchange(100)
+    _, same_states = run_replica_exchange(100)
+
+    assert len(states) == 100
+    assert states == same_states
+    assert sum(chain.attempted_swaps) == 99 // 5 + 1
+
+    _, states = run_replica_exchange(100, pass_rng=True)
+    _, same_states = run_replica_exchange(100, pass_rng=True)
+    assert states == same_states
+
+
+def test_ReplicaExchangeChain_cold_chain_matches_MarkovChain():
+    validator = Validator([single_flip_contiguous, no_vanishing_districts])
+    random.seed(2018)
+    chain = MarkovChain(propose_random_flip, validator, Metropolis(number_of_cut_edges, 1),
+                        two_by_three_partition(), total_steps=20000)
+    expected = collections.Counter(key(chain.state) for _ in chain)
+
+    _, states = run_replica_exchange(5000)
+    observed = collections.Counter(states)
+
+    distance = sum(abs(expected[state] / 20000 - observed[state] / 5000)
+                   for state in set(expected) | set(observed)) / 2
+    assert distance < 0.1
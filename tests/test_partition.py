@@ -1,8 +1,15 @@
+import random
+import types
+
 import networkx
+import numpy
+import pytest
 
-from rundmcmc.partition import Partition
+from rundmcmc.chain import MarkovChain
+from rundmcmc.partition import ArrayPartition, MutablePartition, Partition
 from rundmcmc.proposals import propose_random_flip
-from rundmcmc.updaters import cut_edges
+from rundmcmc.updaters import cut_edges, depends_on
+from rundmcmc.validity import Validator, no_vanishing_districts
 
 
 def example_partition():
@@ -65,3 +72,129 @@ def test_partition_has_no_empty_parts():
     parts = new_partition.parts
 
     assert all(len(parts[part]) > 0 for part in parts)
+
+
+def example_array_partition():
+    graph = networkx.Graph([('a', 'b'), ('b', 'c'), ('c', 'a')])
+    assignment = {'a': 1, 'b': 1, 'c': 2}
+    return ArrayPartition(graph, assignment, updaters={'cut_edges': cut_edges})
+
+
+def test_ArrayPartition_relabels_nodes_to_integers():
+    partition = example_array_partition()
+    assert set(partition.graph.nodes) == {0, 1, 2}
+    assert partition.assignment.array.dtype == numpy.int32
+    assert partition.labeled_assignment() == {'a': 1, 'b': 1, 'c': 2}
+
+
+def test_ArrayPartition_can_be_flipped_without_mutating_parent():
+    partition = example_array_partition()
+    flip = {partition.index_of('b'): 2}
+    new_partition = partition.merge(flip)
+
+    assert new_partition.assignment[partition.index_of('b')] == 2
+    assert partition.assignment[partition.index_of('b')] == 1
+    assert new_partition.labeled_flips() == {'b': 2}
+    assert new_partition.parts[2] == {partition.index_of('b'), partition.index_of('c')}
+    assert len(new_partition['cut_edges']) == 2
+
+
+def test_ArrayPartition_merge_shares_the_chunks_that_it_does_not_flip():
+    graph = networkx.path_graph(200)
+    assignment = {node: int(node >= 100) for node in graph.nodes}
+    partition = ArrayPartition(graph, assignment)
+    new_partition = partition.merge({150: 0})
+
+    shared = [new is old for new, old in zip(new_partition.assignment.chunks,
+                                              partition.assignment.chunks)]
+    assert shared.count(False) == 1
+    assert new_partition.assignment.array[150] == 0
+    assert partition.assignment.array[150] == 1
+
+
+def test_ArrayPartition_requires_integer_parts():
+    graph = networkx.complete_graph(2)
+    with pytest.raises(TypeError):
+        ArrayPartition(graph, {0: 'A', 1: 'B'})
+
+
+def example_mutable_partition():
+    graph = networkx.complete_graph(3)
+    assignment = {0: 1, 1: 1, 2: 2}
+    return MutablePartition(graph, assignment, updaters={'cut_edges': cut_edges})
+
+
+def test_MutablePartition_applies_flips_in_place():
+    partition = example_mutable_partition()
+    partition.apply({1: 2})
+
+    assert partition.assignment[1] == 2
+    assert partition.parts == {1: {0}, 2: {1, 2}}
+    assert partition.parent.assignment[1] == 1
+    assert partition.parent.parts[2] == {2}
+    assert len(partition['cut_edges']) == 2
+
+
+def test_MutablePartition_revert_undoes_apply():
+    partition = example_mutable_partition()
+    cut_edges_before = partition['cut_edges']
+
+    partition.apply({0: 2, 1: 2})
+    assert partition.parts == {2: {0, 1, 2}}
+    assert len(partition.parent) == 2
+
+    partition.revert()
+    assert dict(partition.assignment) == {0: 1, 1: 1, 2: 2}
+    assert partition.parts == {1: {0, 1}, 2: {2}}
+    assert partition['cut_edges'] is cut_edges_before
+
+
+@pytest.mark.parametrize('accept', [lambda partition: True,
+                                    lambda partition: random.random() < 0.5],
+                         ids=['always', 'random'])
+def test_MutablePartition_runs_the_same_chain_as_Partition(accept):
+    graph = networkx.grid_2d_graph(6, 6)
+    assignment = {node: int(node[0] >= 3) for node in graph.nodes}
+    updaters = {'cut_edges': cut_edges}
+
+    def run(partition_class):
+        random.seed(2018)
+        initial = partition_class(graph, assignment, updaters)
+        chain = MarkovChain(propose_random_flip, Validator([no_vanishing_districts]),
+                            accept, initial, total_steps=100)
+        return [(dict(state.assignment), sorted(state['cut_edges'])) for state in chain]
+
+    assert run(Partition) == run(MutablePartition)
+
+
+def test_updaters_are_only_computed_when_read():
+    partition = example_partition()
+    new_partition = partition.merge({1: 2})
+    assert new_partition.evaluated_updaters == []
+
+    new_partition['cut_edges']
+    assert new_partition.evaluated_updaters == ['cut_edges']
+
+
+def test_declared_dependencies_are_computed_first():
+    @depends_on('cut_edges')
+    def number_of_cut_edges(partition):
+        return len(partition['cut_edges'])
+
+    graph = networkx.complete_graph(3)
+    updaters = {'number_of_cut_edges': number_of_cut_edges, 'cut_edges': cut_edges}
+    partition = Partition(graph, {0: 1, 1: 1, 2: 2}, updaters)
+
+    new_partition = partition.merge({1: 2})
+    assert new_partition['number_of_cut_edges'] == 2
+    assert new_partition.evaluated_updaters == ['cut_edges', 'number_of_cut_edges']
+
+
+def test_Partition_accepts_any_mapping_as_an_assignment():
+    graph = networkx.complete_graph(3)
+    assignment = types.MappingProxyType({0: 1, 1: 1, 2: 2})
+    partition = Partition(graph, assignment, {'cut_edges': cut_edges})
+
+    new_partition = partition.merge({1: 2})
+    assert dict(new_partition.assignment) == {0: 1, 1: 2, 2: 2}
+    assert dict(partition.assignment) == {0: 1, 1: 1, 2: 2}
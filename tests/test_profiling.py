@@ -0,0 +1,91 @@
+import json
+import random
+
+import networkx
+
+from rundmcmc.accept import cut_edge_accept
+from rundmcmc.chain import MarkovChain
+from rundmcmc.partition import MutablePartition, Partition
+from rundmcmc.profiling import Instrumentation, Profiler
+from rundmcmc.proposals import propose_random_flip
+from rundmcmc.updaters import Tally, cut_edges
+from rundmcmc.validity import Validator, no_vanishing_districts, single_flip_contiguous
+
+
+def grid_partition(partition_class=Partition):
+    graph = networkx.grid_graph([5, 5])
+    for node in graph:
+        graph.nodes[node]['population'] = 1
+    assignment = {node: int(node[0] >= 2) for node in graph}
+    return partition_class(graph, assignment,
+                           {'cut_edges': cut_edges, 'population': Tally('population')})
+
+
+class Recorder(Instrumentation):
+    def __init__(self):
+        self.events = []
+
+    def before(self, phase, key=None):
+        self.events.append(('before', phase, key))
+
+    def after(self, phase, key=None):
+        self.events.append(('after', phase, key))
+
+    def finish(self):
+        self.events.append(('finish', None, None))
+
+
+def run_chain(instrumentation, partition_class=Partition, total_steps=50):
+    random.seed(2018)
+    validator = Validator([single_flip_contiguous, no_vanishing_districts])
+    chain = MarkovChain(propose_random_flip, validator, cut_edge_accept,
+                        grid_partition(partition_class), total_steps=total_steps,
+                        instrumentation=instrumentation)
+    return [state.assignment for state in chain]
+
+
+def test_hooks_are_called_around_each_phase_and_updater():
+    recorder = Recorder()
+    run_chain(recorder, total_steps=2)
+
+    # Only the second step runs the chain; the first yields the initial state.
+    assert recorder.events[:6] == [('before', 'proposal', None), ('after', 'proposal', None),
+                                   ('before', 'check', None), ('after', 'check', None),
+                                   ('before', 'merge', None), ('after', 'merge', None)]
+    assert recorder.events[-1] == ('finish', None, None)
+
+    validate = recorder.events.index(('before', 'validate', None))
+    assert ('before', 'updater', 'cut_edges') in recorder.events[validate:]
+
+    depth = 0
+    for event, _, _ in recorder.events[:-1]:
+        depth += 1 if event == 'before' else -1
+        assert depth >= 0
+    assert depth == 0
+
+
+def test_Profiler_counts_the_phases_of_the_steps(tmp_path):
+    path = str(tmp_path / 'profile.json')
+    profiler = Profiler(path=path, allocations=True)
+    assert run_chain(profiler) == run_chain(None)
+
+    with open(path) as f:
+        profile = json.load(f)
+    phases = profile['phases']
+
+    assert phases['proposal']['calls'] >= 49
+    assert phases['merge']['calls'] == phases['validate']['calls']
+    assert phases['accept']['calls'] == 49
+    assert profile['updaters']['cut_edges']['calls'] > 0
+    assert profile['wall_time'] > 0
+    for statistics in list(phases.values()) + list(profile['updaters'].values()):
+        assert 0 <= statistics['self_time'] <= statistics['time']
+
+
+def test_Profiler_counts_the_phases_of_mutable_partitions():
+    profiler = Profiler()
+    run_chain(profiler, MutablePartition)
+
+    assert profiler.phases['merge'].calls == profiler.phases['validate'].calls
+    assert profiler.phases['revert'].calls > 0
+    assert profiler.updaters['population'].calls > 0
@@ -0,0 +1,103 @@
+import collections
+import functools
+import pickle
+import random
+
+import networkx
+import pytest
+
+from rundmcmc.accept import Metropolis
+from rundmcmc.chain import MarkovChain
+from rundmcmc.partition import Partition
+from rundmcmc.proposals import propose_random_flip, propose_random_flip_metagraph
+from rundmcmc.rng import RandomStream
+from rundmcmc.updaters import MetagraphDegree, cut_edges, cut_edges_by_part
+from rundmcmc.validity import Validator, no_vanishing_districts, single_flip_contiguous
+
+
+def draws(rng):
+    return [rng.random() for _ in range(5)] + [rng.randint(2, 7) for _ in range(5)] + \
+        [rng.choice('abc') for _ in range(5)]
+
+
+def test_RandomStream_draws_its_own_stream():
+    random.seed(0)
+    first = draws(RandomStream(2018, batch_size=4))
+    random.seed(1)
+    assert draws(RandomStream(2018, batch_size=4)) == first
+    assert draws(RandomStream(2019, batch_size=4)) != first
+
+
+def test_RandomStream_draws_uniformly():
+    rng = RandomStream(2018)
+    counts = collections.Counter(rng.randrange(3) for _ in range(30000))
+    assert set(counts) == {0, 1, 2}
+    assert all(abs(count - 10000) < 400 for count in counts.values())
+
+    weighted = collections.Counter(rng.choices('ab', weights=[1, 3], k=20000))
+    assert abs(weighted['b'] - 15000) < 400
+
+    with pytest.raises(IndexError):
+        rng.choice([])
+
+
+@pytest.mark.parametrize('position', [0, 3, 4, 7])
+def test_RandomStream_continues_from_its_state(position):
+    rng = RandomStream(2018, batch_size=4)
+    for _ in range(position):
+        rng.random()
+
+    state = rng.getstate()
+    copy = pickle.loads(pickle.dumps(rng))
+    expected = [rng.random() for _ in range(10)]
+
+    assert [copy.random() for _ in range(10)] == expected
+    rng.setstate(state)
+    assert [rng.random() for _ in range(10)] == expected
+
+
+def number_of_cut_edges(partition):
+    return len(partition['cut_edges'])
+
+
+def key(partition):
+    return tuple(sorted(partition.assignment.items()))
+
+
+@pytest.mark.parametrize('proposal', [propose_random_flip, propose_random_flip_metagraph])
+def test_proposals_only_draw_from_their_RandomStream(proposal):
+    graph = networkx.grid_graph([6, 6])
+    assignment = {node: int(node[0] >= 3) for node in graph}
+    validator = Validator([single_flip_contiguous, no_vanishing_districts])
+    updaters = {'cut_edges': cut_edges, 'cut_edges_by_part': cut_edges_by_part,
+                'metagraph_degree': MetagraphDegree(validator, 'metagraph_degree')}
+
+    runs = []
+    for seed in (0, 1):
+        random.seed(seed)
+        rng = RandomStream(2018)
+        chain = MarkovChain(functools.partial(proposal, rng=rng), validator,
+                            Metropolis(number_of_cut_edges, rng=rng),
+                            Partition(graph, assignment, updaters), total_steps=100)
+        runs.append([key(state) for state in chain])
+
+    assert runs[0] == runs[1]
+    assert len(set(runs[0])) > 1
+
+
+def test_chain_with_a_RandomStream_resumes_from_a_checkpoint(tmp_path):
+    path = str(tmp_path / 'chain.checkpoint')
+    graph = networkx.grid_graph([6, 6])
+    assignment = {node: int(node[0] >= 3) for node in graph}
+    rng = RandomStream(2018, batch_size=16)
+    chain = MarkovChain(functools.partial(propose_random_flip, rng=rng),
+                        Validator([single_flip_contiguous, no_vanishing_districts]),
+                        Metropolis(number_of_cut_edges, rng=rng),
+                        Partition(graph, assignment, {'cut_edges': cut_edges}),
+                        total_steps=130, checkpoint_path=path, checkpoint_every=50)
+    states = [key(state) for state in chain]
+
+    random.seed(0)
+    resumed = MarkovChain.resume(path, graph)
+    assert resumed.proposal.keywords['rng'] is resumed.accept.rng
+    assert [key(state) for state in resumed] == states[100:]
@@ -1,6 +1,10 @@
 import json
 import math
+import os
+import pickle
 import random
+import subprocess
+import sys
 
 import geopandas as gp
 import networkx
@@ -13,8 +17,10 @@ from rundmcmc.updaters import (Tally, boundary_nodes, cut_edges,
                                cut_edges_by_part, exterior_boundaries,
                                interior_boundaries,
                                exterior_boundaries_as_a_set,
-                               perimeters, votes_updaters)
-from rundmcmc.validity import (Validator, contiguous, no_vanishing_districts,
+                               perimeters, votes_updaters,
+                               election_updaters, county_splits, MetagraphDegree)
+from rundmcmc.updaters.metagraph_degree import metagraph_degree
+from rundmcmc.validity import (UpperBound, Validator, contiguous, no_vanishing_districts,
                                single_flip_contiguous)
 
 
@@ -130,6 +136,29 @@ def test_tally_multiple_columns():
     assert partition['total'][1] == expected_total_in_district_one
 
 
+def test_sorted_tally_keeps_the_extremes_of_the_tally():
+    random.seed(2018)
+    graph = networkx.grid_graph([6, 6])
+    attach_random_data(graph, ['population'])
+    assignment = {node: 2 * (node[0] // 3) + node[1] // 3 for node in graph.nodes}
+    updaters = {'cut_edges': cut_edges,
+                'population': Tally('population', extremes=True),
+                'unsorted': Tally('population', alias='unsorted')}
+    partition = Partition(graph, assignment, updaters)
+
+    for step in range(200):
+        partition = partition.merge(propose_random_flip(partition))
+        population = partition['population']
+
+        assert dict(population) == dict(partition['unsorted'])
+        assert population.order == sorted((value, part) for part, value in population.items())
+        assert population.values().extremes() == (min(population.values()),
+                                                   max(population.values()))
+        assert population[population.min_part()] == min(population.values())
+
+    assert pickle.loads(pickle.dumps(population)).order == population.order
+
+
 def test_vote_totals_are_nonnegative():
     partition = setup_for_proportion_updaters(['D', 'R'])
     assert all(count >= 0 for count in partition['total_votes'].values())
@@ -345,3 +374,169 @@ def test_perimeters():
 
     assert result[1] == 3 + 4  # 3 nodes + 4 edges
     assert result[2] == 5 + 4  # 5 nodes + 4 edges
+
+
+def test_cut_edges_by_part_only_recomputes_touched_parts():
+    graph = three_by_three_grid()
+    assignment = {0: 1, 1: 1, 2: 2, 3: 1, 4: 1, 5: 2, 6: 3, 7: 3, 8: 3}
+    updaters = {'cut_edges_by_part': cut_edges_by_part}
+    partition = Partition(graph, assignment, updaters)
+    # 112    112
+    # 112 -> 122
+    # 333    333
+    flip = {4: 2}
+
+    new_partition = Partition(parent=partition, flips=flip)
+
+    result = new_partition['cut_edges_by_part']
+    previous = partition['cut_edges_by_part']
+
+    assert result[3] is previous[3]
+    assert result[1] == {(1, 2), (1, 4), (3, 4), (3, 6)}
+    assert result[2] == {(1, 2), (1, 4), (3, 4), (4, 7), (5, 8)}
+
+
+def test_tallies_and_proportions_match_naive_totals_on_later_steps():
+    random.seed(2018)
+    columns = ['D', 'R']
+    graph = three_by_three_grid()
+    attach_random_data(graph, columns)
+    assignment = {0: 1, 1: 1, 2: 2, 3: 1, 4: 1, 5: 2, 6: 3, 7: 3, 8: 3}
+    updaters = {**votes_updaters(columns), 'cut_edges': cut_edges}
+
+    initial_partition = Partition(graph, assignment, updaters)
+
+    chain = MarkovChain(propose_random_flip, Validator([no_vanishing_districts]),
+                        lambda x: True, initial_partition, total_steps=20)
+    for partition in chain:
+        for part, nodes in partition.parts.items():
+            naive_d = sum(graph.nodes[node]['D'] for node in nodes)
+            naive_r = sum(graph.nodes[node]['R'] for node in nodes)
+            assert partition['D'][part] == naive_d
+            assert partition['total_votes'][part] == naive_d + naive_r
+            assert partition['D%'][part] == naive_d / (naive_d + naive_r)
+
+
+def test_election_updaters_match_votes_updaters():
+    random.seed(2018)
+    columns = ['D08', 'R08', 'D12', 'R12']
+    graph = three_by_three_grid()
+    attach_random_data(graph, columns)
+    assignment = {0: 1, 1: 1, 2: 2, 3: 1, 4: 1, 5: 2, 6: 3, 7: 3, 8: 3}
+    updaters = {**election_updaters({'08': ['D08', 'R08'], '12': ['D12', 'R12']}),
+                'cut_edges': cut_edges}
+    expected_updaters = {**votes_updaters(['D08', 'R08'], '08'),
+                         **votes_updaters(['D12', 'R12'], '12'),
+                         'cut_edges': cut_edges}
+
+    initial_partition = Partition(graph, assignment, updaters)
+
+    chain = MarkovChain(propose_random_flip, Validator([no_vanishing_districts]),
+                        lambda x: True, initial_partition, total_steps=20)
+    for partition in chain:
+        expected = Partition(graph, dict(partition.assignment), expected_updaters)
+        for key in expected_updaters:
+            if key != 'cut_edges':
+                assert dict(partition[key]) == dict(expected[key])
+
+
+def test_county_splits_only_recomputes_counties_with_flipped_nodes():
+    random.seed(2018)
+    graph = networkx.grid_graph([6, 6])
+    for node in graph.nodes:
+        graph.nodes[node]['county'] = (node[0] // 2, node[1] // 3)
+    assignment = {node: node[0] // 3 for node in graph.nodes}
+    updaters = {'counties': county_splits('counties', 'county'), 'cut_edges': cut_edges}
+
+    partition = Partition(graph, assignment, updaters)
+    for step in range(100):
+        new_partition = partition.merge(propose_random_flip(partition))
+        counties = new_partition['counties']
+        flipped_counties = {graph.nodes[node]['county'] for node in new_partition.flips}
+
+        for county, info in counties.items():
+            parts = [new_partition.assignment[node] for node in info.nodes]
+            assert info.contains == set(parts)
+            assert info.counts == {part: parts.count(part) for part in set(parts)}
+            if county not in flipped_counties:
+                assert info is partition['counties'][county]
+
+        partition = new_partition
+
+
+def test_metagraph_degree_matches_recomputing_every_flip():
+    random.seed(2018)
+    graph = networkx.grid_graph([8, 8])
+    assignment = {node: 2 * (node[0] // 4) + node[1] // 4 for node in graph.nodes}
+    validator = Validator([single_flip_contiguous, no_vanishing_districts])
+    updaters = {'cut_edges': cut_edges, 'cut_edges_by_part': cut_edges_by_part,
+                'metagraph_degree': MetagraphDegree(validator, 'metagraph_degree')}
+
+    initial_partition = Partition(graph, assignment, updaters)
+
+    chain = MarkovChain(propose_random_flip, validator, lambda x: random.random() < 0.7,
+                        initial_partition, total_steps=50)
+    for partition in chain:
+        degree = partition['metagraph_degree']
+        expected = metagraph_degree(partition, validator)
+        assert degree['total'] == expected['total']
+        assert degree['valid'] == expected['valid']
+
+
+def test_metagraph_degree_recounts_every_flip_with_constraints_on_the_whole_partition():
+    random.seed(2018)
+    graph = networkx.grid_graph([8, 8])
+    assignment = {node: 2 * (node[0] // 4) + node[1] // 4 for node in graph.nodes}
+
+    def number_of_cut_edges(partition):
+        return len(partition['cut_edges'])
+
+    validator = Validator([single_flip_contiguous, no_vanishing_districts,
+                           UpperBound(number_of_cut_edges, 20)])
+    assert not validator.local
+
+    updaters = {'cut_edges': cut_edges, 'cut_edges_by_part': cut_edges_by_part,
+                'metagraph_degree': MetagraphDegree(validator, 'metagraph_degree')}
+    initial_partition = Partition(graph, assignment, updaters)
+
+    chain = MarkovChain(propose_random_flip, validator, lambda x: random.random() < 0.7,
+                        initial_partition, total_steps=200)
+    for partition in chain:
+        assert partition['metagraph_degree']['valid'] == metagraph_degree(
+            partition, validator)['valid']
+
+
+CHAIN_WITH_STRING_NODES = """
+import json
+import random
+
+import networkx
+
+from rundmcmc.accept import always_accept
+from rundmcmc.chain import MarkovChain
+from rundmcmc.partition import Partition
+from rundmcmc.proposals import propose_random_flip
+from rundmcmc.updaters import cut_edges
+from rundmcmc.validity import Validator, no_vanishing_districts, single_flip_contiguous
+
+graph = networkx.relabel_nodes(networkx.grid_graph([6, 6]), lambda node: "%d,%d" % node)
+assignment = {node: int(node[0] >= "3") for node in graph}
+partition = Partition(graph, assignment, {'cut_edges': cut_edges})
+random.seed(2018)
+chain = MarkovChain(propose_random_flip, Validator([single_flip_contiguous,
+                                                    no_vanishing_districts]),
+                    always_accept, partition, total_steps=100)
+print(json.dumps([state.flips for state in chain][1:]))
+"""
+
+
+def test_cut_edges_order_does_not_depend_on_the_hash_seed():
+    runs = []
+    for hash_seed in ('0', '1'):
+        environment = dict(os.environ, PYTHONHASHSEED=hash_seed)
+        output = subprocess.run([sys.executable, '-c', CHAIN_WITH_STRING_NODES],
+                                env=environment, check=True, stdout=subprocess.PIPE,
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        runs.append(json.loads(output.stdout))
+
+    assert runs[0] == runs[1]
@@ -1,7 +1,16 @@
+import random
+
 import networkx as nx
 
-from rundmcmc.validity import (contiguous, districts_within_tolerance,
-                               fast_connected, single_flip_contiguous, SelfConfiguringLowerBound)
+from rundmcmc.accept import always_accept
+from rundmcmc.chain import MarkovChain
+from rundmcmc.partition import Partition
+from rundmcmc.proposals import propose_random_flip
+from rundmcmc.updaters import Tally, county_splits, cut_edges
+from rundmcmc.validity import (Validator, contiguous, districts_within_tolerance,
+                               fast_connected, no_vanishing_districts,
+                               refuse_new_splits, single_flip_contiguous,
+                               within_percent_of_ideal_population, SelfConfiguringLowerBound)
 
 
 class MockContiguousPartition:
@@ -92,3 +101,139 @@ def test_self_configuring_lower_bound_always_allows_the_first_argument_it_gets()
     assert bound(mock_partition)
     assert bound(mock_partition)
     assert bound(mock_partition)
+
+
+def test_single_flip_contiguous_agrees_with_contiguous_on_random_flips():
+    random.seed(2018)
+    graph = nx.grid_graph([8, 8])
+    assignment = {node: 2 * (node[0] // 4) + node[1] // 4 for node in graph}
+    partition = Partition(graph, assignment, {'cut_edges': cut_edges})
+
+    disconnected = 0
+    for step in range(500):
+        proposal = partition.merge(propose_random_flip(partition))
+
+        assert single_flip_contiguous(proposal) == contiguous(proposal)
+        if single_flip_contiguous(proposal):
+            partition = proposal
+        else:
+            disconnected += 1
+
+    # Make sure that both answers were checked.
+    assert disconnected > 0
+
+
+def grid_partition_with_counties():
+    graph = nx.grid_graph([6, 6])
+    for node in graph:
+        graph.nodes[node]['population'] = 1 + (node[0] * node[1]) % 3
+        graph.nodes[node]['county'] = (node[0] // 2, node[1] // 3)
+    assignment = {node: 2 * (node[0] // 3) + node[1] // 3 for node in graph}
+    updaters = {'cut_edges': cut_edges, 'population': Tally('population'),
+                'counties': county_splits('counties', 'county')}
+    return Partition(graph, assignment, updaters)
+
+
+def test_constraint_checks_agree_with_constraints_on_merged_partitions():
+    random.seed(2018)
+    partition = grid_partition_with_counties()
+    constraints = [within_percent_of_ideal_population(partition, 0.3),
+                   no_vanishing_districts, refuse_new_splits('counties')]
+
+    for step in range(500):
+        flips = propose_random_flip(partition)
+        for _ in range(random.randrange(3)):
+            flips.update(propose_random_flip(partition))
+        proposal = partition.merge(flips)
+
+        # The partition is always valid, so the checks are exact.
+        for constraint in constraints:
+            assert constraint.check(partition, flips) == bool(constraint(proposal))
+        if all(constraint(proposal) for constraint in constraints):
+            partition = proposal
+
+
+def test_chain_runs_the_same_with_and_without_checks():
+    partition = grid_partition_with_counties()
+    # Not refuse_new_splits: once every county is whole, it rejects every flip.
+    validator = Validator([within_percent_of_ideal_population(partition, 0.3),
+                           no_vanishing_districts])
+
+    def without_checks(proposal):
+        return validator(proposal)
+    without_checks.constraints = validator.constraints
+
+    def bounded_proposal(partition):
+        # Fail instead of hanging if the chain gets stuck.
+        assert next(attempts, None) is not None, "the chain is stuck"
+        return propose_random_flip(partition)
+
+    assignments = []
+    for is_valid in (validator, without_checks):
+        attempts = iter(range(10000))
+        random.seed(2018)
+        chain = MarkovChain(bounded_proposal, is_valid, always_accept, partition,
+                            total_steps=200)
+        assignments.append([dict(state.assignment) for state in chain])
+
+    assert assignments[0] == assignments[1]
+
+
+def test_validator_counts_calls_and_rejections_of_each_constraint():
+    def reject_odd(partition):
+        return partition % 2 == 0
+
+    def always_valid(partition):
+        return True
+
+    validator = Validator([reject_odd, always_valid])
+    results = [validator(number) for number in range(10)]
+
+    assert results == [number % 2 == 0 for number in range(10)]
+    statistics = validator.statistics()
+    assert [item['name'] for item in statistics] == ['reject_odd', 'always_valid']
+    assert [item['calls'] for item in statistics] == [10, 5]
+    assert [item['rejections'] for item in statistics] == [5, 0]
+    assert all(item['time'] >= 0 for item in statistics)
+
+
+def test_validator_counts_rejections_of_the_pre_merge_checks():
+    partition = grid_partition_with_counties()
+    population_constraint = within_percent_of_ideal_population(partition, 0.01)
+    validator = Validator([no_vanishing_districts, population_constraint])
+
+    # Moving a corner node away from the first district unbalances the population.
+    assert not validator.check(partition, {(0, 0): 1})
+
+    vanishing, population = validator.statistics()
+    assert (vanishing['check_calls'], vanishing['check_rejections']) == (1, 0)
+    assert (population['check_calls'], population['check_rejections']) == (1, 1)
+    assert population['check_time'] >= 0
+    assert population['calls'] == population['rejections'] == 0
+
+    # Adaptive ordering counts the rejections of the checks too.
+    validator.reorder()
+    assert validator.constraints == [population_constraint, no_vanishing_districts]
+
+
+def test_adaptive_validator_runs_constraints_that_reject_most_first():
+    calls = []
+
+    def slow_and_permissive(partition):
+        calls.append('slow')
+        return True
+
+    def rejects_everything(partition):
+        calls.append('rejects')
+        return False
+
+    validator = Validator([slow_and_permissive, rejects_everything],
+                          adaptive=True, reorder_every=10)
+    for _ in range(20):
+        assert not validator(None)
+
+    assert validator.constraints == [rejects_everything, slow_and_permissive]
+    assert calls[-2:] == ['rejects', 'rejects']
+    # The statistics keep the order that the constraints were given in.
+    assert [item['name'] for item in validator.statistics()] == [
+        'slow_and_permissive', 'rejects_everything']